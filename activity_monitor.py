@@ -0,0 +1,135 @@
+from PyQt5 import sip
+from PyQt5.QtCore import QEvent, QObject, pyqtSignal, pyqtSlot
+import time
+
+try:
+    from PyQt5.QtDBus import QDBusConnection, QDBusInterface, QDBusPendingCallWatcher, QDBusPendingReply
+except ImportError:  # Optional: without D-Bus, screen lock and system idle time are unknown
+    QDBusConnection = None
+
+# System idle time is asked for at most this often, in seconds
+IDLE_QUERY_INTERVAL = 30.0
+
+# (service, path, interface) of screen savers announcing locks with ActiveChanged(bool)
+SCREENSAVERS = (
+    ("org.freedesktop.ScreenSaver", "/org/freedesktop/ScreenSaver", "org.freedesktop.ScreenSaver"),
+    ("org.gnome.ScreenSaver", "/org/gnome/ScreenSaver", "org.gnome.ScreenSaver"),
+)
+
+# Events that mean the user is at the widget right now
+INTERACTION_EVENTS = (QEvent.MouseButtonPress, QEvent.KeyPress, QEvent.Wheel, QEvent.Enter)
+VISIBILITY_EVENTS = (QEvent.Show, QEvent.Hide, QEvent.WindowStateChange, QEvent.Expose)
+
+
+class ActivityMonitor(QObject):
+    """
+    Tells the poll policy whether anyone can see the widget: window visibility and
+    exposure, screen lock and system idle time (both over D-Bus when available).
+    Emits resumed when the widget goes from unwatched to watched, and hidden as soon as
+    it is minimized, covered or the screen locks.
+    """
+    resumed = pyqtSignal()
+    hidden = pyqtSignal()
+
+    def __init__(self, window):
+        super().__init__(window)
+        self.window = window
+        self.locked = False
+        self.was_active = True
+        self._idle_seconds = 0.0
+        self._idle_checked_at = float("-inf")
+        self._idle_interface = None
+        self._idle_watcher = None  # Pending GetIdletime call
+        self._idle_requested_at = None
+        self._filtered_handle = None
+        window.installEventFilter(self)
+
+        if QDBusConnection is not None:
+            bus = QDBusConnection.sessionBus()
+            if bus.isConnected():
+                for service, path, interface in SCREENSAVERS:
+                    bus.connect(service, path, interface, "ActiveChanged", self.on_screensaver_changed)
+                # GNOME's idle monitor; other desktops simply report no idle time
+                self._idle_interface = QDBusInterface(
+                    "org.gnome.Mutter.IdleMonitor", "/org/gnome/Mutter/IdleMonitor/Core",
+                    "org.gnome.Mutter.IdleMonitor", bus, self,
+                )
+                self._idle_interface.setTimeout(1000)
+
+    def visible(self):
+        """
+        Whether the window is shown, not minimized and not fully covered.
+        """
+        if not self.window.isVisible() or self.window.isMinimized():
+            return False
+        handle = self.window.windowHandle()
+        return handle is None or handle.isExposed()
+
+    def idle_seconds(self, now=None):
+        """
+        Seconds since the last keyboard or mouse input anywhere in the session, 0 if unknown.
+        Asked for asynchronously, so the answer is up to one query interval old.
+        """
+        now = time.monotonic() if now is None else now
+        if (self._idle_interface is not None and self._idle_watcher is None
+                and now - self._idle_checked_at >= IDLE_QUERY_INTERVAL):
+            self._idle_checked_at = self._idle_requested_at = now
+            self._idle_watcher = QDBusPendingCallWatcher(self._idle_interface.asyncCall("GetIdletime"), self)
+            self._idle_watcher.finished.connect(self.on_idle_time)
+        return self._idle_seconds
+
+    def on_idle_time(self, watcher):
+        self._idle_watcher = None
+        watcher.deleteLater()
+        reply = QDBusPendingReply(watcher)
+        if reply.isError():
+            self._idle_seconds = 0.0
+        elif self._idle_checked_at == self._idle_requested_at:  # Otherwise input arrived meanwhile
+            self._idle_seconds = reply.argumentAt(0) / 1000
+
+    def active(self, idle_after):
+        """
+        Whether the widget is being watched: visible, unlocked, and the user not idle longer
+        than idle_after seconds. Remembered, so window events after a change back to
+        unwatched emit resumed.
+        """
+        active = not self.locked and self.visible() and self.idle_seconds() < idle_after
+        self.was_active = active
+        return active
+
+    def check_resumed(self):
+        if self.was_active or self.locked or not self.visible():
+            return
+        self.was_active = True
+        self.resumed.emit()
+
+    def check_hidden(self):
+        if self.locked or not self.visible():
+            self.was_active = False
+            self.hidden.emit()
+
+    @pyqtSlot(bool)
+    def on_screensaver_changed(self, active):
+        self.locked = active
+        if active:
+            self.check_hidden()
+        else:
+            self._idle_seconds = 0.0  # Someone just unlocked the screen
+            self.check_resumed()
+
+    def eventFilter(self, watched, event):
+        if sip.isdeleted(self.window):
+            return False  # The native window reports its own teardown after the widget is gone
+        kind = event.type()
+        if kind in INTERACTION_EVENTS:
+            self._idle_seconds = 0.0
+            self._idle_checked_at = time.monotonic()
+            self.check_resumed()
+        elif kind in VISIBILITY_EVENTS:
+            if kind == QEvent.Show and self._filtered_handle is None and self.window.windowHandle():
+                # Exposure changes are only delivered to the native window
+                self._filtered_handle = self.window.windowHandle()
+                self._filtered_handle.installEventFilter(self)
+            self.check_resumed()
+            self.check_hidden()
+        return False
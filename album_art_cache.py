@@ -0,0 +1,127 @@
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+
+CACHE_DIR = os.getenv(
+    "SPOTIFY_WIDGET_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "spotify-widget"),
+)
+
+
+def pick_image(images, width, height):
+    """
+    Pick the smallest (url, width, height) entry that still covers the requested size.
+    Falls back to the largest image when none is big enough.
+    """
+    if not images:
+        return None
+    # Entries without dimensions are treated as large so they are only a last resort
+    by_size = sorted(images, key=lambda image: (image[1] or 10 ** 6) * (image[2] or 10 ** 6))
+    for image in by_size:
+        if (image[1] or 10 ** 6) >= width and (image[2] or 10 ** 6) >= height:
+            return image
+    return by_size[-1]
+
+
+class ArtworkDiskCache:
+    """
+    Size-capped on-disk store of encoded artwork, keyed by image URL.
+    Safe to use from any thread; evicts least recently used files first.
+    Touches the disk only on first use, which is on a worker thread rather than the GUI's.
+    """
+
+    def __init__(self, directory=os.path.join(CACHE_DIR, "album-art"), max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None  # Counted on the first put
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf-8")).hexdigest())
+
+    def _entries(self):
+        """
+        (path, size, last access) for every cached file.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                stat = entry.stat()
+                entries.append((entry.path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            os.utime(path)  # Mark as recently used
+            return data
+        except OSError:
+            return None
+
+    def put(self, url, data):
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            try:
+                if self._total_bytes is None:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self._total_bytes = sum(size for _, size, _ in self._entries())
+                previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+                with open(tmp_path, "wb") as file:
+                    file.write(data)
+                os.replace(tmp_path, path)
+                self._total_bytes += len(data) - previous_size
+                if self._total_bytes > self.max_bytes:
+                    self._trim()
+            except OSError as e:
+                print(f"Error writing album art cache: {e}")
+
+    def _trim(self):
+        # Evict oldest files until we are back to 90% of the budget
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._total_bytes = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if self._total_bytes <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+                self._total_bytes -= size
+            except OSError:
+                pass
+
+
+class PixmapCache:
+    """
+    In-memory LRU of decoded, pre-scaled QPixmaps bounded by their pixel memory.
+    GUI thread only, like QPixmap itself.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._pixmaps = OrderedDict()
+        self._total_bytes = 0
+
+    @staticmethod
+    def _cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, key):
+        pixmap = self._pixmaps.get(key)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+    def __contains__(self, key):
+        return key in self._pixmaps
+
+    def put(self, key, pixmap):
+        if key in self._pixmaps:
+            self._total_bytes -= self._cost(self._pixmaps.pop(key))
+        self._pixmaps[key] = pixmap
+        self._total_bytes += self._cost(pixmap)
+        while self._total_bytes > self.max_bytes and len(self._pixmaps) > 1:
+            _, evicted = self._pixmaps.popitem(last=False)
+            self._total_bytes -= self._cost(evicted)
@@ -0,0 +1,319 @@
+"""
+Local stand-in for the Spotify Web API endpoints the widget uses, for benchmarks.
+
+Serves /v1/me/player, the transport endpoints, /v1/me/player/queue and album art,
+with configurable latency, jitter, 429 responses and track length.
+"""
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+
+ART_SIZES = (640, 300, 64)
+PLAYLIST_URI = "spotify:playlist:benchmark"
+
+
+def striped_png(size, top, bottom):
+    """
+    Album art stand-in: a square PNG with two horizontal color bands.
+    """
+    rows = []
+    for y in range(size):
+        rgb = bytes(top if y < size // 2 else bottom)
+        rows.append(b"\x00" + rgb * size)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"".join(rows))) + chunk(b"IEND", b"")
+
+
+class FakeSpotify:
+    """
+    Playback state machine behind the fake server. Thread-safe.
+    """
+
+    def __init__(self, base_url, track_count=50, track_duration_ms=30000, latency=0.05, jitter=0.02,
+                 rate_limit_probability=0.0, retry_after=1, playlist_length=5000, seed=None):
+        self.base_url = base_url
+        self.playlist_length = playlist_length  # Tracks of the playlist playback claims to come from
+        self.track_duration_ms = track_duration_ms
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.random = random.Random(seed)  # Seeded, a run draws the same latencies and 429s
+
+        self._lock = threading.Lock()
+        self.tracks = [self._make_track(number) for number in range(track_count)]
+        self.index = 0
+        self.position_ms = 0  # Position at self.anchor
+        self.anchor = time.monotonic()
+        self.is_playing = True
+        self.shuffle = False
+        self.repeat_state = "off"
+        self.saved = set()  # Track IDs in the user's library
+
+        self.requests = Counter()  # "METHOD /path" -> count
+        self.rate_limited = 0
+        self.bytes_sent = 0
+        self.track_changes = []  # (monotonic time, track name, cause)
+
+    def _make_track(self, number):
+        album = number // 5  # Five tracks per album, so art is reused
+        return {
+            "id": f"track{number:017d}",  # 22 characters, like real track IDs
+            "uri": f"spotify:track:track{number:017d}",
+            "name": f"Track {number}",
+            "duration_ms": self.track_duration_ms,
+            "artists": [{"name": f"Artist {album}"}],
+            "album": {
+                "id": f"album{album:04d}",
+                "name": f"Album {album}",
+                "images": [
+                    {"url": f"{self.base_url}/art/album{album:04d}/{size}.png", "width": size, "height": size}
+                    for size in ART_SIZES
+                ],
+            },
+        }
+
+    def _advance(self, now):
+        # Let tracks end naturally while playing
+        while self.is_playing:
+            progress = self.position_ms + (now - self.anchor) * 1000
+            if progress < self.track_duration_ms:
+                return
+            ended_at = self.anchor + (self.track_duration_ms - self.position_ms) / 1000
+            self.index = (self.index + 1) % len(self.tracks)
+            self.position_ms = 0
+            self.anchor = ended_at
+            self.track_changes.append((ended_at, self.tracks[self.index]["name"], "natural"))
+
+    def _progress(self, now):
+        if not self.is_playing:
+            return self.position_ms
+        return int(self.position_ms + (now - self.anchor) * 1000)
+
+    def _jump(self, now, index, cause):
+        self.index = index % len(self.tracks)
+        self.position_ms = 0
+        self.anchor = now
+        self.is_playing = True
+        self.track_changes.append((now, self.tracks[self.index]["name"], cause))
+
+    def playback(self):
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            return {
+                "device": {"id": "fake", "name": "Benchmark", "type": "Computer", "is_active": True},
+                "shuffle_state": self.shuffle,
+                "repeat_state": self.repeat_state,
+                "timestamp": int(time.time() * 1000),
+                "progress_ms": self._progress(now),
+                "is_playing": self.is_playing,
+                "item": self.tracks[self.index],
+                "currently_playing_type": "track",
+                "context": {"type": "playlist", "uri": PLAYLIST_URI},
+            }
+
+    def queue(self):
+        with self._lock:
+            self._advance(time.monotonic())
+            upcoming = [self.tracks[(self.index + offset) % len(self.tracks)] for offset in range(1, 21)]
+            return {"currently_playing": self.tracks[self.index], "queue": upcoming}
+
+    def playlist_items(self, query):
+        offset = int(query.get("offset", ["0"])[0])
+        limit = min(100, int(query.get("limit", ["100"])[0]))
+        numbers = range(offset, min(offset + limit, self.playlist_length))
+        return {"total": self.playlist_length, "items": [{"track": self._make_track(number)} for number in numbers]}
+
+    def command(self, name, query):
+        with self._lock:
+            now = time.monotonic()
+            self._advance(now)
+            if name == "play":
+                if not self.is_playing:
+                    self.anchor, self.is_playing = now, True
+            elif name == "pause":
+                if self.is_playing:
+                    self.position_ms, self.is_playing = self._progress(now), False
+            elif name == "next":
+                self._jump(now, self.index + 1, "next")
+            elif name == "previous":
+                self._jump(now, self.index - 1, "previous")
+            elif name == "seek":
+                self.position_ms = int(query.get("position_ms", ["0"])[0])
+                self.anchor = now
+            elif name == "shuffle":
+                self.shuffle = query.get("state", ["false"])[0] == "true"
+            elif name == "repeat":
+                self.repeat_state = query.get("state", ["off"])[0]
+
+    def library(self, method, query):
+        # /me/tracks takes IDs, the newer /me/library takes URIs
+        if "uris" in query:
+            track_ids = [uri.split(":")[-1] for uri in query["uris"][0].split(",")]
+        else:
+            track_ids = query.get("ids", [""])[0].split(",")
+        with self._lock:
+            if method == "GET":
+                return [track_id in self.saved for track_id in track_ids]
+            if method == "PUT":
+                self.saved.update(track_ids)
+            else:
+                self.saved.difference_update(track_ids)
+
+    def should_rate_limit(self):
+        return self.rate_limit_probability > 0 and self.random.random() < self.rate_limit_probability
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "api_calls": sum(count for key, count in self.requests.items() if " /v1/" in key),
+                "rate_limited": self.rate_limited,
+                "bytes_sent": self.bytes_sent,
+                "track_changes": list(self.track_changes),
+            }
+
+
+class FakeSpotifyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    art_cache = {}
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.fake._lock:
+            self.fake.bytes_sent += len(body)
+
+    def _send_json(self, payload):
+        self._send(200, json.dumps(payload).encode("utf-8"))
+
+    def _handle(self, method):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        path = url.path
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+
+        fake = self.fake
+        time.sleep(max(0.0, fake.latency + fake.random.uniform(-fake.jitter, fake.jitter)))
+        with fake._lock:
+            fake.requests[f"{method} {path}"] += 1
+
+        if path.startswith("/art/"):
+            _, _, album, file_name = path.split("/")
+            size = int(file_name.split(".")[0])
+            key = (album, size)
+            if key not in self.art_cache:
+                seed = int(album[-4:])
+                top = ((seed * 67) % 256, (seed * 131) % 256, (seed * 29) % 256)
+                bottom = (255 - top[0], 255 - top[1], 255 - top[2])
+                self.art_cache[key] = striped_png(size, top, bottom)
+            self._send(200, self.art_cache[key], "image/png")
+            return
+
+        if fake.should_rate_limit():
+            with fake._lock:
+                fake.rate_limited += 1
+            body = json.dumps({"error": {"status": 429, "message": "API rate limit exceeded"}}).encode("utf-8")
+            self._send(429, body, headers={"Retry-After": str(fake.retry_after)})
+            return
+
+        commands = {
+            ("PUT", "/v1/me/player/play"): "play",
+            ("PUT", "/v1/me/player/pause"): "pause",
+            ("POST", "/v1/me/player/next"): "next",
+            ("POST", "/v1/me/player/previous"): "previous",
+            ("PUT", "/v1/me/player/seek"): "seek",
+            ("PUT", "/v1/me/player/shuffle"): "shuffle",
+            ("PUT", "/v1/me/player/repeat"): "repeat",
+        }
+        if (method, path) in commands:
+            fake.command(commands[(method, path)], query)
+            self._send(204)
+        elif method == "GET" and path in ("/v1/me/tracks/contains", "/v1/me/library/contains"):
+            self._send_json(fake.library(method, query))
+        elif method in ("PUT", "DELETE") and path.rstrip("/") in ("/v1/me/tracks", "/v1/me/library"):
+            fake.library(method, query)
+            self._send(200)
+        elif method == "GET" and path == "/v1/me/player":
+            self._send_json(fake.playback())
+        elif method == "GET" and path == "/v1/me/player/queue":
+            self._send_json(fake.queue())
+        elif method == "GET" and path == f"/v1/playlists/{PLAYLIST_URI.split(':')[-1]}/tracks":
+            self._send_json(fake.playlist_items(query))
+        else:
+            self._send(404, json.dumps({"error": {"status": 404, "message": "Not found"}}).encode("utf-8"))
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def start_server(port=0, **options):
+    """
+    Start the fake API on a daemon thread. Returns (server, base_url).
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeSpotifyHandler)
+    server.daemon_threads = True
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    server.fake = FakeSpotify(base_url, **options)
+    threading.Thread(target=server.serve_forever, name="fake-spotify", daemon=True).start()
+    return server, base_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the fake Spotify Web API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit-probability", type=float, default=0.0)
+    parser.add_argument("--track-duration", type=float, default=30.0, help="Track length in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency jitter and 429s")
+    args = parser.parse_args()
+
+    server, base_url = start_server(
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit_probability=args.rate_limit_probability,
+        track_duration_ms=int(args.track_duration * 1000),
+        seed=args.seed,
+    )
+    print(f"Fake Spotify API at {base_url}/v1/")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,173 @@
+"""
+Microbenchmark of album-art palette extraction and the theme switch it drives.
+
+Measures the k-means quantization that runs in the worker's palette pool and the part of a
+track change that stays on the GUI thread: deriving the palette theme and compiling its
+stylesheet. With PyQt5 available it also times the scaled decode of a 640 px cover and
+SpotifyWidget.apply_theme on a real offscreen widget, against the fake API. Derive and apply
+are timed on the same theme, once per cover, after a warm-up. The run exits with status 1
+if the median or p95 of the GUI-thread work exceeds its budget.
+
+    python benchmarks/palette_benchmark.py --covers 200
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from palette import NUMPY_AVAILABLE, SAMPLE_SIZE, extract_palette  # noqa: E402
+from run_benchmark import configure_widget, percentile, quiesce  # noqa: E402
+from theme import LIGHT, compile_palette_stylesheet, theme_for_palette  # noqa: E402
+
+# GUI-thread milliseconds a track change may spend on its new palette: typically, and in
+# the slow tail, which leaves headroom for the odd slow event-loop pass
+GUI_BUDGET_MS = 3.0
+GUI_TAIL_BUDGET_MS = 6.0
+WARM_UP = 20  # Album changes applied before measuring: first polish, caches, allocator
+
+
+def synthetic_cover(rng, size=SAMPLE_SIZE):
+    """
+    Cover stand-in: a few flat color blocks with noise, like a downsampled album cover.
+    """
+    import numpy as np
+
+    cover = np.empty((size, size, 3), dtype=np.uint8)
+    colors = rng.integers(0, 256, size=(4, 3))
+    split_x, split_y = rng.integers(size // 4, 3 * size // 4, size=2)
+    cover[:split_y, :split_x] = colors[0]
+    cover[:split_y, split_x:] = colors[1]
+    cover[split_y:, :split_x] = colors[2]
+    cover[split_y:, split_x:] = colors[3]
+    noise = rng.integers(-12, 13, size=cover.shape)
+    return np.clip(cover.astype(np.int16) + noise, 0, 255).astype(np.uint8).reshape(-1, 3)
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def summary(durations):
+    return {
+        "p50": round(percentile(durations, 0.5), 3),
+        "p95": round(percentile(durations, 0.95), 3),
+        "max": round(max(durations), 3),
+    }
+
+
+def measure_qt(palettes):
+    """
+    Scaled decode of a full-size cover (worker thread), and the GUI-thread part of each album
+    change on the real widget: deriving the palette theme, then applying it.
+    Returns the decode times and a (derive, apply) pair per palette.
+    """
+    from fake_spotify_server import start_server, striped_png
+
+    server, base_url = start_server(latency=0.0, jitter=0.0)
+    configure_widget(base_url)
+    os.environ["SPOTIFY_WIDGET_DYNAMIC_THEME"] = "0"  # Only the themes measured here are applied
+    from PyQt5.QtCore import QBuffer, QByteArray, QEventLoop, QIODevice, QSize, QTimer
+    from PyQt5.QtGui import QImageReader
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication([])
+    cover = striped_png(640, (200, 40, 60), (30, 90, 200))
+    decode = []
+    for _ in range(len(palettes)):
+        started = time.perf_counter()
+        buffer = QBuffer()
+        buffer.setData(QByteArray(cover))
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        reader.setScaledSize(QSize(SAMPLE_SIZE, SAMPLE_SIZE))
+        reader.read()
+        decode.append((time.perf_counter() - started) * 1000)
+
+    import main
+
+    widget = main.SpotifyWidget(1920, 1080)
+    widget.show()
+    settled = QEventLoop()
+    QTimer.singleShot(1500, settled.quit)  # Let hydration and the first poll finish first
+    settled.exec_()
+    quiesce(widget)
+
+    def album_change(palette):
+        # Same base theme, new palette; the stylesheet compiles inside apply_theme
+        started = time.perf_counter()
+        theme = theme_for_palette(LIGHT, palette)
+        derived = time.perf_counter()
+        widget.apply_theme(theme)
+        app.processEvents()
+        return (derived - started) * 1000, (time.perf_counter() - derived) * 1000
+
+    for palette in palettes[:WARM_UP]:
+        album_change(palette)
+    compile_palette_stylesheet.cache_clear()  # Every measured theme compiles, like a new album's
+    changes = [album_change(palette) for palette in palettes]
+    widget.close()
+    server.shutdown()
+    return decode, changes
+
+
+def run(covers, seed):
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    samples = [synthetic_cover(rng) for _ in range(covers)]
+    extract_palette(samples[0])  # Warm up NumPy
+
+    extraction, derive, palettes = [], [], []
+    for pixels in samples:
+        palette, duration = timed(extract_palette, pixels)
+        extraction.append(duration)
+        palettes.append(palette)
+        # Without Qt, the GUI thread's share is deriving and compiling the theme; uncached here
+        started = time.perf_counter()
+        compile_palette_stylesheet.__wrapped__(theme_for_palette(LIGHT, palette))
+        derive.append((time.perf_counter() - started) * 1000)
+
+    results = {
+        "extract_palette_ms": summary(extraction),
+        "derive_theme_ms": summary(derive),
+    }
+    gui = derive
+    try:
+        decode, changes = measure_qt(palettes)
+    except ImportError as e:
+        print(f"Skipping Qt measurements: {e}")
+    else:
+        results["scaled_decode_ms"] = summary(decode)
+        results["apply_theme_ms"] = summary([apply for _, apply in changes])
+        gui = [derive + apply for derive, apply in changes]  # Both parts of the same album change
+    results["gui_thread_ms"] = summary(gui)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark album-art palette extraction.")
+    parser.add_argument("--covers", type=int, default=200, help="Synthetic covers to quantize")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not NUMPY_AVAILABLE:
+        print("NumPy is not installed; palette extraction is disabled.")
+        sys.exit(1)
+
+    results = run(args.covers, args.seed)
+    print(json.dumps(results, indent=2))
+    regressions = [
+        f"gui_thread_ms {statistic} {results['gui_thread_ms'][statistic]} > {budget}"
+        for statistic, budget in (("p50", GUI_BUDGET_MS), ("p95", GUI_TAIL_BUDGET_MS))
+        if results["gui_thread_ms"][statistic] > budget
+    ]
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,297 @@
+"""
+Benchmark the widget against the local fake Spotify Web API.
+
+Runs SpotifyWidget offscreen, lets tracks play and clicks "next" periodically, then reports
+API calls per minute, track change to display latency, click to UI response, event-loop
+stalls, theme switch cost and peak RSS. Results are compared with the recorded baseline
+of the scenario in baselines.json; a regression, or a scenario without a baseline, makes
+the run exit with status 1.
+
+    python benchmarks/run_benchmark.py --scenario default
+    python benchmarks/run_benchmark.py --scenario slow --update-baseline
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baselines.json")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_spotify_server import start_server  # noqa: E402
+
+SCENARIOS = {
+    "default": {"latency": 0.05, "jitter": 0.02, "rate_limit_probability": 0.0},
+    "slow": {"latency": 0.5, "jitter": 0.3, "rate_limit_probability": 0.0},
+    "throttled": {"latency": 0.05, "jitter": 0.02, "rate_limit_probability": 0.1},
+}
+
+# Lower is better for every metric. A metric regresses when it exceeds
+# baseline * (1 + TOLERANCE) + its absolute slack, which absorbs noise on tiny values.
+TOLERANCE = 0.25
+SLACK = {
+    "api_calls_per_minute": 2.0,
+    "track_change_to_display_ms_p50": 20.0,
+    "track_change_to_display_ms_p95": 50.0,
+    "click_to_ui_ms_p50": 5.0,
+    "click_to_ui_ms_p95": 20.0,
+    "event_loop_stall_ms_total": 50.0,
+    "event_loop_stall_ms_max": 20.0,
+    "theme_switch_ms_p50": 5.0,
+    "theme_switch_repaints_max": 0.0,
+    "peak_rss_mb": 10.0,
+}
+
+STALL_TICK = 0.010  # Seconds between event-loop heartbeat ticks
+STALL_THRESHOLD = 0.050  # Lateness that counts as a stall
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class WidgetRecorder:
+    """
+    Records when the widget displays a track and when clicks get a visible response.
+    """
+
+    def __init__(self, widget):
+        self.displays = []  # (monotonic time, track name)
+        self.pending_clicks = []  # (monotonic time, track name shown at click time)
+        self.click_latencies = []
+        original = widget.update_track_info
+
+        def update_track_info(current_track_info=None, **kwargs):
+            now = time.monotonic()
+            name = current_track_info.track_name if current_track_info else None
+            self.displays.append((now, name))
+            for clicked_at, shown in list(self.pending_clicks):
+                if name != shown:
+                    self.click_latencies.append((now - clicked_at) * 1000)
+                    self.pending_clicks.remove((clicked_at, shown))
+            return original(current_track_info, **kwargs)
+
+        widget.update_track_info = update_track_info
+        self.widget = widget
+
+    def click_next(self):
+        self.pending_clicks.append((time.monotonic(), self.widget.track_label.text()))
+        self.widget.next_button.click()
+
+    def track_change_latencies(self, track_changes):
+        """
+        Milliseconds from each natural track change on the server to its display.
+        Changes shown ahead of time by prediction count as zero.
+        """
+        latencies = []
+        for changed_at, name, cause in track_changes:
+            if cause != "natural":
+                continue
+            shown = [shown_at for shown_at, shown_name in self.displays
+                     if shown_name == name and shown_at >= changed_at - 5]
+            if shown:
+                latencies.append(max(0.0, (shown[0] - changed_at) * 1000))
+        return latencies
+
+
+class StallMonitor:
+    """
+    Heartbeat timer on the GUI thread; late ticks mean the event loop was blocked.
+    """
+
+    def __init__(self):
+        from PyQt5.QtCore import QTimer
+
+        self.total = 0.0
+        self.worst = 0.0
+        self.last = time.monotonic()
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.tick)
+        self.timer.start(int(STALL_TICK * 1000))
+
+    def tick(self):
+        now = time.monotonic()
+        lateness = now - self.last - STALL_TICK
+        self.last = now
+        if lateness > STALL_THRESHOLD:
+            self.total += lateness
+            self.worst = max(self.worst, lateness)
+
+
+def quiesce(widget):
+    """
+    Stop polls, worker results and the progress redraw, so measurements of the widget see
+    only the work they trigger themselves.
+    """
+    from PyQt5.QtCore import QEventLoop, QTimer
+
+    widget.timer.stop()
+    for source in (widget.playback_source, widget.worker, widget.command_worker):
+        source.blockSignals(True)
+    settled = QEventLoop()
+    QTimer.singleShot(500, settled.quit)  # Deliver what was emitted before the block
+    settled.exec_()
+    widget.suspend_redraws()  # After the delivered results, which restart the progress redraw
+
+
+def measure_theme_switches(app, widget, count=20):
+    """
+    Time theme switches and count how many times the window repaints for each one.
+    """
+    from PyQt5.QtCore import QEvent, QObject
+
+    quiesce(widget)  # Count only the paints a switch causes
+
+    class PaintCounter(QObject):
+        paints = 0
+
+        def eventFilter(self, watched, event):
+            if event.type() == QEvent.Paint:
+                self.paints += 1
+            return False
+
+    counter = PaintCounter()
+    widget.installEventFilter(counter)
+    app.processEvents()
+    durations = []
+    repaints = []
+    for _ in range(count):
+        counter.paints = 0
+        started = time.perf_counter()
+        widget.toggle_dark_mode()
+        app.processEvents()
+        durations.append((time.perf_counter() - started) * 1000)
+        app.processEvents()  # Flush any repaint the switch queued late
+        repaints.append(counter.paints)
+    widget.removeEventFilter(counter)
+    return durations, repaints
+
+
+def configure_widget(base_url):
+    """
+    Point the widget at the fake API and render offscreen.
+    Must run before the widget modules are imported, they read it at import time.
+    """
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    os.environ["SPOTIFY_WIDGET_API_URL"] = f"{base_url}/v1/"
+    os.environ["SPOTIFY_WIDGET_ACCESS_TOKEN"] = "benchmark"
+    os.environ["SPOTIFY_WIDGET_CACHE_DIR"] = tempfile.mkdtemp(prefix="spotify-widget-bench-")
+    os.environ["SPOTIFY_WIDGET_DATA_DIR"] = tempfile.mkdtemp(prefix="spotify-widget-bench-")  # Keep plays out of the real history
+    os.chdir(ROOT)  # Assets are loaded from relative paths
+
+
+def run(scenario, duration, track_duration, click_interval, seed=1):
+    server, base_url = start_server(track_duration_ms=int(track_duration * 1000), seed=seed, **SCENARIOS[scenario])
+    configure_widget(base_url)
+
+    from PyQt5.QtCore import QTimer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication([])
+    import main
+
+    widget = main.SpotifyWidget(1920, 1080)
+    recorder = WidgetRecorder(widget)
+    stalls = StallMonitor()
+    widget.show()
+
+    click_timer = QTimer()
+    click_timer.timeout.connect(recorder.click_next)
+    click_timer.start(int(click_interval * 1000))
+
+    started = time.monotonic()
+    QTimer.singleShot(int(duration * 1000), app.quit)
+    app.exec_()
+    elapsed = time.monotonic() - started
+    click_timer.stop()
+    theme_durations, theme_repaints = measure_theme_switches(app, widget)
+    widget.close()
+    server.shutdown()
+
+    stats = server.fake.stats()
+    track_latencies = recorder.track_change_latencies(stats["track_changes"])
+    return {
+        "api_calls_per_minute": round(stats["api_calls"] / (elapsed / 60), 2),
+        "track_change_to_display_ms_p50": round(percentile(track_latencies, 0.5), 1),
+        "track_change_to_display_ms_p95": round(percentile(track_latencies, 0.95), 1),
+        "click_to_ui_ms_p50": round(percentile(recorder.click_latencies, 0.5), 1),
+        "click_to_ui_ms_p95": round(percentile(recorder.click_latencies, 0.95), 1),
+        "event_loop_stall_ms_total": round(stalls.total * 1000, 1),
+        "event_loop_stall_ms_max": round(stalls.worst * 1000, 1),
+        "theme_switch_ms_p50": round(percentile(theme_durations, 0.5), 2),
+        "theme_switch_repaints_max": max(theme_repaints),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }, {
+        "requests": stats["requests"],
+        "rate_limited": stats["rate_limited"],
+        "track_changes_shown": len(track_latencies),
+        "clicks_answered": len(recorder.click_latencies),
+        "mean_click_to_ui_ms": round(statistics.mean(recorder.click_latencies), 1) if recorder.click_latencies else None,
+    }
+
+
+def load_baselines():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH, "r") as file:
+        return json.load(file)
+
+
+def compare(metrics, baseline):
+    """
+    List of human readable regressions of metrics against baseline.
+    """
+    regressions = []
+    for name, value in metrics.items():
+        if name not in baseline:
+            continue
+        limit = baseline[name] * (1 + TOLERANCE) + SLACK.get(name, 0.0)
+        if value > limit:
+            regressions.append(f"{name}: {value} > {limit:.1f} (baseline {baseline[name]})")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the widget against a fake Spotify API.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="default")
+    parser.add_argument("--duration", type=float, default=120.0, help="Seconds to run")
+    parser.add_argument("--track-duration", type=float, default=20.0, help="Fake track length in seconds")
+    # Longer than a track, so natural track ends and clicks both happen
+    parser.add_argument("--click-interval", type=float, default=25.0, help="Seconds between 'next' clicks")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the fake API's jitter and 429s")
+    parser.add_argument("--update-baseline", action="store_true", help="Record this run as the scenario's baseline")
+    args = parser.parse_args()
+
+    metrics, details = run(args.scenario, args.duration, args.track_duration, args.click_interval, args.seed)
+    print(json.dumps({"scenario": args.scenario, "metrics": metrics, "details": details}, indent=2))
+    if not details["track_changes_shown"] or not details["clicks_answered"]:
+        # Percentiles of an empty sample read as 0 ms and would pass any comparison
+        print("Error running benchmark: no track changes or clicks were measured; raise --duration.")
+        sys.exit(1)
+
+    baselines = load_baselines()
+    if args.update_baseline:
+        baselines[args.scenario] = metrics
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(baselines, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Recorded baseline for scenario '{args.scenario}'.")
+        sys.exit(0)
+    if args.scenario not in baselines:
+        # Without a baseline nothing could regress, which must not pass silently
+        print(f"No baseline for scenario '{args.scenario}'; record one with --update-baseline.")
+        sys.exit(1)
+
+    regressions = compare(metrics, baselines[args.scenario])
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,91 @@
+from collections import deque
+from dataclasses import dataclass
+import threading
+import time
+
+# Commands that move to another track; their argument is how many tracks to move
+TRACK_COMMANDS = ("next", "previous")
+
+
+@dataclass
+class Command:
+    name: str
+    argument: object = None
+
+
+class CommandQueue:
+    """
+    Thread-safe FIFO of transport commands that merges redundant commands while they wait.
+    Five quick "next" clicks become one skip-by-5, a stream of seeks collapses to the last
+    one, and a play followed by a pause cancels out.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._in_flight = None
+        self.finished_at = 0.0  # time.monotonic() when the last command completed
+
+    def put(self, name, argument=None):
+        with self._lock:
+            last = self._pending[-1] if self._pending else None
+
+            if name in TRACK_COMMANDS:
+                # A seek right before leaving the track is pointless
+                while last and last.name == "seek":
+                    self._pending.pop()
+                    last = self._pending[-1] if self._pending else None
+                if last and last.name == name:
+                    last.argument += argument
+                    return
+            elif name in ("seek", "shuffle", "repeat") and last and last.name == name:
+                last.argument = argument  # Only the latest target matters
+                return
+            elif name in ("play", "pause") and last and last.name in ("play", "pause"):
+                if last.name != name:
+                    self._pending.pop()  # Play then pause (or vice versa) is a no-op
+                return
+            elif (name in ("like", "unlike") and last and last.name in ("like", "unlike")
+                  and last.argument == argument):
+                if last.name != name:
+                    self._pending.pop()  # Like then unlike of the same track is a no-op
+                return
+
+            self._pending.append(Command(name, argument))
+
+    def take(self):
+        """
+        Pop the next command for execution, or None when the queue is empty.
+        """
+        with self._lock:
+            if not self._pending:
+                return None
+            self._in_flight = self._pending.popleft()
+            return self._in_flight
+
+    def done(self):
+        """
+        Mark the command returned by take() as completed, successfully or not.
+        """
+        with self._lock:
+            self._in_flight = None
+            self.finished_at = time.monotonic()
+
+    def involves(self, names, argument):
+        """
+        Whether a command named in names with this argument is waiting or running.
+        """
+        with self._lock:
+            commands = list(self._pending) + ([self._in_flight] if self._in_flight else [])
+            return any(command.name in names and command.argument == argument for command in commands)
+
+    def idle(self):
+        with self._lock:
+            return not self._pending and self._in_flight is None
+
+    def settled(self, fetched_at):
+        """
+        Whether a snapshot fetched at fetched_at already reflects every command.
+        """
+        with self._lock:
+            return not self._pending and self._in_flight is None and fetched_at >= self.finished_at
@@ -0,0 +1,156 @@
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtNetwork import QLocalSocket
+from playback_daemon import SOCKET_PATH
+from playback_state import PlaybackState, QueuedTrack
+from startup_timing import startup_timer
+from transport import PREFETCH_DEPTH, QUEUE_SOURCE, upcoming
+import json
+
+# Seconds between attempts to reach a daemon that is not (or no longer) running
+RECONNECT_INTERVAL = 2.0
+
+
+class DaemonClient(QObject):
+    """
+    Thin-client replacement for the playback and command workers' Spotify traffic.
+    Snapshots, the upcoming queue and command results come from the playback daemon over
+    its Unix socket; the widget never calls the Web API itself. Event driven, so it lives
+    on the GUI thread.
+    """
+    playback_updated = pyqtSignal(object)  # PlaybackState, or None
+    poll_deferred = pyqtSignal(float)
+    queue_updated = pyqtSignal(list)
+    command_finished = pyqtSignal(str, object)
+    command_failed = pyqtSignal(str, str)
+    queue_page_ready = pyqtSignal(str, int, list, int, int)
+    queue_page_failed = pyqtSignal(str, int)
+    saved_tracks_ready = pyqtSignal(dict)
+
+    def __init__(self, commands, path=SOCKET_PATH, parent=None):
+        super().__init__(parent)
+        self.commands = commands
+        self.path = path
+        self.in_flight = None  # Command sent to the daemon and not answered yet
+
+        self.socket = QLocalSocket(self)
+        self.socket.connected.connect(self.on_connected)
+        self.socket.disconnected.connect(self.on_disconnected)
+        self.socket.readyRead.connect(self.read_messages)
+        self.socket.errorOccurred.connect(self.on_error)
+        self.reconnect_timer = QTimer(self)
+        self.reconnect_timer.setSingleShot(True)
+        self.reconnect_timer.timeout.connect(self.connect_to_daemon)
+        self.connect_to_daemon()
+
+    def connect_to_daemon(self):
+        if self.socket.state() == QLocalSocket.UnconnectedState:
+            self.socket.connectToServer(self.path)
+
+    def connected(self):
+        return self.socket.state() == QLocalSocket.ConnectedState
+
+    def send(self, message):
+        self.socket.write((json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8"))
+
+    def on_connected(self):
+        startup_timer.mark("daemon_connected")
+        print(f"Attached to playback daemon at {self.path}")
+        self.drain()
+
+    def on_disconnected(self):
+        print("Playback daemon went away, reconnecting.")
+        self.fail_in_flight("Playback daemon disconnected")
+        self.reconnect_timer.start(int(RECONNECT_INTERVAL * 1000))
+
+    def on_error(self, error):
+        if not self.connected():
+            self.reconnect_timer.start(int(RECONNECT_INTERVAL * 1000))
+
+    @pyqtSlot()
+    def poll(self):
+        """
+        Ask for the daemon's latest snapshot; it is served from the daemon's cache.
+        """
+        if self.connected():
+            self.send({"type": "refresh"})
+        else:
+            self.connect_to_daemon()
+            self.poll_deferred.emit(RECONNECT_INTERVAL)
+
+    @pyqtSlot()
+    def fetch_queue(self):
+        if self.connected():
+            self.send({"type": "queue"})
+
+    @pyqtSlot(str, int)
+    def fetch_queue_page(self, source, offset):
+        if self.connected():
+            self.send({"type": "page", "source": source, "offset": offset})
+        else:
+            self.queue_page_failed.emit(source, offset)
+
+    @pyqtSlot(list)
+    def fetch_saved_tracks(self, track_ids):
+        if self.connected():
+            self.send({"type": "saved", "ids": track_ids})
+
+    @pyqtSlot()
+    def drain(self):
+        """
+        Send the next queued command once the previous one was answered.
+        Clicks arriving meanwhile keep merging in the local command queue.
+        """
+        if self.in_flight is not None or not self.connected():
+            return
+        command = self.commands.take()
+        if command is None:
+            return
+        self.in_flight = command
+        self.send({"type": "command", "name": command.name, "argument": command.argument})
+
+    def fail_in_flight(self, error):
+        command = self.in_flight
+        if command is None:
+            return
+        self.in_flight = None
+        self.commands.done()
+        self.command_failed.emit(command.name, error)
+
+    def read_messages(self):
+        while self.socket.canReadLine():
+            line = bytes(self.socket.readLine()).decode("utf-8")
+            try:
+                self.handle_message(json.loads(line))
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Error reading daemon message: {e}")
+
+    def handle_message(self, message):
+        kind = message["type"]
+        if kind == "playback":
+            state = message["state"]
+            self.playback_updated.emit(PlaybackState.from_message(state) if state else None)
+        elif kind == "queue":
+            # Like the playback worker's queue read, it feeds both the prefetch and the panel
+            queue = [QueuedTrack.from_message(track) for track in message["tracks"]]
+            self.queue_updated.emit(upcoming(queue, PREFETCH_DEPTH))
+            self.queue_page_ready.emit(QUEUE_SOURCE, 0, queue, len(queue), len(queue))
+        elif kind == "page":
+            self.queue_page_ready.emit(
+                message["source"], message["offset"],
+                [QueuedTrack.from_message(track) for track in message["tracks"]],
+                message["next_offset"], message["total"],
+            )
+        elif kind == "saved":
+            self.saved_tracks_ready.emit(message["states"])
+        elif kind == "page_failed":
+            self.queue_page_failed.emit(message["source"], message["offset"])
+        elif kind == "deferred":
+            self.poll_deferred.emit(float(message["delay"]))
+        elif kind in ("command_finished", "command_failed"):
+            self.in_flight = None
+            self.commands.done()
+            if kind == "command_finished":
+                self.command_finished.emit(message["name"], message.get("argument"))
+            else:
+                self.command_failed.emit(message["name"], message["error"])
+            self.drain()
@@ -0,0 +1,86 @@
+from instrumentation import endpoint_name, metrics
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Explicit (connect, read) timeouts for every request that goes through the shared session
+CONNECT_TIMEOUT = float(os.getenv("SPOTIFY_WIDGET_CONNECT_TIMEOUT", "3.05"))
+READ_TIMEOUT = float(os.getenv("SPOTIFY_WIDGET_READ_TIMEOUT", "10"))
+TIMEOUT = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    Pooled keep-alive adapter that applies a default timeout to every request
+    and records its latency, status and size in the metrics registry.
+    """
+
+    def __init__(self, timeout=TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        name = endpoint_name(request.method, request.url)
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception:
+            metrics.record_request(name, time.perf_counter() - started, error=True)
+            raise
+        size = response.headers.get("Content-Length")
+        if size is None and not kwargs.get("stream"):
+            size = len(response.content)
+        metrics.record_request(name, time.perf_counter() - started, response.status_code, int(size or 0))
+        return response
+
+
+def get_session():
+    """
+    The process-wide requests session shared by the Spotify client and artwork downloads.
+    Connections are pooled per host and kept alive between requests.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = TimeoutHTTPAdapter(
+                pool_connections=8,  # Distinct hosts: api, accounts and the image CDNs
+                pool_maxsize=4,  # Concurrent connections per host
+                # Only retry failed connects; HTTP errors and 429s are handled by the caller.
+                # urllib3 would otherwise count a GET's 429 with Retry-After as a retry, and
+                # the RetryError spotipy makes of it drops the Retry-After header.
+                max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2,
+                                  respect_retry_after_header=False),
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+    return _session
+
+
+def fetch_bytes(url, stream=False, max_bytes=None, chunk_size=64 * 1024):
+    """
+    GET url through the shared session and return the body.
+    With stream=True the body is read in chunks and aborted once it exceeds max_bytes.
+    """
+    with get_session().get(url, stream=stream) as response:
+        response.raise_for_status()
+        if not stream:
+            return response.content
+
+        chunks = []
+        received = 0
+        for chunk in response.iter_content(chunk_size):
+            received += len(chunk)
+            if max_bytes is not None and received > max_bytes:
+                raise ValueError(f"Response from {url} exceeds {max_bytes} bytes")
+            chunks.append(chunk)
+        return b"".join(chunks)
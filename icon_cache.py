@@ -0,0 +1,47 @@
+from PyQt5.QtCore import Qt, QByteArray
+from PyQt5.QtGui import QIcon, QPixmap, QPainter
+from PyQt5.QtSvg import QSvgRenderer
+
+
+class IconCache:
+    """
+    Reads each SVG asset once and rasterizes (color, size, device pixel ratio) variants
+    lazily. Repeated requests hand out the same shared QIcon.
+    """
+
+    def __init__(self):
+        self._sources = {}  # path -> SVG text
+        self._renderers = {}  # (path, color) -> QSvgRenderer
+        self._icons = {}  # (path, color, size, ratio) -> QIcon
+
+    def renderer(self, svg_path, color):
+        key = (svg_path, color)
+        renderer = self._renderers.get(key)
+        if renderer is None:
+            source = self._sources.get(svg_path)
+            if source is None:
+                with open(svg_path, "r") as file:
+                    source = self._sources[svg_path] = file.read()
+            # The assets are drawn in black; recolor by replacing the fill color
+            renderer = QSvgRenderer(QByteArray(source.replace("black", color).encode("utf-8")))
+            self._renderers[key] = renderer
+        return renderer
+
+    def icon(self, svg_path, color, size, ratio=1.0):
+        """
+        QIcon of the asset in the given color, rendered at size logical pixels
+        for a screen with the given device pixel ratio.
+        """
+        key = (svg_path, color, size, ratio)
+        icon = self._icons.get(key)
+        if icon is None:
+            pixels = max(1, round(size * ratio))
+            pixmap = QPixmap(pixels, pixels)
+            pixmap.fill(Qt.transparent)  # Transparent background
+            painter = QPainter(pixmap)
+            painter.setRenderHint(QPainter.Antialiasing)
+            self.renderer(svg_path, color).render(painter)
+            painter.end()
+            pixmap.setDevicePixelRatio(ratio)
+            icon = self._icons[key] = QIcon(pixmap)
+        return icon
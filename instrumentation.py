@@ -0,0 +1,297 @@
+from collections import deque
+from urllib.parse import urlparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+
+# Latency histogram bucket upper bounds, in milliseconds
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
+
+METRICS_FILE = os.getenv("SPOTIFY_WIDGET_METRICS_FILE")
+METRICS_INTERVAL = float(os.getenv("SPOTIFY_WIDGET_METRICS_INTERVAL", "10"))
+STALL_THRESHOLD = float(os.getenv("SPOTIFY_WIDGET_STALL_THRESHOLD_MS", "200")) / 1000
+# The stall watchdog wakes the GUI every 50 ms, so it only runs when asked for: with this
+# flag, when metrics are exported, or while the debug HUD is shown
+STALL_WATCHDOG = os.getenv("SPOTIFY_WIDGET_STALL_WATCHDOG", "1" if METRICS_FILE else "0") == "1"
+
+# Spotify IDs are 22 base62 characters; they are collapsed so endpoints group together
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+
+
+def endpoint_name(method, url):
+    """
+    Low-cardinality label for a request, e.g. "GET /v1/me/player" or "GET i.scdn.co/image".
+    """
+    parsed = urlparse(url)
+    if "/v1/" in parsed.path:
+        path = parsed.path[parsed.path.index("/v1/"):]
+        segments = ["{id}" if _SPOTIFY_ID.match(segment) else segment for segment in path.split("/")]
+        return f"{method} {'/'.join(segments)}"
+    if "accounts.spotify.com" in parsed.netloc:
+        return f"{method} accounts{parsed.path}"
+    # Artwork and other CDNs: host plus first path segment
+    first = parsed.path.strip("/").split("/")[0]
+    return f"{method} {parsed.netloc}/{first}"
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+
+    def observe(self, value_ms):
+        for index, bound in enumerate(BUCKETS_MS):
+            if value_ms <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum_ms += value_ms
+
+    def percentile(self, fraction):
+        """
+        Upper bound of the bucket holding the given fraction of observations.
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return BUCKETS_MS[-1]
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.latency = Histogram()
+        self.errors = 0
+        self.rate_limited = 0
+        self.bytes = 0
+
+
+class Metrics:
+    """
+    Process-wide registry of per-endpoint request metrics and event-loop stalls.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints = {}
+        self.stalls = deque(maxlen=20)  # Most recent stalls, with the stack that caused them
+        self.stall_count = 0
+        self.gauges = {}  # name -> callable returning a dict, e.g. the request scheduler's stats
+
+    def _endpoint(self, name):
+        endpoint = self.endpoints.get(name)
+        if endpoint is None:
+            endpoint = self.endpoints[name] = EndpointMetrics()
+        return endpoint
+
+    def record_request(self, name, seconds, status=None, size=0, error=False):
+        with self._lock:
+            endpoint = self._endpoint(name)
+            endpoint.latency.observe(seconds * 1000)
+            endpoint.bytes += size
+            if error or (status is not None and status >= 400):
+                endpoint.errors += 1
+            if status == 429:
+                endpoint.rate_limited += 1
+
+    def record_stall(self, seconds, stack):
+        with self._lock:
+            self.stall_count += 1
+            self.stalls.append({"at": time.time(), "duration_ms": round(seconds * 1000, 1), "stack": stack})
+
+    def add_gauge(self, name, provider):
+        self.gauges[name] = provider
+
+    def snapshot(self):
+        """
+        Plain-dict view of every metric, as exported to JSON.
+        """
+        with self._lock:
+            endpoints = {
+                name: {
+                    "count": endpoint.latency.count,
+                    "latency_ms_sum": round(endpoint.latency.sum_ms, 1),
+                    "latency_ms_p50": endpoint.latency.percentile(0.5),
+                    "latency_ms_p95": endpoint.latency.percentile(0.95),
+                    "buckets": dict(zip([str(bound) for bound in BUCKETS_MS], endpoint.latency.counts)),
+                    "errors": endpoint.errors,
+                    "rate_limited": endpoint.rate_limited,
+                    "bytes": endpoint.bytes,
+                }
+                for name, endpoint in self.endpoints.items()
+            }
+            stalls = {"count": self.stall_count, "recent": list(self.stalls)}
+        gauges = {}
+        for name, provider in list(self.gauges.items()):
+            try:
+                gauges[name] = provider()
+            except Exception as e:
+                gauges[name] = {"error": str(e)}
+        return {"timestamp": time.time(), "endpoints": endpoints, "stalls": stalls, "gauges": gauges}
+
+    def prometheus(self):
+        """
+        The metrics in Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            "# TYPE spotify_widget_request_latency_ms histogram",
+        ]
+        for name, endpoint in snapshot["endpoints"].items():
+            label = f'endpoint="{name}"'
+            cumulative = 0
+            for bound, count in endpoint["buckets"].items():
+                cumulative += count
+                le = "+Inf" if bound == "inf" else bound
+                lines.append(f'spotify_widget_request_latency_ms_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"spotify_widget_request_latency_ms_sum{{{label}}} {endpoint['latency_ms_sum']}")
+            lines.append(f"spotify_widget_request_latency_ms_count{{{label}}} {endpoint['count']}")
+        for metric in ("errors", "rate_limited", "bytes"):
+            lines.append(f"# TYPE spotify_widget_request_{metric}_total counter")
+            for name, endpoint in snapshot["endpoints"].items():
+                lines.append(f'spotify_widget_request_{metric}_total{{endpoint="{name}"}} {endpoint[metric]}')
+        lines.append("# TYPE spotify_widget_event_loop_stalls_total counter")
+        lines.append(f"spotify_widget_event_loop_stalls_total {snapshot['stalls']['count']}")
+        for gauge, values in snapshot["gauges"].items():
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"spotify_widget_{gauge}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """
+        Short multi-line text for the debug HUD.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, endpoint in sorted(snapshot["endpoints"].items()):
+            lines.append(
+                f"{name}: n={endpoint['count']} p50<={endpoint['latency_ms_p50']:g}ms "
+                f"p95<={endpoint['latency_ms_p95']:g}ms err={endpoint['errors']} 429={endpoint['rate_limited']}"
+            )
+        lines.append(f"event-loop stalls: {snapshot['stalls']['count']}")
+        scheduler = snapshot["gauges"].get("scheduler")
+        if scheduler and "tokens" in scheduler:
+            lines.append(
+                f"budget: {scheduler['tokens']} tokens, retry-after {scheduler['retry_after_remaining']}s, "
+                f"backoff {scheduler['background_backoff_remaining']}s"
+            )
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+
+
+class MetricsExporter:
+    """
+    Periodically writes the metrics to a file: Prometheus text for *.prom, JSON otherwise.
+    """
+
+    def __init__(self, path=METRICS_FILE, interval=METRICS_INTERVAL, registry=metrics):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.path:
+            return
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        if self.path.endswith(".prom"):
+            content = self.registry.prometheus()
+        else:
+            content = json.dumps(self.registry.snapshot(), indent=2)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as file:
+                file.write(content)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing metrics: {e}")
+
+
+class StallWatchdog:
+    """
+    Detects Qt event-loop stalls. A GUI-thread timer records heartbeats and a watcher
+    thread captures the GUI thread's stack once a heartbeat is later than the threshold.
+    Paused, neither the timer nor the watcher wakes up.
+    """
+
+    def __init__(self, threshold=STALL_THRESHOLD, registry=metrics):
+        from PyQt5.QtCore import QTimer
+
+        self.threshold = threshold
+        self.registry = registry
+        self.gui_thread_id = threading.get_ident()  # Created on the GUI thread
+        self.last_beat = time.monotonic()
+        self.stall_stack = None
+        self._stop = threading.Event()
+        self._running = threading.Event()
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.beat)
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+        self.resume()
+
+    def pause(self):
+        """
+        Stop watching, e.g. while nobody can see the widget.
+        """
+        self._running.clear()
+        self.timer.stop()
+
+    def resume(self):
+        if self._running.is_set():
+            return
+        self.stall_stack = None
+        self.last_beat = time.monotonic()
+        self.timer.start(int(self.threshold * 1000 / 4))
+        self._running.set()
+
+    def beat(self):
+        now = time.monotonic()
+        stack = self.stall_stack
+        if stack is not None:
+            # The stall is over; record its full length with the stack captured during it
+            self.stall_stack = None
+            duration = now - self.last_beat
+            self.registry.record_stall(duration, stack)
+            print(f"Event loop stalled for {duration * 1000:.0f} ms in:\n{stack}")
+        self.last_beat = now
+
+    def _watch(self):
+        while self._running.wait() and not self._stop.wait(self.threshold / 2):
+            if (self._running.is_set() and self.stall_stack is None
+                    and time.monotonic() - self.last_beat > self.threshold):
+                frame = sys._current_frames().get(self.gui_thread_id)
+                if frame is not None:
+                    self.stall_stack = "".join(traceback.format_stack(frame))
+
+    def stop(self):
+        self._stop.set()
+        self._running.set()  # Wake a paused watcher so it can exit
+        self.timer.stop()
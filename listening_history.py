@@ -0,0 +1,376 @@
+"""
+Local listening history, recorded from the playback snapshots the widget already receives.
+
+Plays go to SQLite in WAL mode through a batching writer thread, so neither the GUI
+thread nor the poll loop waits on disk. Queries run on their own connection.
+
+    python listening_history.py top --days 30
+    python listening_history.py recent -n 20
+    python listening_history.py export history.json.gz
+    python listening_history.py compact --retention-days 730
+"""
+import argparse
+import gzip
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+HISTORY_ENABLED = os.getenv("SPOTIFY_WIDGET_HISTORY", "1") != "0"
+# User data, not cache: cache cleaners empty ~/.cache, and a history cannot be refetched
+DATA_DIR = os.getenv(
+    "SPOTIFY_WIDGET_DATA_DIR",
+    os.path.join(os.getenv("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share"),
+                 "spotify-widget"),
+)
+HISTORY_DB = os.getenv("SPOTIFY_WIDGET_HISTORY_DB", os.path.join(DATA_DIR, "history.sqlite3"))
+# Keep a slow heartbeat poll while the screen is locked, so plays during the lock are
+# recorded too. Off by default: a lock suspends polling and those plays are missed.
+HISTORY_WHILE_LOCKED = os.getenv("SPOTIFY_WIDGET_HISTORY_WHILE_LOCKED", "0") == "1"
+# Plays older than this are dropped by compaction; 0 keeps everything
+RETENTION_DAYS = int(os.getenv("SPOTIFY_WIDGET_HISTORY_RETENTION_DAYS", "0"))
+
+# Spotify counts a stream after 30 s; shorter tracks count after half their length
+MIN_PLAY_MS = 30000
+BATCH_SIZE = 100
+FLUSH_INTERVAL = 5.0  # Seconds a play may wait in the buffer
+COMPACT_INTERVAL = 24 * 60 * 60  # Seconds between automatic compactions
+EXPORT_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    spotify_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    artist_name TEXT NOT NULL,  -- Credited artists joined for display
+    album_name TEXT NOT NULL,
+    duration_ms INTEGER NOT NULL
+);
+-- One row per credited artist, so a collaboration counts for each of them
+CREATE TABLE IF NOT EXISTS track_artists (
+    track_id INTEGER NOT NULL REFERENCES tracks(id) ON DELETE CASCADE,
+    artist_id INTEGER NOT NULL REFERENCES artists(id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (track_id, artist_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plays (
+    started_at INTEGER NOT NULL,  -- Unix seconds
+    track_id INTEGER NOT NULL REFERENCES tracks(id),
+    played_ms INTEGER NOT NULL
+);
+-- Covering index: time-range aggregates and "last N" never touch the table
+CREATE INDEX IF NOT EXISTS plays_by_time ON plays (started_at, track_id, played_ms);
+CREATE INDEX IF NOT EXISTS track_artists_by_artist ON track_artists (artist_id, track_id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")  # Durable enough for a history, and fast
+    connection.execute("PRAGMA foreign_keys=ON")
+    return connection
+
+
+class PlayTracker:
+    """
+    Turns a stream of PlaybackStates into finished plays.
+    A play ends when the track changes, restarts on repeat, or playback stops.
+    Only time actually listened counts: between two snapshots a playing track is credited
+    with its progress, capped by the wall-clock time that passed, so seeks add nothing.
+    """
+
+    def __init__(self, record):
+        self.record = record  # Called with (started_at, state, played_ms)
+        self.state = None
+        self.observed_at = None  # Wall-clock time of self.state
+        self.started_at = None
+        self.played_ms = 0
+
+    def observe(self, state, now=None):
+        now = time.time() if now is None else now
+        current = self.state
+        if current is not None:
+            elapsed_ms = max(0.0, (now - self.observed_at) * 1000)
+            if (state is None
+                    or state.track_id != current.track_id
+                    # Same track from the top again after nearly finishing it: repeat-one
+                    or (state.track_progress + 5000 < current.track_progress
+                        and current.track_progress > current.track_duration * 0.9)):
+                if current.is_playing:
+                    # The old track played on until it ended, as far as the elapsed time allows
+                    played_since = elapsed_ms - (state.track_progress if state else 0)
+                    self.played_ms += max(0, min(current.track_duration - current.track_progress, played_since))
+                self.finish()
+            elif current.is_playing:
+                self.played_ms += max(0, min(state.track_progress - current.track_progress, elapsed_ms))
+        if state is None:
+            return
+        if self.state is None:
+            self.started_at = now - state.track_progress / 1000
+            self.played_ms = 0
+        self.state = state
+        self.observed_at = now
+
+    def finish(self):
+        state, self.state = self.state, None
+        if state is None:
+            return
+        played_ms = int(min(self.played_ms, state.track_duration))
+        if played_ms >= min(MIN_PLAY_MS, state.track_duration // 2):
+            self.record(int(self.started_at), state, played_ms)
+
+
+class ListeningHistory:
+    """
+    SQLite store of plays. observe() is cheap and can be called from any thread;
+    writes are batched on a writer thread and queries use a separate connection.
+    """
+
+    def __init__(self, path=HISTORY_DB, retention_days=RETENTION_DAYS):
+        self.path = path
+        self.retention_days = retention_days
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.tracker = PlayTracker(self.enqueue)
+        self._queue = queue.Queue()
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def observe(self, state):
+        self.tracker.observe(state)
+
+    def enqueue(self, started_at, state, played_ms):
+        self._queue.put((started_at, state.track_id, state.track_name, state.artist_name,
+                         state.album_name, state.track_duration, played_ms,
+                         state.artist_names or (state.artist_name,)))
+
+    def close(self):
+        """
+        Record the play in progress and write everything still buffered.
+        """
+        self.tracker.finish()
+        self._queue.put(None)
+        self._writer.join()
+        if self._reader is not None:
+            self._reader.close()
+
+    def _run(self):
+        connection = connect(self.path)
+        connection.executescript(SCHEMA)
+        self._maybe_compact(connection)
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._write(connection, batch)
+            except sqlite3.Error as e:
+                print(f"Error writing listening history: {e}")
+        connection.close()
+
+    def _write(self, connection, batch):
+        with connection:
+            credits = [(play[1], position, name) for play in batch for position, name in enumerate(play[7])]
+            connection.executemany(
+                "INSERT OR IGNORE INTO artists (name) VALUES (?)", [(name,) for _, _, name in credits]
+            )
+            connection.executemany(
+                """
+                INSERT INTO tracks (spotify_id, name, artist_name, album_name, duration_ms)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (spotify_id) DO NOTHING
+                """,
+                [(play[1], play[2], play[3], play[4], play[5]) for play in batch],
+            )
+            connection.executemany(
+                """
+                INSERT OR IGNORE INTO track_artists (track_id, artist_id, position)
+                VALUES ((SELECT id FROM tracks WHERE spotify_id = ?), (SELECT id FROM artists WHERE name = ?), ?)
+                """,
+                [(spotify_id, name, position) for spotify_id, position, name in credits],
+            )
+            connection.executemany(
+                "INSERT INTO plays (started_at, track_id, played_ms) "
+                "VALUES (?, (SELECT id FROM tracks WHERE spotify_id = ?), ?)",
+                [(play[0], play[1], play[6]) for play in batch],
+            )
+
+    def _maybe_compact(self, connection):
+        row = connection.execute("SELECT value FROM meta WHERE key = 'compacted_at'").fetchone()
+        if row is None or time.time() - float(row[0]) > COMPACT_INTERVAL:
+            try:
+                compact(connection, self.retention_days)
+            except sqlite3.Error as e:
+                print(f"Error compacting listening history: {e}")
+
+    def _read(self, sql, parameters=()):
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = connect(self.path)
+                self._reader.executescript(SCHEMA)  # The writer may not have created it yet
+            return self._reader.execute(sql, parameters).fetchall()
+
+    def top_tracks(self, since, until=None, limit=10):
+        """
+        [(track, artist, plays, played_ms)] for plays started in [since, until), Unix seconds.
+        """
+        return self._read(
+            """
+            SELECT tracks.name, tracks.artist_name, counts.plays, counts.played_ms
+            FROM (SELECT track_id, COUNT(*) AS plays, SUM(played_ms) AS played_ms
+                  FROM plays WHERE started_at >= ? AND started_at < ?
+                  GROUP BY track_id ORDER BY plays DESC, played_ms DESC LIMIT ?) AS counts
+            JOIN tracks ON tracks.id = counts.track_id
+            ORDER BY counts.plays DESC, counts.played_ms DESC
+            """,
+            (int(since), int(until if until is not None else time.time() + 1), limit),
+        )
+
+    def top_artists(self, since, until=None, limit=10):
+        """
+        [(artist, plays, played_ms)] for plays started in [since, until), Unix seconds.
+        A collaboration counts in full for each credited artist.
+        """
+        return self._read(
+            """
+            SELECT artists.name, SUM(counts.plays) AS plays, SUM(counts.played_ms) AS played_ms
+            FROM (SELECT track_id, COUNT(*) AS plays, SUM(played_ms) AS played_ms
+                  FROM plays WHERE started_at >= ? AND started_at < ? GROUP BY track_id) AS counts
+            JOIN track_artists ON track_artists.track_id = counts.track_id
+            JOIN artists ON artists.id = track_artists.artist_id
+            GROUP BY artists.id ORDER BY plays DESC, played_ms DESC LIMIT ?
+            """,
+            (int(since), int(until if until is not None else time.time() + 1), limit),
+        )
+
+    def recent_plays(self, limit=20):
+        """
+        [(started_at, track, artist, played_ms)], most recent first.
+        """
+        return self._read(
+            """
+            SELECT recent.started_at, tracks.name, tracks.artist_name, recent.played_ms
+            FROM (SELECT started_at, track_id, played_ms FROM plays ORDER BY started_at DESC LIMIT ?) AS recent
+            JOIN tracks ON tracks.id = recent.track_id
+            ORDER BY recent.started_at DESC
+            """,
+            (limit,),
+        )
+
+
+def compact(connection, retention_days=RETENTION_DAYS):
+    """
+    Drop plays past the retention period and tracks and artists no play refers to, then
+    shrink the file and refresh the query planner's statistics.
+    """
+    with connection:
+        if retention_days > 0:
+            connection.execute("DELETE FROM plays WHERE started_at < ?", (int(time.time() - retention_days * 86400),))
+        connection.execute("DELETE FROM tracks WHERE id NOT IN (SELECT DISTINCT track_id FROM plays)")
+        connection.execute("DELETE FROM artists WHERE id NOT IN (SELECT DISTINCT artist_id FROM track_artists)")
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compacted_at', ?)", (str(time.time()),))
+    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    connection.execute("VACUUM")
+    connection.execute("PRAGMA optimize")
+
+
+def export(connection, path):
+    """
+    Write the history as gzipped JSON: a track table plus plays as
+    [seconds since the previous play, track index, played_ms] triples.
+    """
+    tracks = {}
+    rows = []
+    for track_id, started_at, played_ms in connection.execute(
+            "SELECT track_id, started_at, played_ms FROM plays ORDER BY started_at"):
+        rows.append((started_at, tracks.setdefault(track_id, len(tracks)), played_ms))
+    credits = {}
+    for track_id, artist in connection.execute(
+            "SELECT track_id, artists.name FROM track_artists JOIN artists ON artists.id = artist_id "
+            "ORDER BY track_id, position"):
+        credits.setdefault(track_id, []).append(artist)
+    track_rows = {
+        track_id: [spotify_id, name, credits.get(track_id, [artist_name]), album_name, duration_ms]
+        for track_id, spotify_id, name, artist_name, album_name, duration_ms in connection.execute(
+            "SELECT id, spotify_id, name, artist_name, album_name, duration_ms FROM tracks")
+    }
+    plays = []
+    previous = 0
+    for started_at, index, played_ms in rows:
+        plays.append([started_at - previous, index, played_ms])
+        previous = started_at
+    document = {
+        "version": EXPORT_VERSION,
+        "fields": {"tracks": ["id", "name", "artists", "album", "duration_ms"],
+                   "plays": ["delta_started_at", "track", "played_ms"]},
+        "tracks": [track_rows[track_id] for track_id in sorted(tracks, key=tracks.get)],
+        "plays": plays,
+    }
+    with gzip.open(path, "wt", encoding="utf-8") as file:
+        json.dump(document, file, separators=(",", ":"))
+    return len(plays)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query and maintain the local listening history.")
+    parser.add_argument("--db", default=HISTORY_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    top = commands.add_parser("top", help="Top tracks and artists")
+    top.add_argument("--days", type=float, default=30)
+    top.add_argument("-n", type=int, default=10)
+    recent = commands.add_parser("recent", help="Most recent plays")
+    recent.add_argument("-n", type=int, default=20)
+    export_command = commands.add_parser("export", help="Write a compact gzipped JSON export")
+    export_command.add_argument("path")
+    compact_command = commands.add_parser("compact", help="Apply retention and shrink the database")
+    compact_command.add_argument("--retention-days", type=int, default=RETENTION_DAYS)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.db)), exist_ok=True)
+    connection = connect(args.db)
+    connection.executescript(SCHEMA)
+    if args.command == "top":
+        history = ListeningHistory(args.db)
+        since = time.time() - args.days * 86400
+        print("Top tracks:")
+        for name, artist, plays, played_ms in history.top_tracks(since, limit=args.n):
+            print(f"  {plays:4d}  {name} - {artist}")
+        print("Top artists:")
+        for artist, plays, played_ms in history.top_artists(since, limit=args.n):
+            print(f"  {plays:4d}  {artist}")
+        history.close()
+    elif args.command == "recent":
+        history = ListeningHistory(args.db)
+        for started_at, name, artist, played_ms in history.recent_plays(args.n):
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(started_at))}  {name} - {artist}")
+        history.close()
+    elif args.command == "export":
+        print(f"Exported {export(connection, args.path)} plays to {args.path}")
+    elif args.command == "compact":
+        compact(connection, args.retention_days)
+        print("Listening history compacted.")
+    connection.close()
@@ -1,27 +1,192 @@
-from PyQt5.QtCore import Qt, QPoint, QByteArray, QTimer
-from PyQt5.QtGui import QIcon, QPixmap, QPainter, QFontDatabase, QFont
-from PyQt5.QtSvg import QSvgRenderer
-from PyQt5.QtWidgets import QApplication, QLabel, QMainWindow, QPushButton, QSlider
-from spotify_auth import sp
-import requests
-from io import BytesIO
+from startup_timing import startup_timer  # Imported first so it starts the startup clock
+from PyQt5.QtCore import Qt, QPoint, QSize, QTimer, QThread, pyqtSignal
+from PyQt5.QtGui import QPixmap, QFontDatabase, QFont
+from PyQt5.QtWidgets import QApplication, QLabel, QListView, QMainWindow, QPushButton, QSlider, QWidget
+from activity_monitor import ActivityMonitor
+from album_art_cache import PixmapCache, pick_image
+from command_queue import CommandQueue
+from dataclasses import replace
+from icon_cache import IconCache
+from instrumentation import STALL_WATCHDOG, MetricsExporter, StallWatchdog, metrics
+from listening_history import HISTORY_ENABLED, HISTORY_WHILE_LOCKED, ListeningHistory
+from palette import DYNAMIC_THEME, PaletteCache
+from playback_daemon import SOCKET_PATH, PlaybackDaemon
+from playback_diff import diff_playback
+from playback_worker import CommandWorker, PlaybackWorker
+from poll_scheduler import PollScheduler
+from queue_model import THUMBNAIL_SIZE, QueueModel
+from request_scheduler import RequestScheduler
+from saved_tracks import is_spotify_id
+from theme import DARK, LIGHT, STYLESHEETS, compile_palette_stylesheet, theme_for_palette
+from transport import LIBRARY_COMMANDS, QUEUE_SOURCE, REPEAT_MODES
+import argparse
+import gc
+import os
+import sys
+import time
+
+startup_timer.mark("imports")
+
+# Paint the frame with placeholders first, then hydrate fonts and playback state
+FAST_START = os.getenv("SPOTIFY_WIDGET_FAST_START", "1") != "0"
+
+# Show live request and stall metrics over the widget (also toggled with F3)
+DEBUG_HUD = os.getenv("SPOTIFY_WIDGET_DEBUG_HUD", "0") == "1"
+
+
+def format_time(milliseconds):
+    """
+    Format a position as m:ss.
+    """
+    seconds = max(0, milliseconds) // 1000
+    return f"{seconds // 60}:{seconds % 60:02d}"
 
 
 class SpotifyWidget(QMainWindow):
-    def __init__(self, screen_width, screen_height):
+    # Requests to the playback worker, delivered across threads as queued signals
+    poll_requested = pyqtSignal()
+    commands_queued = pyqtSignal()
+    album_art_requested = pyqtSignal(object)
+    album_art_prefetch_requested = pyqtSignal(list)
+    queue_requested = pyqtSignal()
+    palette_requested = pyqtSignal(str, str)  # (album ID, album image URL)
+    saved_tracks_requested = pyqtSignal(list)  # Track IDs
+    worker_shutdown_requested = pyqtSignal()
+
+    def __init__(self, screen_width, screen_height, fast_start=FAST_START, daemon_socket=None):
         super().__init__()
+        self.fast_start = fast_start
+        self.daemon_socket = daemon_socket  # Attach to a playback daemon instead of polling Spotify
+        self.hydrated = False
         self.screen_width = int(screen_width)
         self.screen_height = int(screen_height)
-        current_playback = sp.current_playback()
-        if current_playback and current_playback['is_playing']:
-            self.music_paused = False
-        else: 
-            self.music_paused = True
+        self.music_paused = True  # Corrected by the first playback snapshot
         self.dark_mode_enabled = False
+        self.theme = LIGHT
         self.music_shuffled = False
+        self.saved_states = {}  # Track ID -> liked, as last reported or optimistically set
+        self.dynamic_theme = DYNAMIC_THEME
+        self.palette = None  # Palette of the album on screen, colors the theme when set
+        self.palettes = PaletteCache()
+        self.palette_pending = set()  # Album IDs whose palette the worker is extracting
+        self.current_playback = None  # PlaybackState on screen, possibly optimistic
+        self.authoritative_playback = None  # Last PlaybackState received from the worker
+        self.previewed_from_track_id = None  # Track we moved away from before Spotify confirmed it
+        self.command_queue = CommandQueue()
+        self.album_art_key = None  # (url, width, height) currently shown or requested
+        self.album_art_cache = PixmapCache()
+        self.album_art_pending = set()  # Keys requested from the worker but not delivered yet
+        self.upcoming_tracks = []  # Prefetched QueuedTracks, next track first
+        self.show_playlist = False  # Up Next panel lists the playing playlist instead of the queue
+        self.history = None  # ListeningHistory, opened when hydrating; the daemon records when attached
+        self.poll_scheduler = PollScheduler()
+        self.icon_cache = IconCache()
+        self.button_icons = {}  # button -> icon cache key it currently shows
+        self.init_worker()
         self.init_ui()
+        self.init_instrumentation()
+        self.init_activity()
         self.offset = None  # For tracking window movement
 
+    def init_worker(self):
+        """
+        Start the background and interactive workers on their own threads and wire up their signals.
+        Both share one request scheduler, so commands take priority over polls.
+        With a daemon socket, playback, queue and commands go through the daemon instead and
+        the playback worker only loads album art.
+        """
+        self.scheduler = RequestScheduler()
+        self.worker_thread = QThread(self)
+        self.worker = PlaybackWorker(scheduler=self.scheduler)
+        self.worker.moveToThread(self.worker_thread)
+        self.worker_thread.finished.connect(self.worker.deleteLater)
+        self.worker_threads = [self.worker_thread]
+
+        if self.daemon_socket:
+            from daemon_client import DaemonClient  # Only needed in thin-client mode
+
+            self.playback_source = self.command_worker = DaemonClient(self.command_queue, self.daemon_socket, self)
+        else:
+            self.playback_source = self.worker
+            self.command_thread = QThread(self)
+            self.command_worker = CommandWorker(self.worker.store, self.scheduler, self.command_queue,
+                                                self.worker.saved_tracks)
+            self.command_worker.moveToThread(self.command_thread)
+            self.command_thread.finished.connect(self.command_worker.deleteLater)
+            self.worker_threads.append(self.command_thread)
+
+        self.poll_requested.connect(self.playback_source.poll)
+        self.commands_queued.connect(self.command_worker.drain)
+        self.album_art_requested.connect(self.worker.fetch_album_art)
+        self.album_art_prefetch_requested.connect(self.worker.prefetch_album_art)
+        self.queue_requested.connect(self.playback_source.fetch_queue)
+        self.playback_source.queue_updated.connect(self.on_queue_updated)
+        self.playback_source.playback_updated.connect(self.update_progress_bar)
+        self.playback_source.poll_deferred.connect(self.on_poll_deferred)
+        self.saved_tracks_requested.connect(self.playback_source.fetch_saved_tracks)
+        self.playback_source.saved_tracks_ready.connect(self.on_saved_tracks_ready)
+        self.worker.album_art_ready.connect(self.set_album_art)
+        self.worker.album_art_failed.connect(self.on_album_art_failed)
+        self.palette_requested.connect(self.worker.extract_palette)
+        self.worker.palette_ready.connect(self.on_palette_ready)
+        self.command_worker.command_finished.connect(self.on_command_finished)
+        self.command_worker.command_failed.connect(self.on_command_failed)
+        # Blocking, so the pools are stopped before the worker thread is asked to quit
+        self.worker_shutdown_requested.connect(self.worker.shutdown, Qt.BlockingQueuedConnection)
+
+        for thread in self.worker_threads:
+            thread.start()
+
+    def init_instrumentation(self):
+        """
+        Start the metrics file exporter, and the stall watchdog and debug HUD when enabled.
+        """
+        metrics.add_gauge("scheduler", self.scheduler.stats)
+        self.stall_watchdog = StallWatchdog() if STALL_WATCHDOG else None
+        self.metrics_exporter = MetricsExporter()
+        self.metrics_exporter.start()
+
+        self.debug_hud = QLabel("", self)
+        self.debug_hud.setObjectName("debugHud")
+        self.debug_hud.setGeometry(10, 370, 830, 120)
+        self.debug_hud.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.debug_hud.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.debug_hud_timer = QTimer(self)
+        self.debug_hud_timer.timeout.connect(self.refresh_debug_hud)
+        self.set_debug_hud_visible(DEBUG_HUD)
+
+    def init_activity(self):
+        """
+        Slow down or suspend polling and progress redraws while nobody watches the widget.
+        """
+        self.activity = ActivityMonitor(self)
+        self.activity.resumed.connect(self.on_activity_resumed)
+        self.activity.hidden.connect(self.suspend_redraws)
+
+    def set_debug_hud_visible(self, visible):
+        self.debug_hud.setVisible(visible)
+        if visible:
+            if self.stall_watchdog is None:
+                self.stall_watchdog = StallWatchdog()  # The HUD reports its stalls
+            self.debug_hud.raise_()
+            self.refresh_debug_hud()
+            self.debug_hud_timer.start(1000)
+        else:
+            self.debug_hud_timer.stop()
+            if self.stall_watchdog and not STALL_WATCHDOG:
+                # Started for the HUD only; otherwise resume_redraws would keep restarting it
+                self.stall_watchdog.stop()
+                self.stall_watchdog = None
+
+    def refresh_debug_hud(self):
+        self.debug_hud.setText(metrics.summary())
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_F3:
+            self.set_debug_hud_visible(not self.debug_hud.isVisible())
+        else:
+            super().keyPressEvent(event)
+
     def init_ui(self):
         self.setWindowTitle("Spotify Widget")
         self.setWindowFlags(Qt.FramelessWindowHint) #| Qt.WindowStaysOnTopHint
@@ -33,121 +198,74 @@ class SpotifyWidget(QMainWindow):
             int(500),
         )
 
-        # Set transparent background
-        self.setStyleSheet("background-color: rgba(0, 0, 0, 75);")
- 
+        # Styling comes from the application-wide theme stylesheet, matched by object name
+        self.setObjectName("spotifyWidget")
+
         # background plane label
         self.background_plane = QLabel("", self)
-        self.background_plane.setStyleSheet(
-            """
-            background-color: rgba(255, 255, 255, 5);
-            border: 1px solid rgba(255, 255, 255, 10);
-            border-radius: 10px;
-            """
-        )
+        self.background_plane.setObjectName("backgroundPlane")
         self.background_plane.setGeometry(0, 0, 850, 500)
 
-
-        stylesheet_top_ui = """
-            QPushButton {
-                border: none;
-                background-color: rgba(255, 255, 255, 0);
-                border-radius: 15px;
-            }
-            QPushButton:hover {
-                background-color: #d3d3d3;
-            }
-            """
-
         # Close button
         self.close_button = QPushButton("", self)
         self.close_button.setGeometry(850 - 60, 10, 60, 60)
         self.set_svg_icon(self.close_button, "./assets/svg/x-letter.svg", 0.5)  # Initial icon (black)        
-        self.close_button.setStyleSheet(stylesheet_top_ui)
+        self.close_button.setProperty("buttonRole", "window")
         self.close_button.clicked.connect(self.close)
 
         # Minimize button
         self.minimize_button = QPushButton("", self)
         self.minimize_button.setGeometry(850 - 120, 10, 60, 60)
         self.set_svg_icon(self.minimize_button, "./assets/svg/minus.svg", 0.5)  # Initial icon (black)
-        self.minimize_button.setStyleSheet(stylesheet_top_ui)
+        self.minimize_button.setProperty("buttonRole", "window")
         self.minimize_button.clicked.connect(self.showMinimized)
 
+        # Up Next panel button
+        self.queue_button = QPushButton("", self)
+        self.queue_button.setGeometry(850 - 240, 10, 60, 60)
+        self.set_svg_icon(self.queue_button, "./assets/svg/list.svg", 0.5)
+        self.queue_button.setProperty("buttonRole", "window")
+        self.queue_button.setCheckable(True)  # Checked while the panel is open
+        self.queue_button.clicked.connect(self.toggle_queue_panel)
+
         # Dark/light mode button
         # Update the dark mode button image path based on the current state
-        dark_mode_image_path = "./assets/svg/moon.svg" if self.dark_mode_enabled else "./assets/svg/sun.svg"
         self.dark_mode_switch = QPushButton("", self)
         self.dark_mode_switch.setGeometry(850 - 180, 10, 60, 60)
-        self.set_svg_icon(self.dark_mode_switch, dark_mode_image_path, 0.5)  # Initial icon (black)
-        self.dark_mode_switch.setStyleSheet(stylesheet_top_ui)
+        self.set_svg_icon(self.dark_mode_switch, self.theme.mode_icon, 0.5)
+        self.dark_mode_switch.setProperty("buttonRole", "window")
         self.dark_mode_switch.clicked.connect(self.toggle_dark_mode)
 
-        # Load custom fonts
-        gotham_bold_id = QFontDatabase.addApplicationFont("./assets/fonts/GothamBold.ttf")
-        gotham_light_id = QFontDatabase.addApplicationFont("./assets/fonts/GothamLight.ttf")
-
-        # Get font families
-        gotham_bold_family = QFontDatabase.applicationFontFamilies(gotham_bold_id)[0]
-        gotham_light_family = QFontDatabase.applicationFontFamilies(gotham_light_id)[0]
-
-        # Create specific font styles
-        gotham_bold = QFont(gotham_bold_family, 25)
-        gotham_bold.setBold(True)  # Ensure bold style is explicitly set
-
-        gotham_light = QFont(gotham_light_family, 15)
-        gotham_light.setWeight(QFont.Light)  # Set the light style explicitly
-        
-
-        # Get current track info
-        current_track_info = self.get_current_track_info()
-        if current_track_info:
-            artist_name = current_track_info['artist_name']
-            track_name = current_track_info['track_name']
-        else:
-            artist_name = "Artist"
-            track_name = "Song"
-
-        stylesheet_track_info = """
-            color: "white";
-            background-color: rgba(0, 0, 0, 0);
-            """
+        # Placeholders until the first playback snapshot arrives
+        artist_name = "Artist"
+        track_name = "Song"
 
         # Artist name label
         self.artist_label = QLabel(artist_name, self)
-        self.artist_label.setStyleSheet(stylesheet_track_info)
-        self.artist_label.setFont(gotham_light)
+        self.artist_label.setObjectName("artistLabel")
         self.artist_label.setGeometry(375, 250, 450, 50)
 
         # Song name label
         self.track_label = QLabel(track_name, self)
-        self.track_label.setStyleSheet(stylesheet_track_info)
-        self.track_label.setFont(gotham_bold)
+        self.track_label.setObjectName("trackLabel")
         self.track_label.setGeometry(375, 50, 400, 150)
         self.track_label.setWordWrap(True)
 
+        # Placeholder fonts at the final sizes until the Gotham fonts are loaded
+        self.artist_label.setFont(QFont(self.font().family(), 15, QFont.Light))
+        self.track_label.setFont(QFont(self.font().family(), 25, QFont.Bold))
+
         self.album_art_label = QLabel(self)
         self.album_art_label.setGeometry(50, 50, 275, 275)  # Adjust size and position
+        self.album_art_label.setAlignment(Qt.AlignCenter)
         #self.album_art_label.setStyleSheet("border: 2px solid white;")
-        if current_track_info: self.update_album_art(current_track_info['album_image_url'])  
-
-        media_button_stylesheet = """
-            QPushButton {
-                border: none;
-                background-color: rgba(255, 255, 255, 0);
-                padding: 10px;
-                border-radius: 10px;
-            }
-            QPushButton:hover {
-                background-color: rgba(255, 255, 255, 50);
-            }
-        """
 
         # Play Button with SVG icon
         # Update the play_button_path based on the current state
         self.play_button_path = "./assets/svg/media-play.svg" if self.music_paused else "./assets/svg/media-pause.svg"
         self.media_play_button = QPushButton("", self)
         self.media_play_button.setGeometry(400, 415, 50, 50)
-        self.media_play_button.setStyleSheet(media_button_stylesheet)
+        self.media_play_button.setProperty("buttonRole", "media")
         self.set_svg_icon(self.media_play_button, self.play_button_path, 0.5)  # Initial icon (black)
         self.media_play_button.clicked.connect(self.toggle_music)
 
@@ -155,56 +273,169 @@ class SpotifyWidget(QMainWindow):
         # Next Track Button
         self.next_button = QPushButton("", self)
         self.next_button.setGeometry(550, 415, 50, 50)
-        self.next_button.setStyleSheet(media_button_stylesheet)
+        self.next_button.setProperty("buttonRole", "media")
         self.set_svg_icon(self.next_button, "./assets/svg/media-step-forward.svg", 0.5)  # Initial icon (black)
         self.next_button.clicked.connect(self.next_track)
 
         # Previous Track Button
         self.previous_button = QPushButton("", self)
         self.previous_button.setGeometry(250, 415, 50, 50)
-        self.previous_button.setStyleSheet(media_button_stylesheet)
+        self.previous_button.setProperty("buttonRole", "media")
         self.set_svg_icon(self.previous_button, "./assets/svg/media-step-backward.svg", 0.5)  # Initial icon (black)
         self.previous_button.clicked.connect(self.previous_track)
 
         # Shuffle Track Button
         self.shuffle_button = QPushButton("", self)
         self.shuffle_button.setGeometry(100, 415, 50, 50)
-        self.shuffle_button.setStyleSheet(media_button_stylesheet)
+        self.shuffle_button.setProperty("buttonRole", "media")
         self.set_svg_icon(self.shuffle_button, "./assets/svg/random.svg", 0.5)  # Initial icon (black)
+        self.shuffle_button.setCheckable(True)  # Checked while shuffle is on
         self.shuffle_button.clicked.connect(self.toggle_shuffle_tracks)
 
+        # Repeat Button
+        self.repeat_button = QPushButton("", self)
+        self.repeat_button.setGeometry(700, 415, 50, 50)
+        self.repeat_button.setProperty("buttonRole", "media")
+        self.set_svg_icon(self.repeat_button, "./assets/svg/loop.svg", 0.5)
+        self.repeat_button.setCheckable(True)  # Checked while repeat is on, "1" when repeating the track
+        self.repeat_button.clicked.connect(self.cycle_repeat)
+
+        # Like Button
+        self.like_button = QPushButton("", self)
+        self.like_button.setGeometry(775, 415, 50, 50)
+        self.like_button.setProperty("buttonRole", "media")
+        self.set_svg_icon(self.like_button, "./assets/svg/heart.svg", 0.5)
+        self.like_button.setCheckable(True)  # Checked while the track is in the user's library
+        self.like_button.clicked.connect(self.toggle_like)
+
         # Progress slider
         self.progress_slider = QSlider(Qt.Horizontal, self)
         self.progress_slider.setGeometry(0, 350, 850, 15)
-        self.progress_slider.setStyleSheet("""
-
-            QSlider::groove:horizontal {
-                background: rgba(0, 0, 0, 0);  /* Transparent black background */
-                height: 12px;  /* Groove height */
-                
-            }
-            QSlider::handle:horizontal {
-                background: white;  /* White handle */
-                width: 15px;
-                height: 15px;
-                border-radius: 0px;
-            }
-            QSlider::sub-page:horizontal {
-                background: white;  /* White for the filled portion */
-            }
-            QSlider::add-page:horizontal {
-                background: rgba(0, 0, 0, 0);  /* Transparent black for the unfilled portion */
-                border-radius: 5px;
-            }
-        """)
+        self.progress_slider.setObjectName("progressSlider")
+        # Slider works in milliseconds; the maximum follows the track duration
         self.progress_slider.setMinimum(0)
-        self.progress_slider.setMaximum(100)
+        self.progress_slider.setMaximum(1)
+        self.progress_slider.sliderMoved.connect(self.scrub_to_position)
         self.progress_slider.sliderReleased.connect(self.seek_to_position)
 
-        # Timer for updating progress
+        self.init_queue_panel()
+
+        # Position preview shown while scrubbing
+        self.scrub_label = QLabel("", self)
+        self.scrub_label.setObjectName("scrubLabel")
+        self.scrub_label.setGeometry(375, 300, 450, 40)
+        self.scrub_label.hide()
+
+        # Seeks sent while dragging are throttled: at most one per interval, always the latest position
+        self.seek_throttle_timer = QTimer(self)
+        self.seek_throttle_timer.setSingleShot(True)
+        self.seek_throttle_timer.setInterval(250)
+        self.seek_throttle_timer.timeout.connect(self.send_scrub_seek)
+        self.last_seek_position = None
+
+        # One application-level stylesheet styles every widget above
+        QApplication.instance().setStyleSheet(STYLESHEETS[self.theme.name])
+
+        # Timer for redrawing progress, extrapolated locally between polls
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+        self.progress_timer.start(33)
+
+        # Single-shot timer for network polls, rescheduled after every snapshot
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_progress_bar)
-        self.timer.start(1000)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.request_poll)
+
+        if not self.fast_start:
+            self.hydrate()
+
+    def init_queue_panel(self):
+        """
+        Up Next panel over the track info: a virtualized list of the queue or playlist.
+        """
+        self.queue_panel = QWidget(self)
+        self.queue_panel.setObjectName("queuePanel")
+        self.queue_panel.setAttribute(Qt.WA_StyledBackground)  # Paint the stylesheet background
+        self.queue_panel.setGeometry(25, 75, 800, 265)
+        self.queue_panel.hide()
+
+        self.queue_title = QLabel("Up Next", self.queue_panel)
+        self.queue_title.setObjectName("queueTitle")
+        self.queue_title.setGeometry(15, 5, 700, 30)
+
+        # Switches between the queue and the playlist being played
+        self.queue_source_button = QPushButton("", self.queue_panel)
+        self.queue_source_button.setGeometry(800 - 45, 0, 40, 40)
+        self.queue_source_button.setProperty("buttonRole", "window")
+        self.set_svg_icon(self.queue_source_button, "./assets/svg/menu.svg", 0.4)
+        self.queue_source_button.clicked.connect(self.toggle_queue_source)
+
+        self.queue_model = QueueModel(self.devicePixelRatioF(), self)
+        self.queue_model.page_requested.connect(self.playback_source.fetch_queue_page)
+        self.playback_source.queue_page_ready.connect(self.queue_model.on_page_ready)
+        self.playback_source.queue_page_failed.connect(self.queue_model.on_page_failed)
+        self.queue_model.thumbnails_requested.connect(self.worker.fetch_thumbnails)
+        self.worker.album_art_ready.connect(self.queue_model.on_thumbnail_ready)
+        self.worker.album_art_failed.connect(self.queue_model.on_thumbnail_failed)
+
+        self.queue_list = QListView(self.queue_panel)
+        self.queue_list.setObjectName("queueList")
+        self.queue_list.setGeometry(5, 40, 790, 220)
+        self.queue_list.setModel(self.queue_model)
+        # Every row has the same height, so the view never measures rows it does not show
+        self.queue_list.setUniformItemSizes(True)
+        self.queue_list.setLayoutMode(QListView.Batched)
+        self.queue_list.setBatchSize(100)
+        self.queue_list.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.queue_list.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.queue_list.setSelectionMode(QListView.NoSelection)
+        self.queue_list.setEditTriggers(QListView.NoEditTriggers)
+
+    def hydrate(self):
+        """
+        Load fonts and start polling. Deferred until after the first paint in fast-start mode.
+        """
+        if self.hydrated:
+            return
+        self.hydrated = True
+        self.load_fonts()
+        if HISTORY_ENABLED and not self.daemon_socket:
+            self.history = ListeningHistory()
+        self.request_poll()
+        # What startup allocated lives as long as the widget. Keep it out of full garbage
+        # collections, which hold the GIL and would stall the GUI thread for tens of ms each
+        # time a worker's deferred import (NumPy, spotipy) triggers one.
+        gc.freeze()
+
+    def load_fonts(self):
+        """
+        Register the Gotham fonts and apply them to the track labels.
+        """
+        # Load custom fonts
+        gotham_bold_id = QFontDatabase.addApplicationFont("./assets/fonts/GothamBold.ttf")
+        gotham_light_id = QFontDatabase.addApplicationFont("./assets/fonts/GothamLight.ttf")
+
+        # Get font families
+        gotham_bold_family = QFontDatabase.applicationFontFamilies(gotham_bold_id)[0]
+        gotham_light_family = QFontDatabase.applicationFontFamilies(gotham_light_id)[0]
+
+        # Create specific font styles
+        gotham_bold = QFont(gotham_bold_family, 25)
+        gotham_bold.setBold(True)  # Ensure bold style is explicitly set
+
+        gotham_light = QFont(gotham_light_family, 15)
+        gotham_light.setWeight(QFont.Light)  # Set the light style explicitly
+
+        self.artist_label.setFont(gotham_light)
+        self.track_label.setFont(gotham_bold)
+        startup_timer.mark("fonts")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        startup_timer.mark("first_paint")
+        if not self.hydrated:
+            # Let the frame reach the screen before doing the rest of the startup work
+            QTimer.singleShot(0, self.hydrate)
 
 
 
@@ -212,138 +443,153 @@ class SpotifyWidget(QMainWindow):
         """
         Toggle music on Spotify and update the icon.
         """
-        try:
-            if self.music_paused:
-                sp.start_playback()  # Resume playback on the current device
-                print("Playback resumed.")
-            else:
-                sp.pause_playback()  # Pause playback
-                print("Playback paused.")
-
-            self.music_paused = not self.music_paused  # Toggle the state
-            # Update the play_button_path based on the current state
-            self.play_button_path = "./assets/svg/media-play.svg" if self.music_paused else "./assets/svg/media-pause.svg"
-            # Update the button icon
-            self.set_svg_icon(self.media_play_button, self.play_button_path, 0.5)
-        
-        except Exception as e:
-            print(f"Error toggling playback: {e}")
-
+        if self.music_paused:
+            self.send_command("play")
+            self.apply_optimistic(is_playing=True)
+            self.set_as_playing()
+        else:
+            self.send_command("pause")
+            self.apply_optimistic(is_playing=False)
+            self.set_as_paused()
 
     def next_track(self):
         """
         Play next track on Spotify.
         """
-        try:
-            sp.next_track()
-            print("Next track is playing.")
-            
-            self.set_as_playing()
-            self.reset_progress_bar()
-        except Exception as e:
-            print(f"Error skipping song: {e}")
+        self.send_command("next", 1)
+        if self.upcoming_tracks:
+            self.show_upcoming_track()
+        else:
+            self.apply_optimistic(is_playing=True, track_progress=0)
 
     def previous_track(self):
         """
         Either go to previous track or to beginning of track depending how far along in the track you are
         """
-        try:
-            # Get the current playback state
-            current_playback = sp.current_playback()
-            if not current_playback:
-                print("No active playback detected.")
-                return
-
-            # Check the progress of the current track in milliseconds
-            progress_ms = current_playback.get("progress_ms", 0)
-
-            # If the track is past 5 seconds, restart the current track
-            if progress_ms > 5000:  # 5 seconds threshold
-                sp.seek_track(0)  # Seek to the beginning of the track
-                print("Restarted the current track.")
-            else:
-                # Otherwise, skip to the previous track
-                sp.previous_track()
-                print("Went to the previous track.")
-
-            self.set_as_playing()
-            self.reset_progress_bar()
-    
-        except Exception as e:
-            print(f"Error going back: {e}")
+        # If the track is past 5 seconds, restart the current track
+        if self.current_playback and self.current_playback.progress_at() > 5000:
+            self.send_command("seek", 0)
+        else:
+            self.send_command("previous", 1)
+        self.apply_optimistic(is_playing=True, track_progress=0)
 
     def toggle_shuffle_tracks(self):
         """
         Turn on or off shuffle on playlist
         """
-        try:
-            sp.shuffle(not self.music_shuffled)
-            self.music_shuffled = not self.music_shuffled
-            if self.music_shuffled:
-                print("Tracks shuffled.")
-            else:
-                print("Tracks unshuffled.")
+        self.send_command("shuffle", not self.music_shuffled)
+        self.music_shuffled = not self.music_shuffled
+        self.shuffle_button.setChecked(self.music_shuffled)
+        self.apply_optimistic(shuffle_state=self.music_shuffled)
 
-        except Exception as e:
-            print(f"Shuffleing tracks: {e}")
+    def cycle_repeat(self):
+        """
+        Step the repeat mode: off, whole context, current track.
+        """
+        mode = self.current_playback.repeat_state if self.current_playback else "off"
+        mode = REPEAT_MODES[(REPEAT_MODES.index(mode) + 1) % len(REPEAT_MODES)]
+        self.send_command("repeat", mode)
+        self.show_repeat_mode(mode)
+        self.apply_optimistic(repeat_state=mode)
 
-        
-    def set_svg_icon(self, button, svg_path, size=1):
+    def show_repeat_mode(self, mode):
+        self.repeat_button.setChecked(mode != "off")
+        self.repeat_button.setText("1" if mode == "track" else "")
+
+    def toggle_like(self):
+        """
+        Add the current track to the library or remove it.
+        """
+        if not self.current_playback or not is_spotify_id(self.current_playback.track_id):
+            self.like_button.setChecked(False)
+            return
+        track_id = self.current_playback.track_id
+        liked = not self.saved_states.get(track_id, False)
+        self.saved_states[track_id] = liked
+        self.like_button.setChecked(liked)
+        self.send_command("like" if liked else "unlike", track_id)
+
+    def request_saved_states(self, track_ids):
         """
-        Load an SVG, change its color, and set it as the button's icon.
+        Ask which tracks are liked; the worker answers from its cache when it can.
         """
+        track_ids = [track_id for track_id in track_ids if track_id]
+        if track_ids:
+            self.saved_tracks_requested.emit(track_ids)
 
-        color = "black" if self.dark_mode_enabled is True else "white"
-        # Load the SVG content
-        with open(svg_path, "r") as file:
-            svg_content = file.read()
+    def on_saved_tracks_ready(self, states):
+        """
+        Apply looked-up library states, except for tracks with a like or unlike on its way:
+        their answer may predate the click, and the command's outcome decides instead.
+        """
+        for track_id, saved in states.items():
+            if not self.command_queue.involves(LIBRARY_COMMANDS, track_id):
+                self.saved_states[track_id] = saved
+        self.show_saved_state()
+
+    def show_saved_state(self):
+        track_id = self.current_playback.track_id if self.current_playback else ""
+        self.like_button.setEnabled(is_spotify_id(track_id))
+        self.like_button.setChecked(self.saved_states.get(track_id, False))
 
-        # Replace the fill color in the SVG content
-        updated_svg_content = svg_content.replace("black", color)
-        renderer = QSvgRenderer(QByteArray(updated_svg_content.encode("utf-8")))
+    def send_command(self, command, argument=None):
+        """
+        Queue a transport command for the command worker; redundant ones are merged.
+        """
+        self.command_queue.put(command, argument)
+        self.commands_queued.emit()
 
-        # Create a pixmap to render the SVG
-        pixmap = QPixmap(100, 100)
-        pixmap.fill(Qt.transparent)  # Transparent background
-        painter = QPainter(pixmap)
-        renderer.render(painter)
-        painter.end()
+    def apply_optimistic(self, **changes):
+        """
+        Render the expected result of a command right away; the next settled snapshot
+        confirms or corrects it.
+        """
+        state = self.current_playback
+        if state is None:
+            return
+        changes.setdefault("track_progress", state.progress_at())
+        self.render_playback(replace(state, fetched_at=time.monotonic(), **changes))
 
-        # Set the pixmap as the button's icon
-        button.setIcon(QIcon(pixmap))
-        button.setIconSize(pixmap.size()*size)
+    def on_command_finished(self, command, argument):
+        """
+        Confirm the new state soon instead of waiting for the regular schedule.
+        """
+        if command in LIBRARY_COMMANDS:
+            # Playback is unchanged; the worker's cache already holds the new state
+            self.saved_states[argument] = command == "like"
+            self.show_saved_state()
+            return
+        self.schedule_poll(self.poll_scheduler.after_command_delay)
+
+    def on_command_failed(self, command, error):
+        """
+        Roll the optimistic UI back to the last state Spotify reported.
+        """
+        if command in LIBRARY_COMMANDS:
+            # The worker forgot the track, so this asks Spotify whether the command landed
+            self.saved_states.clear()
+            if self.current_playback:
+                self.request_saved_states([self.current_playback.track_id])
+            return
+        if self.command_queue.idle():
+            self.previewed_from_track_id = None
+            self.render_playback(self.authoritative_playback)
+            self.queue_requested.emit()  # Previewed tracks were consumed from the prefetched queue
+        self.schedule_poll(self.poll_scheduler.after_command_delay)
 
-    def get_current_track_info(self):
+    def set_svg_icon(self, button, svg_path, size=1):
         """
-        Fetch details of the currently playing track, including its image.
+        Set a recolored SVG as the button's icon, rendered once per variant by the icon cache.
         """
-        try:
-            # Get current playback info
-            current_playback = sp.current_playback()
-
-            if not current_playback or not current_playback['item']:
-                print("No track is currently playing.")
-                return None
-
-            # Extract track details
-            track_name = current_playback['item']['name']
-            artist_name = ", ".join([artist['name'] for artist in current_playback['item']['artists']])
-            album_name = current_playback['item']['album']['name']
-            album_image_url = current_playback['item']['album']['images'][0]['url']  # Largest image
-            track_duration = int(current_playback['item']['duration_ms'])
-            track_progress = int(current_playback['progress_ms'])
-            return {
-                "track_name": track_name,
-                "artist_name": artist_name,
-                "album_name": album_name,
-                "album_image_url": album_image_url,
-                "track_duration": track_duration,
-                "track_progress": track_progress
-            }
+        color = self.theme.icon
+        icon_size = int(100 * size)
+        key = (svg_path, color, icon_size, button.devicePixelRatioF())
+        if self.button_icons.get(button) == key:
+            return  # Already showing this variant
 
-        except Exception as e:
-            print(f"Error fetching current track info: {e}")
-            return None
+        button.setIcon(self.icon_cache.icon(*key))
+        button.setIconSize(QSize(icon_size, icon_size))
+        self.button_icons[button] = key
 
     def toggle_dark_mode(self):
         """
@@ -351,66 +597,66 @@ class SpotifyWidget(QMainWindow):
         """
         # Toggle the dark mode state
         self.dark_mode_enabled = not self.dark_mode_enabled
-
-        # Update the window background color
-        if self.dark_mode_enabled:
-            self.setStyleSheet("background-color: rgba(0, 0, 0, 200);")  # Dark mode background
-        else:
-            self.setStyleSheet("background-color: rgba(255, 255, 255, 200);")  # Light mode background
-
-        # Update the dark mode switch icon
-        dark_mode_image_path = "./assets/svg/moon.svg" if self.dark_mode_enabled else "./assets/svg/sun.svg"
-        self.set_svg_icon(self.dark_mode_switch, dark_mode_image_path, 0.5)
-
-        # Update all other buttons with SVG icons
-        self.set_svg_icon(self.close_button, "./assets/svg/x-letter.svg", 0.5)
-        self.set_svg_icon(self.minimize_button, "./assets/svg/minus.svg", 0.5)
-        self.set_svg_icon(self.media_play_button, self.play_button_path, 0.5)
-        self.set_svg_icon(self.next_button, "./assets/svg/media-step-forward.svg", 0.5)
-        self.set_svg_icon(self.previous_button, "./assets/svg/media-step-backward.svg", 0.5)
-        self.set_svg_icon(self.shuffle_button, "./assets/svg/random.svg", 0.5)
-
-
-        # Update Stylesheets
-        stylesheet_background_plane_light = """
-            background-color: rgba(255, 255, 255, 5);
-            border: 1px solid rgba(255, 255, 255, 10);
-            border-radius: 10px;
-            """
-        
-        stylesheet_background_plane_dark = """
-            background-color: rgba(0, 0, 0, 5);
-            border: 1px solid rgba(0, 0, 0, 10);
-            border-radius: 10px;
-            """
-        stylesheet_background_plane = stylesheet_background_plane_dark if self.dark_mode_enabled else stylesheet_background_plane_light
-        self.background_plane.setStyleSheet(stylesheet_background_plane)
-
-        stylesheet_track_info_light = """
-            color: "white";
-            background-color: rgba(0, 0, 0, 0);
-            """
-        stylesheet_track_info_dark = """
-            color: "black";
-            background-color: rgba(0, 0, 0, 0);
-            """
-        stylesheet_track_info = stylesheet_track_info_dark if self.dark_mode_enabled else stylesheet_track_info_light
-        self.artist_label.setStyleSheet(stylesheet_track_info)
-        self.track_label.setStyleSheet(stylesheet_track_info)
-
+        self.apply_theme(self.themed())
         print(f"Dark mode enabled: {self.dark_mode_enabled}")
 
-    def update_track_info(self, current_track_info=None):
-        print("Updating track info.")
-        current_track_info = self.get_current_track_info()
+    def themed(self):
+        """
+        The light or dark theme, colored by the current album's palette when there is one.
+        """
+        base = DARK if self.dark_mode_enabled else LIGHT
+        return theme_for_palette(base, self.palette) if self.palette else base
 
+    def apply_theme(self, theme):
+        """
+        Switch to a theme in one pass: one precompiled application stylesheet, the matching
+        icon variants, and a single repaint once everything is in place.
+        The application stylesheet only changes with light and dark mode. Album palettes
+        color just the widgets they affect, so a track change never re-polishes the tree.
+        """
+        self.setUpdatesEnabled(False)
+        try:
+            base = theme.base or theme.name
+            if base != (self.theme.base or self.theme.name):
+                QApplication.instance().setStyleSheet(STYLESHEETS[base])
+            self.theme = theme
+            palette_stylesheet = compile_palette_stylesheet(theme) if theme.base else ""
+            for widget in (self.background_plane, self.artist_label, self.track_label, self.scrub_label,
+                           self.progress_slider, self.queue_title, self.queue_list):
+                if widget.styleSheet() != palette_stylesheet:
+                    widget.setStyleSheet(palette_stylesheet)
+
+            self.set_svg_icon(self.dark_mode_switch, theme.mode_icon, 0.5)
+            self.set_svg_icon(self.close_button, "./assets/svg/x-letter.svg", 0.5)
+            self.set_svg_icon(self.minimize_button, "./assets/svg/minus.svg", 0.5)
+            self.set_svg_icon(self.media_play_button, self.play_button_path, 0.5)
+            self.set_svg_icon(self.next_button, "./assets/svg/media-step-forward.svg", 0.5)
+            self.set_svg_icon(self.previous_button, "./assets/svg/media-step-backward.svg", 0.5)
+            self.set_svg_icon(self.shuffle_button, "./assets/svg/random.svg", 0.5)
+            self.set_svg_icon(self.repeat_button, "./assets/svg/loop.svg", 0.5)
+            self.set_svg_icon(self.like_button, "./assets/svg/heart.svg", 0.5)
+            self.set_svg_icon(self.queue_button, "./assets/svg/list.svg", 0.5)
+            self.set_svg_icon(self.queue_source_button, "./assets/svg/menu.svg", 0.4)
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def update_track_info(self, current_track_info=None, update_art=True):
+        print("Updating track info.")
         if current_track_info:
-            self.artist_label.setText(current_track_info['artist_name'])
-            self.track_label.setText(current_track_info['track_name'])
-            self.update_album_art(current_track_info['album_image_url'])
+            self.set_label_text(self.artist_label, current_track_info.artist_name)
+            self.set_label_text(self.track_label, current_track_info.track_name)
+            if update_art:
+                self.update_album_art(current_track_info.album_images)
         else:
-            self.artist_label.setText("Not Working")
-            self.track_label.setText("Not Working")
+            self.set_label_text(self.artist_label, "Not Working")
+            self.set_label_text(self.track_label, "Not Working")
+
+    def set_label_text(self, label, text):
+        """
+        Set a label's text only if it differs, avoiding a relayout and repaint.
+        """
+        if label.text() != text:
+            label.setText(text)
 
 
     def set_as_playing(self):
@@ -435,83 +681,377 @@ class SpotifyWidget(QMainWindow):
                 # Update the button icon
                 self.set_svg_icon(self.media_play_button, self.play_button_path, 0.5)
 
-    def update_progress_bar(self):
+    def request_poll(self):
         """
-        Update the progress slider based on the current playback position.
-        If the track ends naturally, update the track info and reset the slider.
+        Ask the worker for a snapshot. The timer doubles as a watchdog in case none arrives.
         """
-        try:
-            current_playback = sp.current_playback()
+        self.schedule_poll(self.poll_scheduler.retry_delay())
+        self.poll_requested.emit()
 
-            if current_playback:
-                progress_ms = current_playback['progress_ms']
-                duration_ms = current_playback['item']['duration_ms']
+    def schedule_poll(self, delay):
+        """
+        (Re)schedule the next network poll in delay seconds; None suspends polling.
+        """
+        if delay is None:
+            self.timer.stop()
+        else:
+            self.timer.start(int(delay * 1000))
 
-                # Set play button, neccessary if paused on device
-                if current_playback['is_playing']:
-                    #print("Playback playing.")
-                    self.set_as_playing()
-                    if self.artist_label.text() == "Artist": self.update_track_info()
-                else:
-                    #print("Playback paused.")
-                    self.set_as_paused()
+    def next_poll_delay(self, current_playback):
+        """
+        Regular poll delay for a settled snapshot, throttled while nobody watches the widget.
+        A locked screen suspends polling, unless the history is set to keep recording meanwhile.
+        """
+        watched = self.activity.active(self.poll_scheduler.idle_after)
+        if not watched:
+            self.suspend_redraws()
+        else:
+            self.resume_redraws()  # The user may have come back without a window event
+        locked = self.activity.locked and not (self.history and HISTORY_WHILE_LOCKED)
+        return self.poll_scheduler.next_delay(current_playback, watched=watched, locked=locked)
 
-                if progress_ms < 2000: 
-                    print(f"Updating track info, progress: {progress_ms}")
-                    self.update_track_info()
+    def on_activity_resumed(self):
+        """
+        The widget is watched again: redraw progress and refresh right away.
+        """
+        self.resume_redraws()
+        if self.hydrated:
+            self.request_poll()
+
+    def suspend_redraws(self):
+        """
+        Nobody is watching: stop the progress redraw and the stall watchdog's heartbeat.
+        """
+        self.progress_timer.stop()
+        if self.stall_watchdog:
+            self.stall_watchdog.pause()
 
+    def resume_redraws(self):
+        if not self.progress_timer.isActive():
+            self.progress_timer.start(33)
+        if self.stall_watchdog:
+            self.stall_watchdog.resume()
 
-                # Calculate progress percentage
-                progress_percent = int((progress_ms / duration_ms) * 100)
+    def on_poll_deferred(self, delay):
+        """
+        The scheduler refused or failed the poll; try again once its backoff has passed.
+        """
+        self.schedule_poll(max(delay, self.poll_scheduler.min_interval))
 
-                # Update the slider value
-                self.progress_slider.setValue(progress_percent)
+    def update_progress_bar(self, current_playback):
+        """
+        Apply a playback snapshot sent by the worker and schedule the next poll.
+        Snapshots that predate queued or running commands do not override the optimistic UI.
+        """
+        startup_timer.mark("first_api_response")
+        delay = self.poll_scheduler.after_command_delay
+        try:
+            previous_playback = self.authoritative_playback
+            self.authoritative_playback = current_playback
+            if self.history:
+                self.history.observe(current_playback)
+
+            # The queue moves on with every track change. The one queue read also
+            # reaches the panel, as its first page.
+            if current_playback and (not previous_playback or previous_playback.track_id != current_playback.track_id):
+                self.queue_requested.emit()
+                self.refresh_queue_panel(reload=False)
+
+            fetched_at = current_playback.fetched_at if current_playback else time.monotonic()
+            if self.command_queue.settled(fetched_at):
+                if (current_playback and current_playback.track_id == self.previewed_from_track_id
+                        and current_playback.remaining_ms() < 2000):
+                    pass  # Spotify has not moved on from the track we previewed past yet
+                else:
+                    self.previewed_from_track_id = None
+                    self.render_playback(current_playback)
+                    delay = self.next_poll_delay(current_playback)
 
         except Exception as e:
             print(f"Error updating progress bar: {e}")
 
-    def seek_to_position(self):
+        self.schedule_poll(delay)
+
+    def render_playback(self, current_playback):
         """
-        Seek to the position selected on the progress slider.
+        Show a playback state, authoritative or optimistic.
+        Only the parts that differ from what is on screen are touched.
         """
-        try:
-            current_playback = sp.current_playback()
+        diff = diff_playback(self.current_playback, current_playback)
+        self.current_playback = current_playback
+        if not current_playback:
+            return
+
+        if diff.shuffle:
+            self.music_shuffled = current_playback.shuffle_state
+            self.shuffle_button.setChecked(self.music_shuffled)
+
+        if diff.repeat:
+            self.show_repeat_mode(current_playback.repeat_state)
+
+        # Set play button, neccessary if paused on device
+        if diff.play_state:
+            if current_playback.is_playing:
+                self.set_as_playing()
+            else:
+                self.set_as_paused()
+
+        if diff.labels:
+            print(f"Updating track info, progress: {current_playback.track_progress}")
+            self.update_track_info(current_playback, update_art=diff.album_art)
+            # Shown from memory right away, then confirmed from the worker's cache
+            self.show_saved_state()
+            self.request_saved_states([current_playback.track_id])
+        elif diff.album_art:
+            self.update_album_art(current_playback.album_images)
+        if diff.album_art:
+            self.update_palette(current_playback.album_id, current_playback.album_images)
+
+        self.refresh_progress()
+
+    def refresh_progress(self):
+        """
+        Move the slider to the locally extrapolated playback position.
+        """
+        current_playback = self.current_playback
+        if not current_playback or self.progress_slider.isSliderDown():
+            return
+        if current_playback.track_duration <= 0:
+            return
+
+        # The track should have ended: show the prefetched next track while the poll confirms it
+        if (current_playback.is_playing and current_playback.remaining_ms() <= 0
+                and current_playback.repeat_state != "track" and self.upcoming_tracks):
+            self.show_upcoming_track()
+            return
+
+        # Update the slider value, both in milliseconds
+        if self.progress_slider.maximum() != current_playback.track_duration:
+            self.progress_slider.setMaximum(current_playback.track_duration)
+        self.progress_slider.setValue(current_playback.progress_at())
+
+    def scrub_to_position(self, position):
+        """
+        Preview the position under the slider handle and schedule a throttled live seek.
+        """
+        duration = self.current_playback.track_duration if self.current_playback else 0
+        self.scrub_label.setText(f"{format_time(position)} / {format_time(duration)}")
+        self.scrub_label.show()
+        if not self.seek_throttle_timer.isActive():
+            self.seek_throttle_timer.start()
 
-            if current_playback and current_playback['is_playing']:
-                duration_ms = current_playback['item']['duration_ms']
+    def send_scrub_seek(self):
+        """
+        Send the latest slider position while the user is still dragging.
+        """
+        if self.progress_slider.isSliderDown():
+            self.send_seek(self.progress_slider.value())
 
-                # Calculate the new position in milliseconds
-                new_position = int((self.progress_slider.value() / 100) * duration_ms)
+    def seek_to_position(self):
+        """
+        Seek to the position selected on the progress slider.
+        """
+        self.seek_throttle_timer.stop()
+        self.scrub_label.hide()
+        self.send_seek(self.progress_slider.value())
+        self.last_seek_position = None
 
-                # Seek to the new position
-                sp.seek_track(new_position)
-                print(f"Seeked to {new_position} ms.")
+    def send_seek(self, position):
+        """
+        Seek to position milliseconds, skipping repeats of the position sent last.
+        """
+        current_playback = self.current_playback
+        if not current_playback or not current_playback.is_playing:
+            return
+        if position == self.last_seek_position:
+            return
+        self.last_seek_position = position
+        self.send_command("seek", position)
+        self.apply_optimistic(track_progress=position)
+
+    def update_album_art(self, album_images):
+        """
+        Show the smallest album image that covers the label, from memory if possible.
+        Otherwise the worker loads it and it is displayed once ready.
+        """
+        key = self.album_art_key_for(album_images)
+        if key is None or key == self.album_art_key:
+            return
+        self.album_art_key = key
 
-        except Exception as e:
-            print(f"Error seeking to position: {e}")
+        pixmap = self.album_art_cache.get(key)
+        if pixmap is not None:
+            self.album_art_label.setPixmap(pixmap)
+        elif key not in self.album_art_pending:
+            self.album_art_pending.add(key)
+            self.album_art_requested.emit(key)
 
-    def reset_progress_bar(self):
+    def album_art_key_for(self, album_images):
         """
-        Reset the progress bar when the track changes.
+        Cache key (url, width, height) of the smallest album image covering the label.
         """
-        self.progress_slider.setValue(0)
-        self.timer.start(1000)
+        ratio = self.album_art_label.devicePixelRatioF()
+        width = int(self.album_art_label.width() * ratio)
+        height = int(self.album_art_label.height() * ratio)
+        image = pick_image(album_images, width, height)
+        if image is None:
+            return None
+        return (image[0], width, height)
 
-    def update_album_art(self, album_image_url):
+    def on_queue_updated(self, upcoming_tracks):
         """
-        Update the album art displayed in the overlay.
+        Remember the upcoming tracks and prefetch the art and palettes that are not in memory yet.
         """
-        try:
-            response = requests.get(album_image_url)
-            image_data = BytesIO(response.content)
+        self.upcoming_tracks = upcoming_tracks
+        keys = []
+        for track in upcoming_tracks:
+            key = self.album_art_key_for(track.album_images)
+            if key and key not in self.album_art_cache and key not in self.album_art_pending:
+                self.album_art_pending.add(key)
+                keys.append(key)
+        if keys:
+            self.album_art_prefetch_requested.emit(keys)
+        # One batched lookup, so the heart is already known when these tracks start
+        self.request_saved_states([track.track_id for track in upcoming_tracks
+                                   if track.track_id not in self.saved_states])
+        # Queued after the art prefetch, so the worker samples art it already has on disk
+        for track in upcoming_tracks:
+            self.request_palette(track.album_id, track.album_images)
+
+    def show_upcoming_track(self):
+        """
+        Swap in the next queued track from memory, ahead of the confirming poll.
+        """
+        if not self.upcoming_tracks or not self.current_playback:
+            return
+        track = self.upcoming_tracks.pop(0)
+        if self.previewed_from_track_id is None:
+            self.previewed_from_track_id = self.current_playback.track_id
+        self.render_playback(replace(
+            self.current_playback,
+            track_id=track.track_id,
+            track_name=track.track_name,
+            artist_name=track.artist_name,
+            artist_names=track.artist_names,
+            album_id=track.album_id,
+            album_name=track.album_name,
+            album_image_url=track.album_images[0][0] if track.album_images else "",
+            album_images=track.album_images,
+            track_duration=track.track_duration,
+            track_progress=0,
+            is_playing=True,
+            fetched_at=time.monotonic(),
+        ))
+
+    def on_album_art_failed(self, key):
+        """
+        Forget a failed or skipped art request so it can be retried later.
+        """
+        self.album_art_pending.discard(key)
+        if key == self.album_art_key:
+            self.album_art_key = None
 
-            pixmap = QPixmap()
-            pixmap.loadFromData(image_data.getvalue())
-            self.album_art_pixmap = pixmap  # Save the pixmap for reuse
-            self.album_art_label.setPixmap(pixmap)
-            self.album_art_label.setScaledContents(True)
-        except Exception as e:
-            print(f"Error updating album art: {e}")
+    def set_album_art(self, key, image):
+        """
+        Cache album art decoded by the worker and display it if still current.
+        """
+        if key not in self.album_art_pending:
+            return  # A queue panel thumbnail
+        self.album_art_pending.discard(key)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(self.album_art_label.devicePixelRatioF())
+        self.album_art_cache.put(key, pixmap)
+        if key != self.album_art_key:
+            return  # A newer track was requested in the meantime
+        self.album_art_label.setPixmap(pixmap)
+
+    def playlist_uri(self):
+        """
+        URI of the playlist being played, or None when playing from elsewhere.
+        """
+        playback = self.authoritative_playback
+        if playback and playback.context_uri.startswith("spotify:playlist:"):
+            return playback.context_uri
+        return None
+
+    def toggle_queue_panel(self):
+        visible = self.queue_button.isChecked()
+        self.queue_panel.setVisible(visible)
+        if visible:
+            self.queue_panel.raise_()
+            self.refresh_queue_panel()
+
+    def toggle_queue_source(self):
+        self.show_playlist = not self.show_playlist
+        self.refresh_queue_panel()
+
+    def refresh_queue_panel(self, reload=True):
+        """
+        Point the open panel at the right source and bring the queue up to date.
+        A closed panel is refreshed when it is opened. Without reload, the queue is left
+        to the queue read already requested.
+        """
+        if not self.queue_panel.isVisible():
+            return
+        playlist_uri = self.playlist_uri()
+        self.queue_source_button.setEnabled(playlist_uri is not None)
+        source = playlist_uri if self.show_playlist and playlist_uri else QUEUE_SOURCE
+        self.queue_title.setText("Up Next" if source == QUEUE_SOURCE else "Playlist")
+        if source != self.queue_model.source:
+            self.queue_model.set_source(source)
+        elif source == QUEUE_SOURCE and reload:
+            self.queue_model.refresh()  # The queue changes with every track; playlists do not
+        if self.authoritative_playback:
+            self.queue_model.set_current_track(self.authoritative_playback.track_id)
+
+    def update_palette(self, album_id, album_images):
+        """
+        Color the theme after the album on screen, from memory if its palette is known.
+        Until a new palette arrives the previous colors stay, so nothing flashes.
+        """
+        if not self.dynamic_theme:
+            return
+        palette = self.palettes.get(album_id)
+        if palette is None:
+            self.request_palette(album_id, album_images)
+        elif palette != self.palette:
+            self.palette = palette
+            self.apply_theme(self.themed())
+
+    def request_palette(self, album_id, album_images):
+        """
+        Have the worker extract an album's palette from the same image the label shows.
+        """
+        if not self.dynamic_theme or album_id in self.palettes or album_id in self.palette_pending:
+            return
+        key = self.album_art_key_for(album_images)
+        if key is None:
+            return
+        self.palette_pending.add(album_id)
+        self.palette_requested.emit(album_id, key[0])
+
+    def on_palette_ready(self, album_id, palette):
+        self.palette_pending.discard(album_id)
+        if palette is None:
+            return
+        self.palettes.put(album_id, palette)
+        if self.current_playback and self.current_playback.album_id == album_id:
+            self.update_palette(album_id, self.current_playback.album_images)
+
+    def closeEvent(self, event):
+        self.timer.stop()
+        self.progress_timer.stop()
+        if self.stall_watchdog:
+            self.stall_watchdog.stop()
+        self.metrics_exporter.stop()
+        if self.history:
+            self.history.close()
+        self.worker_shutdown_requested.emit()
+        for thread in self.worker_threads:
+            thread.quit()
+        for thread in self.worker_threads:
+            thread.wait()
+        super().closeEvent(event)
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
@@ -526,9 +1066,21 @@ class SpotifyWidget(QMainWindow):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spotify desktop widget.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--daemon", nargs="?", const=SOCKET_PATH, metavar="SOCKET",
+                      help="Run headless, polling Spotify once for every attached widget")
+    mode.add_argument("--attach", nargs="?", const=SOCKET_PATH, metavar="SOCKET",
+                      help="Show a widget fed by a running playback daemon")
+    args = parser.parse_args()
+
+    if args.daemon:
+        PlaybackDaemon(args.daemon).serve_forever()
+        sys.exit(0)
+
     app = QApplication([])
     screen_width = app.primaryScreen().size().width()
     screen_height = app.primaryScreen().size().height()
-    widget = SpotifyWidget(screen_width, screen_height)
+    widget = SpotifyWidget(screen_width, screen_height, daemon_socket=args.attach)
     widget.show()
     app.exec()
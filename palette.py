@@ -0,0 +1,102 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import importlib.util
+import os
+
+# Optional: without NumPy the widget keeps its fixed themes. Only looked up here; NumPy
+# itself is imported on the first extraction, in the palette pool, off the startup path.
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+# Color themes derived from the album art, on unless disabled or NumPy is missing
+DYNAMIC_THEME = os.getenv("SPOTIFY_WIDGET_DYNAMIC_THEME", "1") != "0" and NUMPY_AVAILABLE
+
+# Album art is decoded straight to this many pixels square before quantization
+SAMPLE_SIZE = 32
+CLUSTERS = 5
+ITERATIONS = 10
+
+# ITU-R BT.601 luma weights, used to spread the initial centroids from dark to light
+_LUMA = (0.299, 0.587, 0.114)
+
+
+@dataclass(frozen=True)
+class Palette:
+    """
+    Dominant and accent color of an album cover, as (r, g, b) tuples.
+    """
+    dominant: tuple
+    accent: tuple
+
+
+def pixels_from_rgb888(data, width, height, bytes_per_line):
+    """
+    (height * width, 3) array from a packed RGB888 buffer whose rows may be padded.
+    """
+    import numpy as np
+
+    rows = np.frombuffer(data, dtype=np.uint8, count=height * bytes_per_line).reshape(height, bytes_per_line)
+    return rows[:, :width * 3].reshape(-1, 3).copy()
+
+
+def extract_palette(pixels, clusters=CLUSTERS, iterations=ITERATIONS):
+    """
+    Quantize the pixels with k-means and pick the largest cluster as the dominant color
+    and the most saturated of the rest, weighted by size, as the accent.
+    """
+    import numpy as np
+
+    data = np.asarray(pixels, dtype=np.float32).reshape(-1, 3)
+    clusters = min(clusters, len(data))
+    # Deterministic start: centroids spread evenly over the pixels sorted by luma
+    order = np.argsort(data @ np.asarray(_LUMA, dtype=np.float32))
+    centroids = data[order[np.linspace(0, len(data) - 1, clusters).astype(int)]]
+
+    for _ in range(iterations):
+        distances = ((data[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=clusters)
+        sums = np.stack([np.bincount(labels, weights=data[:, channel], minlength=clusters) for channel in range(3)], axis=1)
+        updated = centroids.copy()
+        filled = counts > 0
+        updated[filled] = sums[filled] / counts[filled, None]
+        converged = np.abs(updated - centroids).max() < 1.0
+        centroids = updated
+        if converged:
+            break
+
+    share = counts / counts.sum()
+    dominant = int(share.argmax())
+    brightest = centroids.max(axis=1)
+    saturation = (brightest - centroids.min(axis=1)) / np.maximum(brightest, 1.0)
+    score = saturation * np.sqrt(share)
+    score[dominant] = -1.0
+    accent = int(score.argmax()) if clusters > 1 and share[score.argmax()] > 0 else dominant
+    return Palette(
+        dominant=tuple(int(round(value)) for value in centroids[dominant]),
+        accent=tuple(int(round(value)) for value in centroids[accent]),
+    )
+
+
+class PaletteCache:
+    """
+    Palettes by album ID, least recently used dropped first.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, album_id):
+        palette = self._entries.get(album_id)
+        if palette is not None:
+            self._entries.move_to_end(album_id)
+        return palette
+
+    def put(self, album_id, palette):
+        self._entries[album_id] = palette
+        self._entries.move_to_end(album_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, album_id):
+        return album_id in self._entries
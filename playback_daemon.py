@@ -0,0 +1,381 @@
+"""
+Headless playback backend shared by any number of widgets.
+
+The daemon owns the only Spotify client, polls playback once and pushes every snapshot
+to the widgets attached to its Unix domain socket, so ten widgets cost the API budget
+of one. Transport commands come back over the same socket.
+
+    python playback_daemon.py
+    python main.py --attach
+
+The protocol is one JSON object per line. Widgets send
+    {"type": "refresh"}                     latest snapshot, answered from the cache
+    {"type": "queue"}                       latest queue, answered from the cache
+    {"type": "page", "source": ..., "offset": n}   one page of the queue or a playlist, mostly from the cache
+    {"type": "saved", "ids": [...]}         which tracks are liked, mostly from the cache
+    {"type": "command", "name": ..., "argument": ...}
+and receive
+    {"type": "playback", "state": {...} or null}
+    {"type": "queue", "tracks": [...]}       the whole queue; widgets pick the upcoming tracks
+    {"type": "page", "source": ..., "offset": n, "tracks": [...], "next_offset": n, "total": n}
+    {"type": "page_failed", "source": ..., "offset": n}
+    {"type": "saved", "states": {track ID: bool}}
+    {"type": "deferred", "delay": seconds}   no snapshot yet, ask again later
+    {"type": "command_finished", "name": ..., "argument": ...}
+    {"type": "command_failed", "name": ..., "error": ...}
+"""
+from collections import OrderedDict
+from listening_history import HISTORY_ENABLED, ListeningHistory
+from playback_state import PlaybackStateStore
+from poll_scheduler import PollScheduler
+from request_scheduler import BACKGROUND, RequestDeferred, RequestScheduler
+from saved_tracks import SavedTracksCache
+from spotify_auth import get_client
+from transport import LIBRARY_COMMANDS, QUEUE_SOURCE, fetch_page, read_queue, run_command
+import json
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+
+SOCKET_PATH = os.getenv("SPOTIFY_WIDGET_SOCKET") or os.path.join(
+    os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir(), f"spotify-widget-{os.getuid()}.sock"
+)
+
+# A subscriber that cannot take a line within this many seconds is dropped
+SEND_TIMEOUT = 1.0
+
+# Up Next pages are shared by every widget for this many seconds. The queue is also read
+# again on every track change.
+PAGE_MAX_AGE = float(os.getenv("SPOTIFY_WIDGET_PAGE_MAX_AGE", "30"))
+PAGE_CACHE_SIZE = 64  # Playlist pages kept, least recently used first out
+
+
+def encode(message):
+    return (json.dumps(message, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+class Subscriber:
+    """
+    One attached widget. Writes come from the poll thread and the connection's own
+    handler thread, so they are serialized.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        # Send-only timeout: the handler thread blocks on reads from the same socket
+        seconds = int(SEND_TIMEOUT)
+        self.connection.setsockopt(
+            socket.SOL_SOCKET, socket.SO_SNDTIMEO,
+            struct.pack("ll", seconds, int((SEND_TIMEOUT - seconds) * 1_000_000)),
+        )
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        with self._lock:
+            self.connection.sendall(encode(message))
+
+
+class SubscriberHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        daemon = self.server.playback_daemon
+        subscriber = Subscriber(self.connection)
+        daemon.subscribe(subscriber)
+        try:
+            for line in self.rfile:
+                try:
+                    daemon.handle_message(subscriber, json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    print(f"Error handling daemon message: {e}")
+        except OSError:
+            pass  # Widget went away
+        finally:
+            daemon.unsubscribe(subscriber)
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path, playback_daemon):
+        self.playback_daemon = playback_daemon
+        super().__init__(path, SubscriberHandler)
+
+
+class PlaybackDaemon:
+    """
+    Polls Spotify on one thread and fans the snapshots out to every subscriber.
+    """
+
+    def __init__(self, path=SOCKET_PATH, scheduler=None, poll_scheduler=None):
+        self.path = path
+        self.scheduler = scheduler or RequestScheduler()
+        self.poll_scheduler = poll_scheduler or PollScheduler()
+        self.store = PlaybackStateStore(lambda: self.call(BACKGROUND, "current_playback"))
+        self.queue = None  # Latest whole queue as QueuedTracks, None until the first read
+        self.queue_read_at = 0.0
+        self.queue_track_id = None  # Track the queue was read for
+        self.pages = OrderedDict()  # (playlist URI, offset) -> (read at, tracks, next offset, total)
+        self.saved_tracks = SavedTracksCache()  # Shared by every widget
+        self.history = ListeningHistory() if HISTORY_ENABLED else None  # Attached widgets do not record
+
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._queue_lock = threading.Lock()  # Widgets asking at once share one read
+        self._pages_lock = threading.Lock()
+        self._next_poll_at = 0.0
+        self._stopped = False
+        self.server = None
+
+    def call(self, priority, method, *args, **kwargs):
+        return self.scheduler.call(priority, getattr(get_client(), method), *args, **kwargs)
+
+    def subscribe(self, subscriber):
+        with self._subscribers_lock:
+            first = not self._subscribers
+            self._subscribers.add(subscriber)
+        if first:
+            self.request_poll()  # Leave the unwatched heartbeat
+        # A new widget gets whatever is known right away, without an API call
+        if self.store.peek() is not None:
+            self.send(subscriber, self.playback_message())
+        if self.queue is not None:
+            self.send(subscriber, self.queue_message())
+        print(f"Widget attached ({len(self._subscribers)} connected).")
+
+    def unsubscribe(self, subscriber):
+        with self._subscribers_lock:
+            if subscriber not in self._subscribers:
+                return
+            self._subscribers.discard(subscriber)
+        print(f"Widget detached ({len(self._subscribers)} connected).")
+
+    def send(self, subscriber, message):
+        try:
+            subscriber.send(message)
+        except OSError as e:
+            print(f"Error sending to widget: {e}")
+            self.unsubscribe(subscriber)
+            subscriber.connection.close()
+
+    def broadcast(self, message):
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            self.send(subscriber, message)
+
+    def playback_message(self):
+        state = self.store.peek()
+        return {"type": "playback", "state": state.to_message() if state else None}
+
+    def queue_message(self):
+        return {"type": "queue", "tracks": [track.to_message() for track in self.queue or []]}
+
+    def handle_message(self, subscriber, message):
+        kind = message["type"]
+        if kind == "refresh":
+            if self.store.peek() is not None:
+                self.send(subscriber, self.playback_message())
+            else:
+                # Nothing fetched yet; the first poll is broadcast as soon as it lands
+                self.send(subscriber, {"type": "deferred", "delay": self.poll_scheduler.min_interval})
+        elif kind == "queue":
+            if self.queue is not None:
+                self.send(subscriber, self.queue_message())
+        elif kind == "page":
+            self.send_page(subscriber, message["source"], int(message["offset"]))
+        elif kind == "saved":
+            self.send_saved_states(subscriber, message["ids"])
+        elif kind == "command":
+            self.run_command(subscriber, message["name"], message.get("argument"))
+        else:
+            raise ValueError(f"Unknown message type: {kind}")
+
+    def read_queue(self, max_age=PAGE_MAX_AGE):
+        """
+        The whole queue, read again only once it is older than max_age seconds.
+        """
+        with self._queue_lock:
+            if self.queue is None or time.monotonic() - self.queue_read_at >= max_age:
+                self.queue = read_queue(self.call)
+                self.queue_read_at = time.monotonic()
+            return self.queue
+
+    def read_page(self, source, offset):
+        """
+        One page of the queue or a playlist, as fetch_page returns it, from the cache when
+        another widget loaded it within PAGE_MAX_AGE seconds.
+        """
+        if source == QUEUE_SOURCE:
+            queue = self.read_queue()
+            return queue, len(queue), len(queue)
+        key = (source, offset)
+        with self._pages_lock:
+            cached = self.pages.get(key)
+            if cached is not None and time.monotonic() - cached[0] < PAGE_MAX_AGE:
+                self.pages.move_to_end(key)
+                return cached[1:]
+            page = fetch_page(self.call, source, offset)
+            self.pages[key] = (time.monotonic(), *page)
+            self.pages.move_to_end(key)
+            while len(self.pages) > PAGE_CACHE_SIZE:
+                self.pages.popitem(last=False)
+            return page
+
+    def send_page(self, subscriber, source, offset):
+        """
+        Load one page for a widget's Up Next panel, in the background lane.
+        """
+        try:
+            tracks, next_offset, total = self.read_page(source, offset)
+        except Exception as e:
+            if not isinstance(e, RequestDeferred):
+                print(f"Error fetching queue page: {e}")
+            self.send(subscriber, {"type": "page_failed", "source": source, "offset": offset})
+            return
+        self.send(subscriber, {
+            "type": "page", "source": source, "offset": offset,
+            "tracks": [track.to_message() for track in tracks], "next_offset": next_offset, "total": total,
+        })
+
+    def send_saved_states(self, subscriber, track_ids):
+        try:
+            states = self.saved_tracks.lookup(self.call, track_ids)
+        except Exception as e:
+            if not isinstance(e, RequestDeferred):
+                print(f"Error fetching saved tracks: {e}")
+            states = self.saved_tracks.cached(track_ids)
+        self.send(subscriber, {"type": "saved", "states": states})
+
+    def run_command(self, subscriber, name, argument):
+        """
+        Execute a widget's command on its connection thread, in the interactive lane.
+        Widgets merge redundant clicks themselves and send one command at a time.
+        """
+        try:
+            run_command(self.call, name, argument)
+        except Exception as e:
+            print(f"Error running command {name}: {e}")
+            if name in LIBRARY_COMMANDS:
+                self.saved_tracks.invalidate(argument)  # A timed-out like may still have landed
+            self.send(subscriber, {"type": "command_failed", "name": name, "error": str(e)})
+            self.request_poll(self.poll_scheduler.after_command_delay)
+            return
+        if name in LIBRARY_COMMANDS:
+            # Playback is unchanged; only the library cache needs to learn about it
+            self.saved_tracks.put(argument, name == "like")
+            self.send(subscriber, {"type": "command_finished", "name": name, "argument": argument})
+            return
+        self.store.invalidate()
+        self.send(subscriber, {"type": "command_finished", "name": name, "argument": argument})
+        # Every widget learns the outcome from the next broadcast
+        self.request_poll(self.poll_scheduler.after_command_delay)
+
+    def request_poll(self, delay=0.0):
+        """
+        Poll no later than delay seconds from now.
+        """
+        with self._condition:
+            self._next_poll_at = min(self._next_poll_at, time.monotonic() + delay)
+            self._condition.notify_all()
+
+    def poll_loop(self):
+        while True:
+            with self._condition:
+                while not self._stopped and time.monotonic() < self._next_poll_at:
+                    self._condition.wait(self._next_poll_at - time.monotonic())
+                if self._stopped:
+                    return
+                self._next_poll_at = float("inf")
+            self.request_poll(self.poll())
+
+    def poll(self):
+        """
+        Fetch and broadcast one snapshot. Returns the delay until the next poll.
+        """
+        try:
+            state = self.store.get()
+        except RequestDeferred as e:
+            return max(e.delay, self.poll_scheduler.min_interval)
+        except Exception as e:
+            print(f"Error fetching playback state: {e}")
+            return max(self.scheduler.stats()["background_backoff_remaining"], self.poll_scheduler.retry_delay())
+
+        self.broadcast(self.playback_message())
+        if self.history:
+            self.history.observe(state)
+        if state is not None and state.track_id != self.queue_track_id:
+            self.refresh_queue(state.track_id)
+        # Without subscribers only the listening history needs snapshots
+        return self.poll_scheduler.next_delay(state, watched=bool(self._subscribers))
+
+    def refresh_queue(self, track_id):
+        """
+        Read the queue once per track change and broadcast it.
+        """
+        try:
+            self.read_queue(max_age=0.0)
+        except RequestDeferred:
+            return  # Retried with the next poll
+        except Exception as e:
+            print(f"Error fetching queue: {e}")
+            return
+        self.queue_track_id = track_id
+        self.broadcast(self.queue_message())
+
+    def bind(self):
+        """
+        Listen on the socket path, replacing a stale socket left by a crashed daemon.
+        """
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"A playback daemon is already listening on {self.path}")
+            finally:
+                probe.close()
+        # Commands control the user's playback, so the socket is created private rather
+        # than narrowed after bind. The umask is process-wide: a file the history writer
+        # creates meanwhile ends up private too, which is harmless.
+        umask = os.umask(0o077)
+        try:
+            self.server = DaemonServer(self.path, self)
+        finally:
+            os.umask(umask)
+
+    def serve_forever(self):
+        self.bind()
+        poller = threading.Thread(target=self.poll_loop, name="daemon-poll", daemon=True)
+        poller.start()
+        print(f"Playback daemon listening on {self.path}")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self.history:
+            self.history.close()
+            self.history = None
+        if self.server:
+            self.server.server_close()
+            self.server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    PlaybackDaemon().serve_forever()
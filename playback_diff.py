@@ -0,0 +1,37 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PlaybackDiff:
+    """
+    Which parts of the widget a new PlaybackState requires updating.
+    """
+    labels: bool = False
+    album_art: bool = False
+    play_state: bool = False
+    shuffle: bool = False
+    repeat: bool = False
+
+    def __bool__(self):
+        return self.labels or self.album_art or self.play_state or self.shuffle or self.repeat
+
+
+def diff_playback(previous, current):
+    """
+    Minimal set of widget updates to go from showing previous to showing current.
+    Tracks are compared by track ID, art by album ID and image URL.
+    """
+    if current is None:
+        return PlaybackDiff()
+    if previous is None:
+        return PlaybackDiff(labels=True, album_art=True, play_state=True, shuffle=True, repeat=True)
+    return PlaybackDiff(
+        labels=(previous.track_id != current.track_id
+                or previous.track_name != current.track_name
+                or previous.artist_name != current.artist_name),
+        album_art=(previous.album_id != current.album_id
+                   or previous.album_image_url != current.album_image_url),
+        play_state=previous.is_playing != current.is_playing,
+        shuffle=previous.shuffle_state != current.shuffle_state,
+        repeat=previous.repeat_state != current.repeat_state,
+    )
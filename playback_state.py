@@ -0,0 +1,197 @@
+from concurrent.futures import Future
+from dataclasses import asdict, dataclass
+import threading
+import time
+
+
+@dataclass(frozen=True)
+class PlaybackState:
+    """
+    Immutable snapshot of one current_playback() response.
+    """
+    track_id: str
+    track_name: str
+    artist_name: str
+    album_id: str
+    album_name: str
+    album_image_url: str
+    album_images: tuple
+    track_duration: int
+    track_progress: int
+    is_playing: bool
+    shuffle_state: bool
+    repeat_state: str
+    fetched_at: float  # time.monotonic() when the response arrived
+    context_uri: str = ""  # Playlist, album or artist being played from, if any
+    artist_names: tuple = ()  # Each credited artist; artist_name joins them for display
+
+    @classmethod
+    def from_api(cls, current_playback, fetched_at=None):
+        """
+        Parse a raw current_playback() payload. Returns None when nothing is playing.
+        """
+        if not current_playback or not current_playback.get('item'):
+            return None
+
+        item = current_playback['item']
+        album = item['album']
+        images = tuple((image['url'], image.get('width'), image.get('height')) for image in album['images'])
+        return cls(
+            track_id=item.get('id') or item.get('uri') or item['name'],
+            track_name=item['name'],
+            artist_name=", ".join([artist['name'] for artist in item['artists']]),
+            album_id=album.get('id') or album['name'],
+            album_name=album['name'],
+            album_image_url=images[0][0] if images else "",  # Largest image
+            album_images=images,
+            track_duration=int(item['duration_ms']),
+            track_progress=int(current_playback.get('progress_ms') or 0),
+            is_playing=bool(current_playback.get('is_playing')),
+            shuffle_state=bool(current_playback.get('shuffle_state')),
+            repeat_state=current_playback.get('repeat_state') or "off",
+            fetched_at=time.monotonic() if fetched_at is None else fetched_at,
+            context_uri=(current_playback.get('context') or {}).get('uri') or "",
+            artist_names=tuple(artist['name'] for artist in item['artists']),
+        )
+
+    def progress_at(self, now=None):
+        """
+        Extrapolate the playback position from the last response and the monotonic clock.
+        """
+        if not self.is_playing:
+            return self.track_progress
+        now = time.monotonic() if now is None else now
+        progress = self.track_progress + int((now - self.fetched_at) * 1000)
+        return max(0, min(progress, self.track_duration))
+
+    def remaining_ms(self, now=None):
+        """
+        Time left until the track is expected to end.
+        """
+        return self.track_duration - self.progress_at(now)
+
+    def to_message(self, now=None):
+        """
+        JSON-safe dict for another process. Monotonic clocks are per process, so the
+        snapshot's age is sent instead of fetched_at.
+        """
+        now = time.monotonic() if now is None else now
+        message = asdict(self)
+        message['age'] = max(0.0, now - message.pop('fetched_at'))
+        return message
+
+    @classmethod
+    def from_message(cls, message, now=None):
+        """
+        Rebuild a snapshot sent by to_message(), aged against this process's clock.
+        """
+        message = dict(message)
+        now = time.monotonic() if now is None else now
+        message['album_images'] = tuple(tuple(image) for image in message['album_images'])
+        message['artist_names'] = tuple(message.get('artist_names', ()))
+        message['fetched_at'] = now - message.pop('age')
+        return cls(**message)
+
+
+@dataclass(frozen=True)
+class QueuedTrack:
+    """
+    Metadata of an upcoming track from the playback queue.
+    """
+    track_id: str
+    track_name: str
+    artist_name: str
+    album_id: str
+    album_name: str
+    album_images: tuple
+    track_duration: int
+    artist_names: tuple = ()
+
+    @classmethod
+    def from_api(cls, item):
+        if not item or 'album' not in item:
+            return None  # Episodes and unavailable items carry no album
+        album = item['album']
+        return cls(
+            track_id=item.get('id') or item.get('uri') or item['name'],
+            track_name=item['name'],
+            artist_name=", ".join([artist['name'] for artist in item['artists']]),
+            album_id=album.get('id') or album['name'],
+            album_name=album['name'],
+            album_images=tuple((image['url'], image.get('width'), image.get('height')) for image in album['images']),
+            track_duration=int(item['duration_ms']),
+            artist_names=tuple(artist['name'] for artist in item['artists']),
+        )
+
+    def to_message(self):
+        return asdict(self)
+
+    @classmethod
+    def from_message(cls, message):
+        message = dict(message)
+        message['album_images'] = tuple(tuple(image) for image in message['album_images'])
+        message['artist_names'] = tuple(message.get('artist_names', ()))
+        return cls(**message)
+
+
+class PlaybackStateStore:
+    """
+    Shared cache of the latest PlaybackState with a freshness window.
+    Readers within the window get the cached snapshot; concurrent readers outside it
+    share a single in-flight current_playback() request.
+    """
+
+    def __init__(self, fetch, max_age=0.75):
+        self._fetch = fetch
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._state = None
+        self._fetched_at = None  # Set even when the response was "nothing playing"
+        self._in_flight = None
+        self.api_calls = 0
+
+    def get(self, max_age=None, fetch=None):
+        """
+        Return a snapshot no older than max_age seconds, fetching only if needed.
+        fetch overrides the store's fetch function for this call, e.g. to use another lane.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if self._fetched_at is not None and time.monotonic() - self._fetched_at <= max_age:
+                return self._state
+            future = self._in_flight
+            owner = future is None
+            if owner:
+                future = self._in_flight = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            self.api_calls += 1
+            state = PlaybackState.from_api((fetch or self._fetch)())
+        except Exception as e:
+            with self._lock:
+                self._in_flight = None
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._state = state
+            self._fetched_at = time.monotonic()
+            self._in_flight = None
+        future.set_result(state)
+        return state
+
+    def peek(self):
+        """
+        Return the cached snapshot without ever touching the network.
+        """
+        return self._state
+
+    def invalidate(self):
+        """
+        Force the next get() to fetch, e.g. after a command changed playback.
+        """
+        with self._lock:
+            self._fetched_at = None
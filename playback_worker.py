@@ -0,0 +1,311 @@
+from PyQt5.QtCore import Qt, QBuffer, QByteArray, QIODevice, QObject, QSize, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage, QImageReader
+from album_art_cache import ArtworkDiskCache
+from concurrent.futures import ThreadPoolExecutor
+from palette import SAMPLE_SIZE, extract_palette, pixels_from_rgb888
+from playback_state import PlaybackStateStore
+from request_scheduler import BACKGROUND, RequestDeferred, RequestScheduler
+from saved_tracks import SavedTracksCache
+from spotify_auth import get_client
+from transport import LIBRARY_COMMANDS, PREFETCH_DEPTH, QUEUE_SOURCE, fetch_page, read_queue, run_command, upcoming
+import os
+
+# How much decoded art one prefetch may produce
+PREFETCH_BUDGET_BYTES = int(os.getenv("SPOTIFY_WIDGET_PREFETCH_BUDGET_MB", "8")) * 1024 * 1024
+
+# Spotify covers are well under this; anything larger is not album art
+ART_MAX_BYTES = 4 * 1024 * 1024
+
+# Threads quantizing album art colors; NumPy releases the GIL for the heavy parts
+PALETTE_WORKERS = int(os.getenv("SPOTIFY_WIDGET_PALETTE_WORKERS", "2"))
+
+# Threads loading Up Next thumbnails, so a batch never delays polls or the main album art.
+# Kept below the shared session's four connections per host.
+THUMBNAIL_WORKERS = int(os.getenv("SPOTIFY_WIDGET_THUMBNAIL_WORKERS", "3"))
+
+
+class SpotifyCaller:
+    """
+    Mixin routing Spotify calls through the shared request scheduler.
+    """
+
+    @property
+    def sp(self):
+        # Created lazily off the GUI thread, so OAuth setup never blocks the window
+        return get_client()
+
+    def call(self, priority, method, *args, **kwargs):
+        """
+        Call sp.<method>(*args, **kwargs) in the given scheduler lane.
+        """
+        return self.scheduler.call(priority, getattr(self.sp, method), *args, **kwargs)
+
+
+class PlaybackWorker(QObject, SpotifyCaller):
+    """
+    Background lane: playback polls, queue reads and artwork downloads.
+    Lives on its own QThread so the GUI thread never blocks on network I/O.
+    """
+    playback_updated = pyqtSignal(object)  # PlaybackState, or None
+    poll_deferred = pyqtSignal(float)  # Seconds until the scheduler allows the next poll
+    album_art_ready = pyqtSignal(object, QImage)  # (url, width, height), pre-scaled image
+    album_art_failed = pyqtSignal(object)  # Key that could not be loaded or was skipped
+    queue_updated = pyqtSignal(list)  # Upcoming QueuedTracks, at most prefetch_depth
+    palette_ready = pyqtSignal(str, object)  # (album ID, Palette), None when extraction failed
+    queue_page_ready = pyqtSignal(str, int, list, int, int)  # (source, offset, QueuedTracks, next offset, total)
+    queue_page_failed = pyqtSignal(str, int)  # (source, offset)
+    saved_tracks_ready = pyqtSignal(dict)  # track ID -> whether it is in the user's library
+
+    def __init__(self, store=None, art_cache=None, scheduler=None):
+        super().__init__()
+        self.scheduler = scheduler or RequestScheduler()
+        self.store = store or PlaybackStateStore(lambda: self.call(BACKGROUND, "current_playback"))
+        self.art_cache = art_cache or ArtworkDiskCache()
+        self.prefetch_depth = PREFETCH_DEPTH
+        self.prefetch_budget = PREFETCH_BUDGET_BYTES
+        self.palette_pool = None  # Started on the first palette request
+        self.thumbnail_pool = None  # Started when the Up Next panel first asks for thumbnails
+        self.saved_tracks = SavedTracksCache()
+
+    @pyqtSlot()
+    def poll(self):
+        """
+        Fetch the current playback state and publish it to the widget.
+        """
+        try:
+            self.playback_updated.emit(self.store.get())
+        except RequestDeferred as e:
+            self.poll_deferred.emit(e.delay)
+        except Exception as e:
+            print(f"Error fetching playback state: {e}")
+            self.poll_deferred.emit(self.scheduler.stats()["background_backoff_remaining"])
+
+    def load_album_art(self, album_image_url):
+        """
+        Encoded album art from the disk cache, downloading it on a miss.
+        """
+        data = self.art_cache.get(album_image_url)
+        if data is None:
+            from http_session import fetch_bytes  # Deferred off the startup path
+
+            # Streamed so a bogus URL cannot make us buffer an unbounded body
+            data = fetch_bytes(album_image_url, stream=True, max_bytes=ART_MAX_BYTES)
+            self.art_cache.put(album_image_url, data)
+        return data
+
+    def decode_album_art(self, key):
+        """
+        Load, decode and pre-scale the album art for a (url, width, height) key.
+        """
+        album_image_url, width, height = key
+        image = QImage()
+        image.loadFromData(self.load_album_art(album_image_url))
+        if image.isNull():
+            return None
+        return image.scaled(width, height, Qt.KeepAspectRatioByExpanding, Qt.SmoothTransformation)
+
+    @pyqtSlot(object)
+    def fetch_album_art(self, key):
+        """
+        Load album art off the GUI thread and hand the decoded image to the widget.
+        """
+        try:
+            image = self.decode_album_art(key)
+        except Exception as e:
+            print(f"Error downloading album art: {e}")
+            image = None
+        if image is not None:
+            self.album_art_ready.emit(key, image)
+        else:
+            self.album_art_failed.emit(key)
+
+    def sample_album_art(self, album_image_url):
+        """
+        Album art decoded directly at SAMPLE_SIZE pixels square, as an (n, 3) RGB array.
+        JPEG decoders scale while decoding, so this costs a fraction of a full decode.
+        """
+        buffer = QBuffer()
+        buffer.setData(QByteArray(self.load_album_art(album_image_url)))
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        reader.setScaledSize(QSize(SAMPLE_SIZE, SAMPLE_SIZE))
+        image = reader.read()
+        if image.isNull():
+            return None
+        image = image.convertToFormat(QImage.Format_RGB888)
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        return pixels_from_rgb888(bits.asstring(), image.width(), image.height(), image.bytesPerLine())
+
+    @pyqtSlot(str, str)
+    def extract_palette(self, album_id, album_image_url):
+        """
+        Quantize an album's art colors in the palette pool and hand the Palette to the widget.
+        """
+        try:
+            pixels = self.sample_album_art(album_image_url)
+        except Exception as e:
+            print(f"Error sampling album art: {e}")
+            pixels = None
+        if pixels is None:
+            self.palette_ready.emit(album_id, None)
+            return
+        if self.palette_pool is None:
+            self.palette_pool = ThreadPoolExecutor(max_workers=PALETTE_WORKERS, thread_name_prefix="palette")
+        future = self.palette_pool.submit(extract_palette, pixels)
+        future.add_done_callback(lambda done: self.on_palette_extracted(album_id, done))
+
+    def on_palette_extracted(self, album_id, future):
+        # Runs on a pool thread; the signal is queued to the widget
+        try:
+            palette = future.result()
+        except Exception as e:
+            print(f"Error extracting palette: {e}")
+            palette = None
+        self.palette_ready.emit(album_id, palette)
+
+    @pyqtSlot()
+    def fetch_queue(self):
+        """
+        Read the user's queue once and publish it twice: the next tracks, so their art can be
+        prefetched, and the whole queue as the first page of the Up Next panel.
+        """
+        try:
+            queue = read_queue(self.call)
+        except Exception as e:
+            print(f"Error fetching queue: {e}")
+            return
+        self.queue_updated.emit(upcoming(queue, self.prefetch_depth))
+        self.queue_page_ready.emit(QUEUE_SOURCE, 0, queue, len(queue), len(queue))
+
+    @pyqtSlot(str, int)
+    def fetch_queue_page(self, source, offset):
+        """
+        Load one page of the Up Next panel's queue or playlist.
+        """
+        try:
+            tracks, next_offset, total = fetch_page(self.call, source, offset)
+        except RequestDeferred:
+            self.queue_page_failed.emit(source, offset)  # Retried when the panel asks again
+            return
+        except Exception as e:
+            print(f"Error fetching queue page: {e}")
+            self.queue_page_failed.emit(source, offset)
+            return
+        self.queue_page_ready.emit(source, offset, tracks, next_offset, total)
+
+    @pyqtSlot(list)
+    def fetch_saved_tracks(self, track_ids):
+        """
+        Publish which of the tracks are liked, asking Spotify only about unknown ones.
+        """
+        try:
+            states = self.saved_tracks.lookup(self.call, track_ids)
+        except RequestDeferred:
+            states = self.saved_tracks.cached(track_ids)  # The rest is asked for again later
+        except Exception as e:
+            print(f"Error fetching saved tracks: {e}")
+            states = self.saved_tracks.cached(track_ids)
+        self.saved_tracks_ready.emit(states)
+
+    @pyqtSlot(list)
+    def fetch_thumbnails(self, keys):
+        """
+        Decode thumbnails for the rows the panel is showing in the thumbnail pool, without a
+        memory budget: the panel asks only for what is on screen.
+        """
+        if self.thumbnail_pool is None:
+            self.thumbnail_pool = ThreadPoolExecutor(max_workers=THUMBNAIL_WORKERS, thread_name_prefix="thumbnail")
+        for key in keys:
+            self.thumbnail_pool.submit(self.load_thumbnail, key)
+
+    def load_thumbnail(self, key):
+        """
+        Runs in the thumbnail pool; the signals reach the widget as queued calls.
+        """
+        try:
+            image = self.decode_album_art(key)
+        except Exception as e:
+            print(f"Error loading thumbnail: {e}")
+            image = None
+        if image is not None:
+            self.album_art_ready.emit(key, image)
+        else:
+            self.album_art_failed.emit(key)
+
+    @pyqtSlot()
+    def shutdown(self):
+        """
+        Stop the palette and thumbnail pools, dropping work they have not started.
+        Runs on the worker thread, so no slot can start a pool again meanwhile.
+        """
+        for pool in (self.palette_pool, self.thumbnail_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self.palette_pool = self.thumbnail_pool = None
+
+    @pyqtSlot(list)
+    def prefetch_album_art(self, keys):
+        """
+        Decode art for upcoming tracks ahead of time, within the prefetch memory budget.
+        """
+        budget = self.prefetch_budget
+        for index, key in enumerate(keys):
+            try:
+                image = self.decode_album_art(key)
+            except Exception as e:
+                print(f"Error prefetching album art: {e}")
+                image = None
+            if image is None:
+                self.album_art_failed.emit(key)
+                continue
+            budget -= image.sizeInBytes()
+            if budget < 0:
+                for skipped in keys[index:]:
+                    self.album_art_failed.emit(skipped)
+                break
+            self.album_art_ready.emit(key, image)
+
+
+class CommandWorker(QObject, SpotifyCaller):
+    """
+    Interactive lane: drains the command queue filled by the widget's transport controls.
+    Runs on its own QThread so commands never wait behind a background poll.
+    """
+    command_finished = pyqtSignal(str, object)
+    command_failed = pyqtSignal(str, str)
+
+    def __init__(self, store, scheduler, commands, saved_tracks=None):
+        super().__init__()
+        self.store = store
+        self.scheduler = scheduler
+        self.commands = commands
+        self.saved_tracks = saved_tracks or SavedTracksCache()
+
+    @pyqtSlot()
+    def drain(self):
+        """
+        Execute queued commands until the queue is empty.
+        Clicks arriving meanwhile are merged into the commands still waiting.
+        """
+        while True:
+            command = self.commands.take()
+            if command is None:
+                return
+            try:
+                run_command(self.call, command.name, command.argument)
+            except Exception as e:
+                print(f"Error running command {command.name}: {e}")
+                if command.name in LIBRARY_COMMANDS:
+                    # A timed-out like may still have landed; the widget's lookup asks Spotify
+                    self.saved_tracks.invalidate(command.argument)
+                self.commands.done()
+                self.command_failed.emit(command.name, str(e))
+                continue
+            if command.name in LIBRARY_COMMANDS:
+                self.saved_tracks.put(command.argument, command.name == "like")
+            else:
+                # Playback changed, the next reader must see a fresh snapshot
+                self.store.invalidate()
+            self.commands.done()
+            self.command_finished.emit(command.name, command.argument)
@@ -0,0 +1,68 @@
+import time
+
+
+class PollScheduler:
+    """
+    Decides how long to wait before the next network poll.
+    Progress between polls is interpolated locally, so mid-track polls only need to
+    catch changes made elsewhere; the poll before a track ends is timed for the end.
+    Nobody watching (hidden, user idle) or a long pause drops to a slow heartbeat, and a
+    locked screen suspends polling until the widget is watched again.
+    """
+
+    def __init__(
+        self,
+        mid_track_interval=10.0,
+        paused_interval=5.0,
+        idle_interval=10.0,
+        track_end_margin=0.3,
+        min_interval=0.5,
+        after_command_delay=0.4,
+        unwatched_interval=60.0,
+        idle_after=300.0,
+        long_pause_after=600.0,
+        long_pause_interval=60.0,
+    ):
+        self.mid_track_interval = mid_track_interval
+        self.paused_interval = paused_interval
+        self.idle_interval = idle_interval
+        self.track_end_margin = track_end_margin
+        self.min_interval = min_interval
+        self.after_command_delay = after_command_delay
+        self.unwatched_interval = unwatched_interval  # Heartbeat while nobody sees the widget
+        self.idle_after = idle_after  # Seconds without user input before the user counts as away
+        self.long_pause_after = long_pause_after
+        self.long_pause_interval = long_pause_interval
+        self.paused_since = None  # time.monotonic() when playback was first seen paused
+
+    def next_delay(self, state, now=None, watched=True, locked=False):
+        """
+        Seconds until the next poll given the latest PlaybackState (or None), or None to
+        suspend polling until activity resumes.
+        """
+        now = time.monotonic() if now is None else now
+        if state is None or state.is_playing:
+            self.paused_since = None
+        elif self.paused_since is None:
+            self.paused_since = now
+
+        if locked:
+            return None
+        if not watched:
+            return self.unwatched_interval
+        if state is None:
+            return self.idle_interval
+        if not state.is_playing:
+            if now - self.paused_since >= self.long_pause_after:
+                return self.long_pause_interval
+            return self.paused_interval
+
+        # Land just after the expected track end so the next track shows up immediately
+        until_track_end = state.remaining_ms(now) / 1000 + self.track_end_margin
+        return max(self.min_interval, min(self.mid_track_interval, until_track_end))
+
+    def retry_delay(self):
+        """
+        Fallback delay used when a poll produces no snapshot.
+        """
+        return self.paused_interval
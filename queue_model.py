@@ -0,0 +1,192 @@
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPixmap
+from album_art_cache import PixmapCache, pick_image
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from transport import QUEUE_SOURCE
+
+TrackRole = Qt.UserRole + 1
+
+THUMBNAIL_SIZE = 40  # Logical pixels
+THUMBNAIL_CACHE_BYTES = 4 * 1024 * 1024  # Keeps memory flat however long the list is
+THUMBNAIL_BATCH = 24  # At most this many thumbnails per request, the most recently painted rows
+
+
+class QueueModel(QAbstractListModel):
+    """
+    Rows of the Up Next panel: the playback queue or the playlist being played.
+    Playlists are loaded page by page as the view scrolls (canFetchMore/fetchMore).
+    Thumbnails are requested only for rows the view paints. A refreshed queue is applied
+    as a diff, so unchanged rows keep their place and rendering.
+    """
+    page_requested = pyqtSignal(str, int)  # (source, offset)
+    thumbnails_requested = pyqtSignal(list)  # (url, width, height) keys
+
+    def __init__(self, ratio=1.0, parent=None):
+        super().__init__(parent)
+        self.ratio = ratio
+        self.source = QUEUE_SOURCE
+        self.tracks = []
+        self.next_offset = 0  # Source offset of the next page
+        self.total = 0  # Items the source has, loaded or not
+        self.loading = False
+        self.current_track_id = None
+
+        self.thumbnails = PixmapCache(max_bytes=THUMBNAIL_CACHE_BYTES)
+        self.thumbnails_pending = set()
+        self.thumbnails_wanted = OrderedDict()
+        self.placeholder = QPixmap(round(THUMBNAIL_SIZE * ratio), round(THUMBNAIL_SIZE * ratio))
+        self.placeholder.fill(Qt.transparent)
+        self.placeholder.setDevicePixelRatio(ratio)
+        self.bold_font = QFont()
+        self.bold_font.setBold(True)
+
+        # Painting asks for thumbnails row by row; collect them and send one batch once
+        # scrolling pauses, so a fling through thousands of rows loads only where it stops
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setSingleShot(True)
+        self.thumbnail_timer.setInterval(80)
+        self.thumbnail_timer.timeout.connect(self.request_thumbnails)
+        # Arriving thumbnails repaint the view once per burst
+        self.repaint_timer = QTimer(self)
+        self.repaint_timer.setSingleShot(True)
+        self.repaint_timer.setInterval(30)
+        self.repaint_timer.timeout.connect(self.repaint_thumbnails)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.tracks)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.tracks):
+            return None
+        track = self.tracks[index.row()]
+        if role == Qt.DisplayRole:
+            return f"{track.track_name}\n{track.artist_name}"
+        if role == Qt.DecorationRole:
+            return self.thumbnail(track)
+        if role == Qt.ToolTipRole:
+            return track.album_name
+        if role == Qt.FontRole and track.track_id == self.current_track_id:
+            return self.bold_font
+        if role == TrackRole:
+            return track
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.loading and self.next_offset < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if self.canFetchMore(parent):
+            self.loading = True
+            self.page_requested.emit(self.source, self.next_offset)
+
+    def set_source(self, source):
+        """
+        Show another source, loading its first page. Does nothing if it is already shown.
+        """
+        if source == self.source and (self.tracks or self.loading):
+            return
+        self.beginResetModel()
+        self.source = source
+        self.tracks = []
+        self.next_offset = 0
+        self.total = 0
+        self.loading = False
+        self.endResetModel()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Reload the first page. For the queue, that is the whole queue.
+        """
+        if not self.loading:
+            self.loading = True
+            self.page_requested.emit(self.source, 0)
+
+    def on_page_ready(self, source, offset, tracks, next_offset, total):
+        """
+        A first page replaces the list through a diff; later pages append.
+        """
+        if source != self.source:
+            return  # Answer for a source we switched away from
+        self.loading = False
+        if offset == 0:
+            self.apply_diff(tracks)
+        elif offset == self.next_offset:
+            self.beginInsertRows(QModelIndex(), len(self.tracks), len(self.tracks) + len(tracks) - 1)
+            self.tracks.extend(tracks)
+            self.endInsertRows()
+        else:
+            return  # Stale page
+        self.next_offset = next_offset
+        self.total = total
+
+    def on_page_failed(self, source, offset):
+        if source == self.source:
+            self.loading = False  # The view asks again through canFetchMore when it scrolls
+
+    def apply_diff(self, tracks):
+        """
+        Turn the current rows into tracks with row inserts and removals only where they differ.
+        """
+        matcher = SequenceMatcher(None, [track.track_id for track in self.tracks],
+                                  [track.track_id for track in tracks], autojunk=False)
+        # Back to front, so the row numbers of earlier operations stay valid
+        for tag, old_start, old_end, new_start, new_end in reversed(matcher.get_opcodes()):
+            if tag == "equal":
+                self.tracks[old_start:old_end] = tracks[new_start:new_end]
+                continue
+            if old_end > old_start:
+                self.beginRemoveRows(QModelIndex(), old_start, old_end - 1)
+                del self.tracks[old_start:old_end]
+                self.endRemoveRows()
+            if new_end > new_start:
+                self.beginInsertRows(QModelIndex(), old_start, old_start + new_end - new_start - 1)
+                self.tracks[old_start:old_start] = tracks[new_start:new_end]
+                self.endInsertRows()
+
+    def set_current_track(self, track_id):
+        if track_id != self.current_track_id:
+            self.current_track_id = track_id
+            if self.tracks:
+                self.dataChanged.emit(self.index(0), self.index(len(self.tracks) - 1), [Qt.FontRole])
+
+    def thumbnail_key(self, track):
+        pixels = round(THUMBNAIL_SIZE * self.ratio)
+        image = pick_image(track.album_images, pixels, pixels)
+        return (image[0], pixels, pixels) if image else None
+
+    def thumbnail(self, track):
+        key = self.thumbnail_key(track)
+        if key is None:
+            return self.placeholder
+        pixmap = self.thumbnails.get(key)
+        if pixmap is not None:
+            return pixmap
+        if key not in self.thumbnails_pending:
+            self.thumbnails_wanted[key] = None
+            self.thumbnails_wanted.move_to_end(key)
+            self.thumbnail_timer.start()
+        return self.placeholder
+
+    def request_thumbnails(self):
+        keys = list(self.thumbnails_wanted)[-THUMBNAIL_BATCH:]
+        self.thumbnails_wanted.clear()
+        self.thumbnails_pending.update(keys)
+        self.thumbnails_requested.emit(keys)
+
+    def on_thumbnail_ready(self, key, image):
+        if key not in self.thumbnails_pending:
+            return  # Album art for the main label, not a thumbnail
+        self.thumbnails_pending.discard(key)
+        pixmap = QPixmap.fromImage(image)
+        pixmap.setDevicePixelRatio(self.ratio)
+        self.thumbnails.put(key, pixmap)
+        self.repaint_timer.start()
+
+    def on_thumbnail_failed(self, key):
+        self.thumbnails_pending.discard(key)
+
+    def repaint_thumbnails(self):
+        if self.tracks:
+            self.dataChanged.emit(self.index(0), self.index(len(self.tracks) - 1), [Qt.DecorationRole])
@@ -0,0 +1,163 @@
+import random
+import threading
+import time
+
+# Priority lanes: user-initiated commands always go ahead of background polls
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class RequestDeferred(Exception):
+    """
+    Raised instead of running a background request while budget or backoff forbid it.
+    """
+
+    def __init__(self, delay):
+        super().__init__(f"Request deferred for {delay:.1f}s")
+        self.delay = delay
+
+
+def retry_after(error):
+    """
+    Seconds to wait according to a 429 error, or None if the error is not a rate limit.
+    Understands spotipy's SpotifyException and requests' HTTPError.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(error, "http_status", None) or getattr(response, "status_code", None)
+    if status != 429:
+        return None
+    headers = getattr(error, "headers", None) or getattr(response, "headers", None) or {}
+    try:
+        return max(1.0, float(headers.get("Retry-After") or headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return 5.0  # Spotify always sends Retry-After, but be defensive
+
+
+class RequestScheduler:
+    """
+    Shared gate for every Spotify Web API call.
+    A token bucket bounds the request rate across all endpoints, Retry-After from a 429
+    pauses everyone, and background requests back off with jitter on errors. Interactive
+    requests wait for budget; background requests are deferred instead of queuing.
+    """
+
+    def __init__(self, rate=2.0, burst=10, interactive_reserve=3, max_interactive_wait=10.0,
+                 base_backoff=1.0, max_backoff=60.0):
+        self.rate = rate  # Tokens added per second
+        self.burst = burst  # Bucket capacity
+        self.interactive_reserve = interactive_reserve  # Tokens background requests may not use
+        self.max_interactive_wait = max_interactive_wait
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self._condition = threading.Condition()
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0  # Retry-After, applies to both lanes
+        self._backoff_until = 0.0  # Error backoff, background lane only
+        self._background_failures = 0
+        self._waiting_interactive = 0
+        self.counters = {"requests": 0, "rate_limited": 0, "errors": 0, "deferred": 0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _background_delay(self, now):
+        """
+        Seconds a background request would have to wait right now, 0 if it may run.
+        """
+        delay = max(self._blocked_until - now, self._backoff_until - now, 0.0)
+        if delay == 0 and self._waiting_interactive:
+            delay = 1 / self.rate
+        if delay == 0 and self._tokens < 1 + self.interactive_reserve:
+            delay = (1 + self.interactive_reserve - self._tokens) / self.rate
+        return delay
+
+    def _acquire(self, priority):
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+
+            if priority == BACKGROUND:
+                delay = self._background_delay(now)
+                if delay > 0:
+                    self.counters["deferred"] += 1
+                    raise RequestDeferred(delay)
+                self._tokens -= 1
+                return
+
+            deadline = now + self.max_interactive_wait
+            self._waiting_interactive += 1
+            try:
+                while True:
+                    if now >= self._blocked_until and self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0.01)
+                    if now + wait > deadline:
+                        self.counters["deferred"] += 1
+                        raise RequestDeferred(wait)
+                    self._condition.wait(wait)
+                    now = time.monotonic()
+                    self._refill(now)
+            finally:
+                self._waiting_interactive -= 1
+
+    def call(self, priority, function, *args, **kwargs):
+        """
+        Run function(*args, **kwargs) once the lane's budget allows it.
+        A rate-limited interactive request is sent once more after Retry-After: Spotify did
+        not act on it, and dropping it would lose the user's click.
+        """
+        for attempt in range(2):
+            self._acquire(priority)
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                self._on_error(priority, e)
+                if priority == INTERACTIVE and attempt == 0 and retry_after(e) is not None:
+                    continue
+                raise
+            self._on_success(priority)
+            return result
+
+    def _on_success(self, priority):
+        with self._condition:
+            self.counters["requests"] += 1
+            if priority == BACKGROUND:
+                self._background_failures = 0
+
+    def _on_error(self, priority, error):
+        with self._condition:
+            self.counters["requests"] += 1
+            self.counters["errors"] += 1
+            now = time.monotonic()
+            delay = retry_after(error)
+            if delay is not None:
+                self.counters["rate_limited"] += 1
+                self._blocked_until = max(self._blocked_until, now + delay)
+                print(f"Rate limited by Spotify, pausing requests for {delay:.0f}s.")
+            if priority == BACKGROUND:
+                self._background_failures += 1
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._background_failures - 1))
+                self._backoff_until = now + backoff * random.uniform(0.5, 1.5)
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Snapshot of the current budget and backoff state, for monitoring.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                "tokens": round(self._tokens, 2),
+                "rate": self.rate,
+                "burst": self.burst,
+                "retry_after_remaining": round(max(0.0, self._blocked_until - now), 2),
+                "background_backoff_remaining": round(max(0.0, self._backoff_until - now), 2),
+                "background_failures": self._background_failures,
+                "waiting_interactive": self._waiting_interactive,
+                **self.counters,
+            }
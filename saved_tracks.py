@@ -0,0 +1,82 @@
+from request_scheduler import BACKGROUND
+import re
+import threading
+import time
+
+# current_user_saved_tracks_contains accepts at most this many IDs per request
+BATCH_SIZE = 50
+
+# Likes made in another app show up after this long at the latest
+MAX_AGE = 60 * 60.0
+
+# Local files and other tracks without a Spotify ID cannot be in the library
+_SPOTIFY_ID = re.compile(r"^[0-9A-Za-z]{22}$")
+
+
+def is_spotify_id(track_id):
+    """
+    Whether a track ID can be in the library; local files only have a URI or a name.
+    """
+    return bool(_SPOTIFY_ID.match(track_id))
+
+
+class SavedTracksCache:
+    """
+    Which tracks are in the user's library, by track ID. Lookups of unknown tracks are
+    batched into as few contains requests as possible; likes and unlikes made from the
+    widget update the entry directly.
+    """
+
+    def __init__(self, max_age=MAX_AGE):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries = {}  # track ID -> (saved, time.monotonic() when learned)
+        self.api_calls = 0
+
+    def cached(self, track_ids, now=None):
+        """
+        {track ID: saved} for the tracks whose state is known and fresh.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            states = {}
+            for track_id in track_ids:
+                entry = self._entries.get(track_id)
+                if entry is not None and now - entry[1] <= self.max_age:
+                    states[track_id] = entry[0]
+            return states
+
+    def lookup(self, call, track_ids):
+        """
+        {track ID: saved} for every track, asking Spotify only about the unknown ones,
+        BATCH_SIZE at a time. call(priority, method, *args) goes through the scheduler.
+        """
+        track_ids = [track_id for track_id in dict.fromkeys(track_ids) if is_spotify_id(track_id)]
+        states = self.cached(track_ids)
+        missing = [track_id for track_id in track_ids if track_id not in states]
+        for start in range(0, len(missing), BATCH_SIZE):
+            batch = missing[start:start + BATCH_SIZE]
+            self.api_calls += 1
+            asked_at = time.monotonic()
+            results = call(BACKGROUND, "current_user_saved_tracks_contains", batch)
+            learned_at = time.monotonic()
+            with self._lock:
+                for track_id, saved in zip(batch, results):
+                    entry = self._entries.get(track_id)
+                    if entry is not None and entry[1] >= asked_at:
+                        states[track_id] = entry[0]  # Liked or unliked while Spotify answered
+                    else:
+                        states[track_id] = bool(saved)
+                        self._entries[track_id] = (bool(saved), learned_at)
+        return states
+
+    def put(self, track_id, saved):
+        with self._lock:
+            self._entries[track_id] = (saved, time.monotonic())
+
+    def invalidate(self, track_id):
+        """
+        Forget a track whose state is uncertain, so the next lookup asks Spotify.
+        """
+        with self._lock:
+            self._entries.pop(track_id, None)
@@ -1,7 +1,7 @@
 import os
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyOAuth
+import threading
 from dotenv import load_dotenv
+from startup_timing import startup_timer
 
 load_dotenv()
 
@@ -10,12 +10,64 @@ scope = (
     "user-modify-playback-state "
     "user-read-playback-state "
     "streaming "
-    "user-read-currently-playing"
+    "user-read-currently-playing "
+    "user-library-read "
+    "user-library-modify "
+    # The Up Next panel pages through the playing playlist, which is often private or collaborative
+    "playlist-read-private "
+    "playlist-read-collaborative"
 )
 
-sp = Spotify(auth_manager=SpotifyOAuth(
-    client_id=os.getenv("SPOTIPY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
-    redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
-    scope=scope
-))
+# Point the client at another Web API server, e.g. the benchmark's fake Spotify.
+# A static access token then replaces the OAuth flow.
+API_URL = os.getenv("SPOTIFY_WIDGET_API_URL")
+ACCESS_TOKEN = os.getenv("SPOTIFY_WIDGET_ACCESS_TOKEN")
+
+_client = None
+_token_refresher = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    The shared Spotify client, created on first use so importing this module stays cheap.
+    """
+    global _client, _token_refresher
+    with _client_lock:
+        if _client is None:
+            # Imported here: spotipy pulls in requests and urllib3, which slows down startup
+            from spotipy import Spotify
+            from spotipy.oauth2 import SpotifyOAuth
+            from http_session import TIMEOUT, get_session
+            from token_cache import TokenCache, TokenRefresher
+
+            # API and token requests share the pooled session used for artwork
+            session = get_session()
+            if ACCESS_TOKEN:
+                _client = Spotify(auth=ACCESS_TOKEN, requests_session=session, requests_timeout=TIMEOUT)
+            else:
+                # The token lives in memory and is refreshed ahead of expiry in the background
+                token_cache = TokenCache()
+                auth_manager = SpotifyOAuth(
+                    client_id=os.getenv("SPOTIPY_CLIENT_ID"),
+                    client_secret=os.getenv("SPOTIPY_CLIENT_SECRET"),
+                    redirect_uri=os.getenv("SPOTIPY_REDIRECT_URI"),
+                    scope=scope,
+                    cache_handler=token_cache,
+                    requests_session=session,
+                    requests_timeout=TIMEOUT,
+                )
+                _client = Spotify(auth_manager=auth_manager, requests_session=session, requests_timeout=TIMEOUT)
+                _token_refresher = TokenRefresher(auth_manager, token_cache)
+                _token_refresher.start()
+            if API_URL:
+                _client.prefix = API_URL.rstrip("/") + "/"
+            startup_timer.mark("auth")
+    return _client
+
+
+def __getattr__(name):
+    # Keeps `from spotify_auth import sp` working without creating the client at import time
+    if name == "sp":
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
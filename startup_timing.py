@@ -0,0 +1,42 @@
+import time
+
+# Imported first by main.py, so this approximates process start
+_START = time.perf_counter()
+
+# First paint should land within this budget; everything else hydrates afterwards
+STARTUP_BUDGET_MS = 300
+
+
+class StartupTimer:
+    """
+    Records named startup milestones relative to process start and prints a report.
+    """
+    # Not "auth": it always precedes the first API response, and an attached widget never
+    # authenticates (it marks "daemon_connected" instead)
+    REPORT_MARKS = ("imports", "first_paint", "first_api_response")
+
+    def __init__(self):
+        self.marks = {}
+        self.reported = False
+
+    def mark(self, name):
+        """
+        Record a milestone once; later marks with the same name are ignored.
+        """
+        if name not in self.marks:
+            self.marks[name] = (time.perf_counter() - _START) * 1000
+            if not self.reported and all(mark in self.marks for mark in self.REPORT_MARKS):
+                self.reported = True
+                print(self.report())
+
+    def report(self):
+        lines = ["Startup timing (ms since start):"]
+        for name, elapsed in sorted(self.marks.items(), key=lambda mark: mark[1]):
+            lines.append(f"  {name:<20} {elapsed:8.1f}")
+        first_paint = self.marks.get("first_paint")
+        if first_paint is not None and first_paint > STARTUP_BUDGET_MS:
+            lines.append(f"  first paint exceeded the {STARTUP_BUDGET_MS} ms startup budget")
+        return "\n".join(lines)
+
+
+startup_timer = StartupTimer()
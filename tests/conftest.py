@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from playback_state import PlaybackState  # noqa: E402
+
+
+@pytest.fixture
+def make_state():
+    """
+    PlaybackState factory with defaults for every field a test does not care about.
+    """
+
+    def make(track_id="track-a", progress=0, playing=True, duration=200000, fetched_at=0.0, **fields):
+        artists = fields.pop("artist_names", ("Artist",))
+        return PlaybackState(
+            track_id=track_id,
+            track_name=fields.pop("track_name", f"Track {track_id}"),
+            artist_name=", ".join(artists),
+            album_id=fields.pop("album_id", "album"),
+            album_name=fields.pop("album_name", "Album"),
+            album_image_url="",
+            album_images=(),
+            track_duration=duration,
+            track_progress=progress,
+            is_playing=playing,
+            shuffle_state=fields.pop("shuffle_state", False),
+            repeat_state=fields.pop("repeat_state", "off"),
+            fetched_at=fetched_at,
+            artist_names=tuple(artists),
+            **fields,
+        )
+
+    return make
@@ -0,0 +1,44 @@
+import os
+
+from album_art_cache import ArtworkDiskCache, pick_image
+
+IMAGES = (("large", 640, 640), ("small", 64, 64), ("medium", 300, 300))
+
+
+def test_pick_image_takes_the_smallest_that_covers_the_size():
+    assert pick_image(IMAGES, 300, 300) == ("medium", 300, 300)
+    assert pick_image(IMAGES, 301, 200) == ("large", 640, 640)
+    assert pick_image(IMAGES, 40, 40) == ("small", 64, 64)
+
+
+def test_pick_image_falls_back_to_the_largest():
+    assert pick_image(IMAGES, 2000, 2000) == ("large", 640, 640)
+    assert pick_image((), 300, 300) is None
+
+
+def test_pick_image_prefers_known_sizes_over_unknown_ones():
+    images = (("unknown", None, None), ("medium", 300, 300))
+    assert pick_image(images, 300, 300) == ("medium", 300, 300)
+    assert pick_image(images, 600, 600) == ("unknown", None, None)
+
+
+def test_disk_cache_touches_the_disk_only_when_written(tmp_path):
+    directory = str(tmp_path / "album-art")
+    cache = ArtworkDiskCache(directory)
+    assert not os.path.exists(directory)
+    assert cache.get("https://i.scdn.co/image/a") is None
+
+    cache.put("https://i.scdn.co/image/a", b"jpeg")
+    assert cache.get("https://i.scdn.co/image/a") == b"jpeg"
+
+
+def test_disk_cache_evicts_the_least_recently_used(tmp_path):
+    directory = str(tmp_path / "album-art")
+    ArtworkDiskCache(directory).put("old", b"x" * 10)
+    cache = ArtworkDiskCache(directory, max_bytes=25)  # Counts what an earlier run left
+    os.utime(cache._path("old"), (0, 0))
+    cache.put("new", b"y" * 10)
+    cache.put("newer", b"z" * 10)
+    assert cache.get("old") is None
+    assert cache.get("new") == b"y" * 10
+    assert cache.get("newer") == b"z" * 10
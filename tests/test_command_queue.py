@@ -0,0 +1,99 @@
+from command_queue import CommandQueue
+
+
+def drain(queue):
+    commands = []
+    while True:
+        command = queue.take()
+        if command is None:
+            return commands
+        queue.done()
+        commands.append((command.name, command.argument))
+
+
+def test_skips_merge_into_one_skip_by_n():
+    queue = CommandQueue()
+    for _ in range(5):
+        queue.put("next", 1)
+    queue.put("previous", 1)
+    queue.put("previous", 1)
+    assert drain(queue) == [("next", 5), ("previous", 2)]
+
+
+def test_seeks_collapse_to_the_last_target():
+    queue = CommandQueue()
+    for position in (1000, 2000, 3000):
+        queue.put("seek", position)
+    assert drain(queue) == [("seek", 3000)]
+
+
+def test_seek_before_leaving_the_track_is_dropped():
+    queue = CommandQueue()
+    queue.put("next", 1)
+    queue.put("seek", 1000)
+    queue.put("seek", 2000)
+    queue.put("next", 1)
+    assert drain(queue) == [("next", 2)]
+
+
+def test_play_then_pause_cancels_out():
+    queue = CommandQueue()
+    queue.put("play")
+    queue.put("pause")
+    assert drain(queue) == []
+    queue.put("pause")
+    queue.put("pause")
+    assert drain(queue) == [("pause", None)]
+
+
+def test_shuffle_keeps_the_latest_state():
+    queue = CommandQueue()
+    queue.put("shuffle", True)
+    queue.put("shuffle", False)
+    assert drain(queue) == [("shuffle", False)]
+
+
+def test_commands_after_the_one_in_flight_are_not_merged_into_it():
+    queue = CommandQueue()
+    queue.put("next", 1)
+    running = queue.take()
+    queue.put("next", 1)
+    assert running.argument == 1
+    queue.done()
+    assert drain(queue) == [("next", 1)]
+
+
+def test_settled_waits_for_pending_and_in_flight_commands(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("command_queue.time.monotonic", lambda: now[0])
+    queue = CommandQueue()
+    assert queue.settled(0.0)
+
+    queue.put("pause")
+    assert not queue.settled(now[0])
+    queue.take()
+    assert not queue.settled(now[0])
+    now[0] = 101.0
+    queue.done()
+    # A snapshot fetched before the command finished may not reflect it
+    assert not queue.settled(100.5)
+    assert queue.settled(101.0)
+
+
+def test_repeat_keeps_the_latest_state():
+    queue = CommandQueue()
+    queue.put("repeat", "context")
+    queue.put("repeat", "track")
+    assert drain(queue) == [("repeat", "track")]
+
+
+def test_like_then_unlike_of_the_same_track_cancels_out():
+    queue = CommandQueue()
+    queue.put("like", "a")
+    queue.put("unlike", "a")
+    assert drain(queue) == []
+    queue.put("like", "a")
+    queue.put("unlike", "b")
+    assert drain(queue) == [("like", "a"), ("unlike", "b")]
+
+
@@ -0,0 +1,31 @@
+from instrumentation import BUCKETS_MS, Histogram, endpoint_name
+
+
+def test_endpoint_names_collapse_ids():
+    track_id = "4uLU6hMCjMI75M1A2tKUQC"
+    assert endpoint_name("GET", "https://api.spotify.com/v1/me/player?market=from_token") == "GET /v1/me/player"
+    assert endpoint_name("GET", f"https://api.spotify.com/v1/tracks/{track_id}") == "GET /v1/tracks/{id}"
+    # A local API prefix, as the benchmark uses, groups the same way
+    assert endpoint_name("PUT", "http://127.0.0.1:8000/v1/me/player/pause") == "PUT /v1/me/player/pause"
+
+
+def test_endpoint_names_of_other_hosts():
+    assert endpoint_name("POST", "https://accounts.spotify.com/api/token") == "POST accounts/api/token"
+    assert endpoint_name("GET", "https://i.scdn.co/image/ab67616d0000b273") == "GET i.scdn.co/image"
+
+
+def test_percentile_is_the_bucket_upper_bound():
+    histogram = Histogram()
+    assert histogram.percentile(0.5) == 0.0
+    for value_ms in (3, 4, 7, 40, 40, 40, 40, 40, 40, 900):
+        histogram.observe(value_ms)
+    assert histogram.percentile(0.2) == 5
+    assert histogram.percentile(0.5) == 50
+    assert histogram.percentile(0.95) == 1000
+    assert histogram.count == 10 and histogram.sum_ms == 1154
+
+
+def test_percentile_of_outliers_is_unbounded():
+    histogram = Histogram()
+    histogram.observe(60000)
+    assert histogram.percentile(0.99) == BUCKETS_MS[-1] == float("inf")
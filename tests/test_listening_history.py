@@ -0,0 +1,67 @@
+from listening_history import ListeningHistory, PlayTracker
+
+
+def tracker():
+    plays = []
+    return PlayTracker(lambda started_at, state, played_ms: plays.append((state.track_id, played_ms))), plays
+
+
+def test_listened_time_counts_until_the_track_changes(make_state):
+    play_tracker, plays = tracker()
+    for second in range(0, 60, 10):
+        play_tracker.observe(make_state("a", progress=second * 1000), now=second)
+    # Track b started 3 s ago, so a played on for another 7 s
+    play_tracker.observe(make_state("b", progress=3000), now=60)
+    assert plays == [("a", 57000)]
+
+
+def test_seeking_ahead_does_not_count_as_listening(make_state):
+    play_tracker, plays = tracker()
+    play_tracker.observe(make_state("a", progress=0), now=0)
+    play_tracker.observe(make_state("a", progress=5000), now=5)
+    play_tracker.observe(make_state("a", progress=190000), now=6)  # Seeked
+    play_tracker.observe(None, now=7)
+    assert plays == []  # 5 + 1 + 1 s is below the 30 s threshold
+
+    play_tracker.observe(make_state("a", progress=0), now=10)
+    play_tracker.observe(make_state("a", progress=40000), now=50)
+    play_tracker.observe(make_state("a", progress=180000), now=51)
+    play_tracker.finish()
+    assert plays == [("a", 41000)]
+
+
+def test_a_paused_first_snapshot_is_not_listened_time(make_state):
+    play_tracker, plays = tracker()
+    play_tracker.observe(make_state("a", progress=40000, playing=False), now=0)
+    play_tracker.observe(make_state("a", progress=40000, playing=False), now=100)
+    play_tracker.observe(make_state("b"), now=101)
+    assert plays == []
+
+
+def test_repeat_one_ends_the_play(make_state):
+    play_tracker, plays = tracker()
+    play_tracker.observe(make_state("a", progress=0, duration=60000), now=0)
+    play_tracker.observe(make_state("a", progress=58000, duration=60000), now=58)
+    play_tracker.observe(make_state("a", progress=1000, duration=60000), now=61)
+    assert plays == [("a", 60000)]
+
+
+def test_short_tracks_count_after_half_their_length(make_state):
+    play_tracker, plays = tracker()
+    play_tracker.observe(make_state("a", progress=0, duration=40000), now=0)
+    play_tracker.observe(make_state("a", progress=21000, duration=40000), now=21)
+    play_tracker.finish()
+    assert plays == [("a", 21000)]
+
+
+def test_top_artists_count_every_credited_artist(tmp_path, make_state):
+    history = ListeningHistory(str(tmp_path / "history.sqlite3"))
+    history.enqueue(100, make_state("a", artist_names=("Ann", "Bob")), 60000)
+    history.enqueue(200, make_state("b", artist_names=("Ann",)), 60000)
+    history.close()
+
+    history = ListeningHistory(str(tmp_path / "history.sqlite3"))
+    assert history.top_artists(0, 300) == [("Ann", 2, 120000), ("Bob", 1, 60000)]
+    assert history.top_tracks(0, 300)[0][1] in ("Ann, Bob", "Ann")
+    assert [row[2] for row in history.recent_plays()] == ["Ann", "Ann, Bob"]
+    history.close()
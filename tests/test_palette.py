@@ -0,0 +1,42 @@
+import pytest
+
+from palette import Palette, PaletteCache, extract_palette, pixels_from_rgb888
+
+np = pytest.importorskip("numpy")  # Optional dependency; without it the themes stay fixed
+
+NAVY = (20, 30, 90)
+ORANGE = (250, 120, 10)
+GRAY = (128, 128, 128)
+
+
+def cover(*colors_and_counts):
+    return np.array([color for color, count in colors_and_counts for _ in range(count)], dtype=np.uint8)
+
+
+def test_largest_cluster_is_dominant_and_most_saturated_is_accent():
+    palette = extract_palette(cover((NAVY, 700), (GRAY, 250), (ORANGE, 50)))
+    assert palette == Palette(dominant=NAVY, accent=ORANGE)
+
+
+def test_extraction_is_deterministic():
+    pixels = np.random.default_rng(1).integers(0, 256, size=(32 * 32, 3), dtype=np.uint8)
+    assert extract_palette(pixels) == extract_palette(pixels.copy())
+
+
+def test_single_color_cover_uses_it_for_both():
+    assert extract_palette(cover((ORANGE, 16))) == Palette(dominant=ORANGE, accent=ORANGE)
+
+
+def test_padded_rows_are_stripped():
+    # Two RGB pixels are 6 bytes; QImage pads each line to a multiple of 4
+    data = bytes([1, 2, 3, 4, 5, 6, 0, 0, 7, 8, 9, 10, 11, 12, 0, 0])
+    assert pixels_from_rgb888(data, 2, 2, 8).tolist() == [[1, 2, 3], [4, 5, 6], [7, 8, 9], [10, 11, 12]]
+
+
+def test_palette_cache_evicts_the_least_recently_used():
+    cache = PaletteCache(max_entries=2)
+    cache.put("a", Palette(NAVY, NAVY))
+    cache.put("b", Palette(GRAY, GRAY))
+    cache.get("a")
+    cache.put("c", Palette(ORANGE, ORANGE))
+    assert "a" in cache and "c" in cache and "b" not in cache
@@ -0,0 +1,35 @@
+from dataclasses import replace
+
+from playback_diff import PlaybackDiff, diff_playback
+
+
+def test_first_snapshot_updates_everything(make_state):
+    assert diff_playback(None, make_state()) == PlaybackDiff(
+        labels=True, album_art=True, play_state=True, shuffle=True, repeat=True,
+    )
+
+
+def test_nothing_playing_updates_nothing(make_state):
+    assert not diff_playback(make_state(), None)
+
+
+def test_progress_alone_updates_nothing(make_state):
+    previous = make_state(progress=1000, fetched_at=0.0)
+    assert not diff_playback(previous, replace(previous, track_progress=5000, fetched_at=4.0))
+
+
+def test_track_change_on_the_same_album_keeps_the_art(make_state):
+    diff = diff_playback(make_state("track-a"), make_state("track-b"))
+    assert diff == PlaybackDiff(labels=True)
+
+
+def test_album_change_updates_the_art(make_state):
+    diff = diff_playback(make_state("track-a", album_id="album-1"), make_state("track-b", album_id="album-2"))
+    assert diff.labels and diff.album_art and not diff.play_state
+
+
+def test_controls_update_on_their_own(make_state):
+    previous = make_state()
+    assert diff_playback(previous, replace(previous, is_playing=False)) == PlaybackDiff(play_state=True)
+    assert diff_playback(previous, replace(previous, shuffle_state=True)) == PlaybackDiff(shuffle=True)
+    assert diff_playback(previous, replace(previous, repeat_state="track")) == PlaybackDiff(repeat=True)
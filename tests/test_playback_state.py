@@ -0,0 +1,42 @@
+from dataclasses import replace
+import json
+
+from playback_state import PlaybackState, QueuedTrack
+
+
+def test_progress_is_extrapolated_while_playing(make_state):
+    state = make_state(progress=10000, fetched_at=100.0)
+    assert state.progress_at(now=100.0) == 10000
+    assert state.progress_at(now=102.5) == 12500
+    assert state.remaining_ms(now=102.5) == 187500
+
+
+def test_progress_is_clamped_to_the_track(make_state):
+    state = make_state(progress=199000, fetched_at=100.0)
+    assert state.progress_at(now=110.0) == 200000
+    assert state.remaining_ms(now=110.0) == 0
+    # A clock that went backwards never yields a negative position
+    assert make_state(progress=0, fetched_at=100.0).progress_at(now=99.0) == 0
+
+
+def test_paused_progress_stands_still(make_state):
+    state = make_state(progress=10000, playing=False, fetched_at=100.0)
+    assert state.progress_at(now=500.0) == 10000
+
+
+def test_messages_carry_the_snapshot_age_across_clocks(make_state):
+    state = replace(make_state(progress=10000, fetched_at=100.0, context_uri="spotify:playlist:abc",
+                               artist_names=("A", "B")),
+                    album_image_url="url", album_images=(("url", 640, 640),))
+    message = json.loads(json.dumps(state.to_message(now=101.5)))
+    assert "fetched_at" not in message and message["age"] == 1.5
+
+    # The other process's monotonic clock reads something else entirely
+    received = PlaybackState.from_message(message, now=5000.0)
+    assert received == replace(state, fetched_at=4998.5)
+    assert received.progress_at(now=5000.0) == state.progress_at(now=101.5)
+
+
+def test_queued_tracks_survive_a_message_round_trip():
+    track = QueuedTrack("id", "Name", "A, B", "album", "Album", (("url", 64, 64),), 180000, ("A", "B"))
+    assert QueuedTrack.from_message(json.loads(json.dumps(track.to_message()))) == track
@@ -0,0 +1,42 @@
+import pytest
+
+from poll_scheduler import PollScheduler
+
+
+def test_playing_polls_land_just_after_the_track_end(make_state):
+    scheduler = PollScheduler(mid_track_interval=10.0, track_end_margin=0.3, min_interval=0.5)
+    # 4 s left: poll right after the track ends
+    assert scheduler.next_delay(make_state(progress=196000), now=0.0) == pytest.approx(4.3)
+    # Far from the end: the mid-track interval
+    assert scheduler.next_delay(make_state(progress=1000), now=0.0) == 10.0
+    # Already past the expected end: never faster than min_interval
+    assert scheduler.next_delay(make_state(progress=200000), now=5.0) == 0.5
+
+
+def test_nothing_playing_uses_the_idle_interval():
+    assert PollScheduler(idle_interval=10.0).next_delay(None, now=0.0) == 10.0
+
+
+def test_long_pauses_slow_down(make_state):
+    scheduler = PollScheduler(paused_interval=5.0, long_pause_after=600.0, long_pause_interval=60.0)
+    paused = make_state(playing=False)
+    assert scheduler.next_delay(paused, now=0.0) == 5.0
+    assert scheduler.next_delay(paused, now=599.0) == 5.0
+    assert scheduler.next_delay(paused, now=600.0) == 60.0
+    # Playing again resets the pause clock
+    scheduler.next_delay(make_state(), now=601.0)
+    assert scheduler.next_delay(paused, now=602.0) == 5.0
+
+
+def test_unwatched_drops_to_the_heartbeat(make_state):
+    scheduler = PollScheduler(unwatched_interval=60.0)
+    assert scheduler.next_delay(make_state(progress=199000), now=0.0, watched=False) == 60.0
+    assert scheduler.next_delay(None, now=0.0, watched=False) == 60.0
+
+
+def test_locked_suspends_polling(make_state):
+    scheduler = PollScheduler()
+    assert scheduler.next_delay(make_state(), now=0.0, locked=True) is None
+    # The pause clock keeps running while suspended
+    scheduler.next_delay(make_state(playing=False), now=0.0, locked=True)
+    assert scheduler.paused_since == 0.0
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+pytest.importorskip("PyQt5.QtWidgets")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from playback_state import QueuedTrack  # noqa: E402
+from queue_model import QueueModel  # noqa: E402
+from transport import QUEUE_SOURCE  # noqa: E402
+
+
+def track(track_id):
+    return QueuedTrack(track_id, f"Track {track_id}", "Artist", "album", "Album", (), 180000)
+
+
+def tracks(*track_ids):
+    return [track(track_id) for track_id in track_ids]
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])  # The placeholder thumbnail is a QPixmap
+
+
+@pytest.fixture
+def model(app):
+    model = QueueModel()
+    model.changes = []
+    model.rowsInserted.connect(lambda parent, first, last: model.changes.append(("insert", first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: model.changes.append(("remove", first, last)))
+    return model
+
+
+def track_ids(model):
+    return [track.track_id for track in model.tracks]
+
+
+def test_next_track_removes_only_the_first_row(model):
+    model.apply_diff(tracks("a", "b", "c", "d"))
+    model.changes.clear()
+    model.apply_diff(tracks("b", "c", "d", "e"))
+    assert track_ids(model) == ["b", "c", "d", "e"]
+    # Applied back to front: the new row goes after the old last row, then the first goes
+    assert model.changes == [("insert", 4, 4), ("remove", 0, 0)]
+
+
+def test_reordered_queue_keeps_the_rows_in_common(model):
+    model.apply_diff(tracks("a", "b", "c", "d", "e"))
+    model.changes.clear()
+    model.apply_diff(tracks("a", "x", "c", "d", "e"))
+    assert track_ids(model) == ["a", "x", "c", "d", "e"]
+    assert model.changes == [("remove", 1, 1), ("insert", 1, 1)]
+
+
+def test_unchanged_queue_touches_no_rows(model):
+    model.apply_diff(tracks("a", "b"))
+    model.changes.clear()
+    model.apply_diff(tracks("a", "b"))
+    assert model.changes == []
+
+
+def test_pages_append_and_stale_answers_are_dropped(model):
+    model.set_source("spotify:playlist:abc")
+    model.on_page_ready("spotify:playlist:abc", 0, tracks("a", "b"), 2, 4)
+    assert model.canFetchMore()
+    model.on_page_ready("spotify:playlist:abc", 2, tracks("c", "d"), 4, 4)
+    assert track_ids(model) == ["a", "b", "c", "d"] and not model.canFetchMore()
+
+    model.on_page_ready(QUEUE_SOURCE, 0, tracks("x"), 1, 1)  # A queue read meant for the queue view
+    model.on_page_ready("spotify:playlist:abc", 2, tracks("y"), 3, 4)  # Offset already loaded
+    assert track_ids(model) == ["a", "b", "c", "d"]
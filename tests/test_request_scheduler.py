@@ -0,0 +1,121 @@
+import pytest
+
+from request_scheduler import BACKGROUND, INTERACTIVE, RequestDeferred, RequestScheduler, retry_after
+
+
+class RateLimited(Exception):
+    """
+    Shaped like spotipy's SpotifyException for a 429.
+    """
+
+    def __init__(self, retry_after=None):
+        super().__init__("429")
+        self.http_status = 429
+        self.headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+
+
+class Failed(Exception):
+    http_status = 500
+    headers = {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("request_scheduler.time.monotonic", lambda: now[0])
+    return now
+
+
+def fail(error):
+    def function():
+        raise error
+    return function
+
+
+def test_retry_after_reads_the_header():
+    assert retry_after(RateLimited(7)) == 7.0
+    assert retry_after(RateLimited(0)) == 1.0  # Never hammer with a zero wait
+    assert retry_after(RateLimited()) == 5.0
+    assert retry_after(Failed()) is None
+
+
+def test_background_requests_leave_the_interactive_reserve(clock):
+    scheduler = RequestScheduler(rate=2.0, burst=4, interactive_reserve=3)
+    assert scheduler.call(BACKGROUND, lambda: "ok") == "ok"
+    with pytest.raises(RequestDeferred) as deferred:
+        scheduler.call(BACKGROUND, lambda: "ok")
+    assert deferred.value.delay == pytest.approx(0.5)  # One token at 2 per second
+    assert scheduler.stats()["deferred"] == 1
+
+    # Commands may spend the reserve
+    for _ in range(3):
+        scheduler.call(INTERACTIVE, lambda: "ok")
+
+
+def test_tokens_refill_over_time(clock):
+    scheduler = RequestScheduler(rate=2.0, burst=4, interactive_reserve=3)
+    scheduler.call(BACKGROUND, lambda: None)
+    with pytest.raises(RequestDeferred):
+        scheduler.call(BACKGROUND, lambda: None)
+    clock[0] += 0.5
+    scheduler.call(BACKGROUND, lambda: None)
+
+
+def test_retry_after_pauses_both_lanes(clock):
+    scheduler = RequestScheduler(max_interactive_wait=1.0)
+    with pytest.raises(RateLimited):
+        scheduler.call(BACKGROUND, fail(RateLimited(7)))
+    assert scheduler.stats()["rate_limited"] == 1
+
+    with pytest.raises(RequestDeferred) as deferred:
+        scheduler.call(BACKGROUND, lambda: None)
+    assert deferred.value.delay == pytest.approx(7.0)
+    # Interactive requests wait for the pause, unless it outlasts their patience
+    with pytest.raises(RequestDeferred):
+        scheduler.call(INTERACTIVE, lambda: None)
+
+    clock[0] += 7.0
+    scheduler.call(INTERACTIVE, lambda: None)
+
+
+def test_background_errors_back_off_exponentially_with_jitter(clock, monkeypatch):
+    monkeypatch.setattr("request_scheduler.random.uniform", lambda low, high: 1.0)
+    scheduler = RequestScheduler(base_backoff=1.0, max_backoff=3.0)
+    delays = []
+    for _ in range(4):
+        with pytest.raises(Failed):
+            scheduler.call(BACKGROUND, fail(Failed()))
+        with pytest.raises(RequestDeferred) as deferred:
+            scheduler.call(BACKGROUND, lambda: None)
+        delays.append(deferred.value.delay)
+        clock[0] += deferred.value.delay
+    assert delays == [1.0, 2.0, 3.0, 3.0]
+
+    scheduler.call(BACKGROUND, lambda: None)
+    assert scheduler.stats()["background_failures"] == 0
+
+
+def test_interactive_errors_do_not_back_off_the_background_lane(clock):
+    scheduler = RequestScheduler()
+    with pytest.raises(Failed):
+        scheduler.call(INTERACTIVE, fail(Failed()))
+    assert scheduler.call(BACKGROUND, lambda: "ok") == "ok"
+
+
+def test_rate_limited_interactive_requests_are_sent_again_after_the_pause(clock, monkeypatch):
+    scheduler = RequestScheduler()
+    monkeypatch.setattr(scheduler._condition, "wait", lambda timeout: clock.__setitem__(0, clock[0] + timeout))
+    answers = [RateLimited(2), "ok"]
+
+    def function():
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    assert scheduler.call(INTERACTIVE, function) == "ok"
+    assert clock[0] == pytest.approx(1002.0)  # Waited out Retry-After before the second try
+
+    # Only once: a second 429 reaches the caller
+    with pytest.raises(RateLimited):
+        scheduler.call(INTERACTIVE, fail(RateLimited(1)))
@@ -0,0 +1,68 @@
+from saved_tracks import BATCH_SIZE, SavedTracksCache, is_spotify_id
+
+
+def spotify_id(number):
+    return f"track{number:017d}"
+
+
+class FakeLibrary:
+    def __init__(self, saved=()):
+        self.saved = set(saved)
+        self.batches = []
+
+    def call(self, priority, method, track_ids):
+        assert method == "current_user_saved_tracks_contains"
+        self.batches.append(len(track_ids))
+        return [track_id in self.saved for track_id in track_ids]
+
+
+def test_lookups_are_batched_and_cached():
+    library = FakeLibrary(saved={spotify_id(3)})
+    cache = SavedTracksCache()
+    track_ids = [spotify_id(number) for number in range(120)]
+
+    states = cache.lookup(library.call, track_ids)
+    assert library.batches == [BATCH_SIZE, BATCH_SIZE, 20]
+    assert states[spotify_id(3)] and not states[spotify_id(4)]
+
+    cache.lookup(library.call, track_ids[:10] + [spotify_id(500)])
+    assert library.batches[3:] == [1]  # Only the unknown track
+
+
+def test_local_files_are_never_looked_up():
+    library = FakeLibrary()
+    assert SavedTracksCache().lookup(library.call, ["spotify:local:a:b:c:1", "Some name"]) == {}
+    assert library.batches == []
+    assert not is_spotify_id("spotify:local:a:b:c:1")
+    assert is_spotify_id(spotify_id(1))
+
+
+def test_entries_expire():
+    library = FakeLibrary()
+    cache = SavedTracksCache(max_age=0.0)
+    cache.lookup(library.call, [spotify_id(1)])
+    cache.lookup(library.call, [spotify_id(1)])
+    assert library.batches == [1, 1]
+
+
+def test_a_like_during_a_lookup_wins_over_the_older_answer():
+    cache = SavedTracksCache()
+
+    def call(priority, method, track_ids):
+        cache.put(spotify_id(1), True)  # The like lands while Spotify is answering
+        return [False]
+
+    assert cache.lookup(call, [spotify_id(1)]) == {spotify_id(1): True}
+    assert cache.cached([spotify_id(1)]) == {spotify_id(1): True}
+
+
+def test_invalidated_track_is_looked_up_again():
+    # A like that timed out may have landed anyway; only Spotify knows
+    library = FakeLibrary(saved={spotify_id(1)})
+    cache = SavedTracksCache()
+    cache.put(spotify_id(1), False)
+    cache.put(spotify_id(2), False)
+    cache.invalidate(spotify_id(1))
+    assert cache.cached([spotify_id(1), spotify_id(2)]) == {spotify_id(2): False}
+    assert cache.lookup(library.call, [spotify_id(1), spotify_id(2)]) == {spotify_id(1): True, spotify_id(2): False}
+    assert library.batches == [1]
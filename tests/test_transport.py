@@ -0,0 +1,36 @@
+from request_scheduler import BACKGROUND
+from transport import QUEUE_SOURCE, fetch_page, read_queue, upcoming
+
+
+def item(track_id):
+    return {"id": track_id, "name": track_id, "duration_ms": 1000, "artists": [{"name": "Artist"}],
+            "album": {"id": "album", "name": "Album", "images": []}}
+
+
+class FakeQueue:
+    def __init__(self, *items):
+        self.items = list(items)
+        self.calls = []
+
+    def call(self, priority, method, *args, **kwargs):
+        self.calls.append((priority, method))
+        return {"currently_playing": None, "queue": self.items}
+
+
+def test_queue_read_skips_episodes():
+    episode = {"id": "episode", "name": "Episode", "duration_ms": 1000}
+    queue = FakeQueue(item("a"), episode, item("b"))
+    assert [track.track_id for track in read_queue(queue.call)] == ["a", "b"]
+    assert queue.calls == [(BACKGROUND, "queue")]
+
+
+def test_upcoming_tracks_are_distinct():
+    queue = read_queue(FakeQueue(item("a"), item("a"), item("b"), item("c"), item("d")).call)
+    assert [track.track_id for track in upcoming(queue, depth=3)] == ["a", "b", "c"]
+
+
+def test_queue_page_is_the_whole_queue():
+    queue = FakeQueue(item("a"), item("b"))
+    tracks, next_offset, total = fetch_page(queue.call, QUEUE_SOURCE, 0)
+    assert [track.track_id for track in tracks] == ["a", "b"]
+    assert next_offset == total == 2  # Nothing more to fetch
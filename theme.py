@@ -0,0 +1,179 @@
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class Theme:
+    """
+    Colors of one widget theme. Compiled once into an application-wide stylesheet.
+    """
+    name: str
+    window_background: str
+    plane_background: str
+    plane_border: str
+    text: str
+    icon: str  # Replaces black in the SVG assets
+    mode_icon: str  # Icon of the dark/light mode switch
+    slider: str
+    window_button_hover: str = "#d3d3d3"
+    media_button_hover: str = "rgba(255, 255, 255, 50)"
+    media_button_checked: str = "rgba(255, 255, 255, 30)"
+    panel_background: str = "rgba(0, 0, 0, 170)"  # Up Next panel, opaque enough to cover the labels
+    base: str = ""  # Name of the built-in theme a palette variant derives from
+
+
+LIGHT = Theme(
+    name="light",
+    window_background="rgba(0, 0, 0, 75)",
+    plane_background="rgba(255, 255, 255, 5)",
+    plane_border="rgba(255, 255, 255, 10)",
+    text="white",
+    icon="white",
+    mode_icon="./assets/svg/sun.svg",
+    slider="white",
+)
+
+DARK = Theme(
+    name="dark",
+    window_background="rgba(0, 0, 0, 200)",
+    plane_background="rgba(0, 0, 0, 5)",
+    plane_border="rgba(0, 0, 0, 10)",
+    text="black",
+    icon="black",
+    mode_icon="./assets/svg/moon.svg",
+    slider="white",
+    panel_background="rgba(255, 255, 255, 170)",
+)
+
+THEMES = {theme.name: theme for theme in (LIGHT, DARK)}
+
+# Label text of a palette theme is pulled this far from the accent towards the base text color
+_TEXT_TINT = 0.8
+_TEXT_COLORS = {"white": (255, 255, 255), "black": (0, 0, 0)}
+
+
+def _mix(color, target, amount):
+    return tuple(round(a + (b - a) * amount) for a, b in zip(color, target))
+
+
+def _rgba(color, alpha):
+    return f"rgba({color[0]}, {color[1]}, {color[2]}, {alpha})"
+
+
+def _hex(color):
+    return "#{:02x}{:02x}{:02x}".format(*color)
+
+
+def theme_for_palette(base, palette):
+    """
+    Variant of a built-in theme colored by an album art Palette. The window, icons and
+    mode switch stay those of the base theme so light and dark mode keep their contrast.
+    """
+    text = _TEXT_COLORS.get(base.text, (255, 255, 255))
+    return replace(
+        base,
+        name=f"{base.name}-{_hex(palette.dominant)}-{_hex(palette.accent)}",
+        base=base.name,
+        plane_background=_rgba(palette.dominant, 90),
+        plane_border=_rgba(palette.accent, 60),
+        text=_hex(_mix(palette.accent, text, _TEXT_TINT)),
+        slider=_hex(_mix(palette.accent, (255, 255, 255), 0.3)),
+    )
+
+
+def _colored_rules(theme):
+    """
+    Rules for the colors a palette changes: the plane, the labels and the slider.
+    """
+    return f"""
+        QLabel#backgroundPlane {{
+            background-color: {theme.plane_background};
+            border: 1px solid {theme.plane_border};
+            border-radius: 10px;
+        }}
+        QLabel#artistLabel, QLabel#trackLabel, QLabel#scrubLabel {{
+            color: {theme.text};
+            background-color: rgba(0, 0, 0, 0);
+        }}
+        QLabel#queueTitle, QListView#queueList {{
+            color: {theme.text};
+            background-color: rgba(0, 0, 0, 0);
+            border: none;
+        }}
+        QSlider#progressSlider::handle:horizontal {{
+            background: {theme.slider};
+            width: 15px;
+            height: 15px;
+            border-radius: 0px;
+        }}
+        QSlider#progressSlider::sub-page:horizontal {{
+            background: {theme.slider};
+        }}
+    """
+
+
+def compile_stylesheet(theme):
+    """
+    The whole widget's stylesheet for a theme. Widgets are matched by object name
+    and the buttonRole dynamic property, so no widget needs a stylesheet of its own.
+    """
+    return f"""
+        QMainWindow#spotifyWidget {{
+            background-color: {theme.window_background};
+        }}
+        QLabel#debugHud {{
+            color: white;
+            background-color: rgba(0, 0, 0, 160);
+            font-family: monospace;
+            font-size: 10px;
+        }}
+        QWidget#queuePanel {{
+            background-color: {theme.panel_background};
+            border-radius: 10px;
+        }}
+        QListView#queueList::item {{
+            padding: 2px;
+        }}
+        QPushButton[buttonRole="window"] {{
+            border: none;
+            background-color: rgba(255, 255, 255, 0);
+            border-radius: 15px;
+        }}
+        QPushButton[buttonRole="window"]:hover {{
+            background-color: {theme.window_button_hover};
+        }}
+        QPushButton[buttonRole="media"] {{
+            border: none;
+            background-color: rgba(255, 255, 255, 0);
+            padding: 10px;
+            border-radius: 10px;
+        }}
+        QPushButton[buttonRole="media"]:hover {{
+            background-color: {theme.media_button_hover};
+        }}
+        QPushButton[buttonRole="media"]:checked {{
+            background-color: {theme.media_button_checked};
+        }}
+        QSlider#progressSlider::groove:horizontal {{
+            background: rgba(0, 0, 0, 0);
+            height: 12px;
+        }}
+        QSlider#progressSlider::add-page:horizontal {{
+            background: rgba(0, 0, 0, 0);
+            border-radius: 5px;
+        }}
+        {_colored_rules(theme)}
+    """
+
+
+@lru_cache(maxsize=64)
+def compile_palette_stylesheet(theme):
+    """
+    Stylesheet for just the widgets a palette colors. Set on those widgets alone, so an
+    album change restyles a handful of widgets instead of re-polishing the whole tree.
+    """
+    return _colored_rules(theme)
+
+
+# Precompiled once; palette variants never evict them
+STYLESHEETS = {name: compile_stylesheet(theme) for name, theme in THEMES.items()}
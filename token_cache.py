@@ -0,0 +1,103 @@
+from spotipy.cache_handler import CacheHandler
+import json
+import os
+import threading
+import time
+
+# Same default file as spotipy's own cache, so existing logins carry over
+TOKEN_CACHE_PATH = os.getenv("SPOTIFY_WIDGET_TOKEN_CACHE", ".cache")
+
+# Refresh this many seconds before expiry; spotipy itself only refreshes in the last 60
+REFRESH_MARGIN = float(os.getenv("SPOTIFY_WIDGET_TOKEN_REFRESH_MARGIN", "300"))
+REFRESH_RETRY = 30.0
+
+
+class TokenCache(CacheHandler):
+    """
+    Keeps the OAuth token in memory and writes it through to disk atomically.
+    The file is read once, so API calls never touch it on the hot path.
+    """
+
+    def __init__(self, path=TOKEN_CACHE_PATH):
+        self.path = path
+        self._condition = threading.Condition()
+        self._token_info = None
+        self._loaded = False
+
+    def get_cached_token(self):
+        with self._condition:
+            if not self._loaded:
+                self._loaded = True
+                self._token_info = self._read()
+            return self._token_info
+
+    def save_token_to_cache(self, token_info):
+        with self._condition:
+            self._token_info = token_info
+            self._loaded = True
+            self._condition.notify_all()
+        self._write(token_info)
+
+    def wait_for_change(self, timeout):
+        """
+        Block until a new token is saved or timeout seconds pass.
+        """
+        with self._condition:
+            self._condition.wait(timeout)
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading token cache: {e}")
+            return None
+
+    def _write(self, token_info):
+        tmp_path = f"{self.path}.tmp"
+        try:
+            # Created private: the file holds the refresh token
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as file:
+                json.dump(token_info, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error writing token cache: {e}")
+
+
+class TokenRefresher:
+    """
+    Refreshes the access token on a daemon thread ahead of its expiry, so no click or
+    poll ever waits on a token round trip.
+    """
+
+    def __init__(self, auth_manager, cache, margin=REFRESH_MARGIN):
+        self.auth_manager = auth_manager
+        self.cache = cache
+        self.margin = margin
+        self._thread = threading.Thread(target=self._run, name="token-refresh", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            token_info = self.cache.get_cached_token()
+            if not token_info or not token_info.get("refresh_token"):
+                self.cache.wait_for_change(None)  # Nothing to refresh until the user logs in
+                continue
+
+            delay = token_info["expires_at"] - self.margin - time.time()
+            if delay > 0:
+                self.cache.wait_for_change(delay)
+                continue  # Re-read: the token may have been replaced meanwhile
+
+            try:
+                # Saves the new token through the cache handler
+                self.auth_manager.refresh_access_token(token_info["refresh_token"])
+                print("Access token refreshed.")
+            except Exception as e:
+                print(f"Error refreshing access token: {e}")
+                self.cache.wait_for_change(REFRESH_RETRY)
@@ -0,0 +1,98 @@
+from playback_state import QueuedTrack
+from request_scheduler import BACKGROUND, INTERACTIVE
+import os
+
+# How many upcoming tracks to prefetch
+PREFETCH_DEPTH = int(os.getenv("SPOTIFY_WIDGET_PREFETCH_DEPTH", "3"))
+
+# Commands that change the user's library rather than playback; their argument is a track ID
+LIBRARY_COMMANDS = ("like", "unlike")
+
+# Spotify's repeat modes, in the order the repeat button steps through them
+REPEAT_MODES = ("off", "context", "track")
+
+# Source name of the playback queue; any other source is a playlist URI
+QUEUE_SOURCE = "queue"
+PAGE_SIZE = 100  # The playlist items endpoint's maximum
+PLAYLIST_FIELDS = "total,items(track(id,uri,name,duration_ms,artists(name),album(id,name,images)))"
+
+
+def run_command(call, command, argument):
+    """
+    Execute one (possibly merged) transport command.
+    call(priority, method, *args) performs sp.<method>(*args) through the request scheduler.
+    """
+    if command == "play":
+        call(INTERACTIVE, "start_playback")
+        print("Playback resumed.")
+    elif command == "pause":
+        call(INTERACTIVE, "pause_playback")
+        print("Playback paused.")
+    elif command == "next":
+        # The Web API has no skip-by-n, so a merged skip is sent back to back
+        for _ in range(argument):
+            call(INTERACTIVE, "next_track")
+        print(f"Skipped {argument} track(s).")
+    elif command == "previous":
+        for _ in range(argument):
+            call(INTERACTIVE, "previous_track")
+        print(f"Went back {argument} track(s).")
+    elif command == "shuffle":
+        call(INTERACTIVE, "shuffle", argument)
+        print("Tracks shuffled." if argument else "Tracks unshuffled.")
+    elif command == "seek":
+        # Argument is the target position in milliseconds
+        call(INTERACTIVE, "seek_track", argument)
+        print(f"Seeked to {argument} ms.")
+    elif command == "repeat":
+        # Argument is "off", "context" or "track"
+        call(INTERACTIVE, "repeat", argument)
+        print(f"Repeat set to {argument}.")
+    elif command == "like":
+        call(INTERACTIVE, "current_user_saved_tracks_add", [argument])
+        print("Track liked.")
+    elif command == "unlike":
+        call(INTERACTIVE, "current_user_saved_tracks_delete", [argument])
+        print("Track unliked.")
+    else:
+        raise ValueError(f"Unknown command: {command}")
+
+
+def read_queue(call):
+    """
+    The whole user queue, as QueuedTracks. One read serves both the art prefetch and the
+    Up Next panel.
+    """
+    items = (call(BACKGROUND, "queue") or {}).get('queue') or []
+    return [track for track in (QueuedTrack.from_api(item) for item in items) if track]
+
+
+def upcoming(queue, depth=PREFETCH_DEPTH):
+    """
+    The first depth distinct tracks of a queue.
+    """
+    tracks = []
+    for track in queue:
+        if track.track_id not in [queued.track_id for queued in tracks]:
+            tracks.append(track)
+        if len(tracks) >= depth:
+            break
+    return tracks
+
+
+def fetch_page(call, source, offset, limit=PAGE_SIZE):
+    """
+    One page of the queue or of a playlist, as (QueuedTracks, next offset, total).
+    Episodes and local files are left out, so the next offset is not offset + len(tracks).
+    The queue endpoint is not paged and always returns the whole queue.
+    """
+    if source == QUEUE_SOURCE:
+        tracks = read_queue(call)
+        return tracks, len(tracks), len(tracks)
+    page = call(
+        BACKGROUND, "playlist_items", source,
+        fields=PLAYLIST_FIELDS, limit=limit, offset=offset, additional_types=("track",),
+    ) or {}
+    items = [item.get('track') for item in page.get('items') or []]
+    tracks = [track for track in (QueuedTrack.from_api(item) for item in items) if track]
+    return tracks, offset + len(items), int(page.get('total') or 0)